@@ -0,0 +1,101 @@
+"""JSON API против HTML-лент: время, память и размер страницы.
+
+Открывает главную, ленту группы и профиль автора страницей в ``--posts``
+постов как HTML (``posts.views``) и как JSON (``posts.api``). Кэш Django
+отключён, чтобы HTML рисовался каждый раз. Для каждого адреса — p50/p95
+времени запроса, пик выделенной памяти за запрос (tracemalloc, отдельным
+прогоном) и размер ответа без сжатия, в gzip и, если установлен пакет
+``brotli``, в brotli.
+"""
+import argparse
+import sys
+import tracemalloc
+
+from common import measure, migrate, setup_django, write_results
+
+
+def urls(size):
+    from django.urls import reverse
+
+    from bench_views import sample_kwargs
+    values = sample_kwargs()
+    slug, username = values['slug'], values['username']
+    return {
+        'index': (reverse('posts:index'),
+                  reverse('posts:api_index') + f'?limit={size}'),
+        'group': (reverse('posts:group_posts', kwargs={'slug': slug}),
+                  reverse('posts:api_group_posts', kwargs={'slug': slug})
+                  + f'?limit={size}'),
+        'profile': (reverse('posts:profile', kwargs={'username': username}),
+                    reverse('posts:api_profile_posts',
+                            kwargs={'username': username})
+                    + f'?limit={size}'),
+    }
+
+
+def peak_memory(get):
+    tracemalloc.start()
+    try:
+        get()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def sizes(client, url):
+    from core import compression
+
+    result = {'raw': len(client.get(url).content)}
+    encodings = ['gzip'] + (['br'] if compression.brotli else [])
+    for encoding in encodings:
+        response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+        result[encoding] = len(response.content)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', default='small',
+                        choices=('small', 'medium', 'large'))
+    parser.add_argument('--posts', type=int, default=100,
+                        help='постов на странице')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--db', help='путь к SQLite-базе бенчмарка')
+    parser.add_argument('--output', help='куда сохранить JSON')
+    args = parser.parse_args()
+
+    setup_django(args.db, CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+        'thumbnails': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    }, THUMBNAIL_CACHE='thumbnails', API_MAX_LIMIT=max(args.posts, 100))
+    migrate()
+    from django.core.management import call_command
+    from django.test import Client
+    from posts import views
+    from posts.models import Post
+    if not Post.objects.exists():
+        call_command('seed_data', scale=args.scale, stdout=sys.stderr)
+
+    views.NUM_POST = args.posts
+    client = Client()
+    results = {}
+    for name, (html_url, api_url) in urls(args.posts).items():
+        for kind, url in (('html', html_url), ('json', api_url)):
+            def get():
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise RuntimeError(f'{url}: {response.status_code}')
+            results[f'{name}/{kind}'] = {
+                'url': url,
+                'request': measure(get, args.repeat),
+                'peak_memory_kb': peak_memory(get) / 1024,
+                'bytes': sizes(client, url),
+            }
+    write_results('api', {'posts': args.posts, 'urls': results},
+                  args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Пропускная способность get/set/delete кэш-бэкендов в N процессах.
+
+Сравнивает ``LocMemCache`` и ``core.cache.SQLiteCache``. Цифры locmem
+приведены для ориентира: у каждого процесса там своя копия кэша, и
+сброс ключа в одном воркере не виден остальным.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from common import setup_django, write_results
+
+BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'sqlite': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+
+def worker(backend, location, operations, keys, seed, results):
+    from django.utils.module_loading import import_string
+    params = dict(BACKENDS[backend])
+    cache = import_string(params.pop('BACKEND'))(location, params)
+    rnd = random.Random(seed)
+    value = {'html': 'x' * 2048}
+    timings = {}
+    for name, action in (
+        ('set', lambda key: cache.set(key, value)),
+        ('get', cache.get),
+        ('delete', cache.delete),
+    ):
+        started = time.perf_counter()
+        for _ in range(operations):
+            action(f'key{rnd.randrange(keys)}')
+        timings[name] = time.perf_counter() - started
+    results.put(timings)
+
+
+def run(backend, processes, operations, keys):
+    location = (os.path.join(tempfile.mkdtemp(), 'cache.sqlite3')
+                if backend == 'sqlite' else 'bench')
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [
+        context.Process(target=worker, args=(
+            backend, location, operations, keys, seed, results))
+        for seed in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    collected = [results.get() for _ in workers]
+    for process in workers:
+        process.join()
+    report = {}
+    for name in ('set', 'get', 'delete'):
+        slowest = max(timings[name] for timings in collected)
+        report[name] = {
+            'ops_per_sec': processes * operations / slowest,
+            'per_op_us': 1e6 * slowest / operations,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--operations', type=int, default=20000)
+    parser.add_argument('--keys', type=int, default=5000)
+    parser.add_argument('--output', help='куда сохранить JSON')
+    args = parser.parse_args()
+    setup_django()
+    write_results('cache', {
+        backend: run(backend, args.processes, args.operations, args.keys)
+        for backend in BACKENDS
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
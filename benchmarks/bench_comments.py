@@ -0,0 +1,104 @@
+"""Всплеск комментариев: запись сразу против очереди ``posts.comment_queue``.
+
+``--clients`` потоков одновременно отправляют комментарии к одному посту
+через ``add_comment``: сначала с записью в запросе, затем с
+``COMMENT_WRITE_BEHIND``. Считаются комментарии в секунду, задержка
+ответа и — для очереди — время до записи последней пачки. Бюджеты
+``RATE_LIMITS`` подняты, чтобы меряться запись, а не 429.
+"""
+import argparse
+import sys
+import threading
+import time
+
+from common import migrate, setup_django, summarize, write_results
+
+
+def burst(url, users, per_client):
+    from django.db import close_old_connections
+    from django.test import Client
+
+    latencies = []
+    errors = []
+    barrier = threading.Barrier(len(users))
+
+    def post_comments(user):
+        client = Client()
+        client.force_login(user)
+        barrier.wait()
+        try:
+            for i in range(per_client):
+                started = time.perf_counter()
+                response = client.post(url, {'text': f'Комментарий {i}'})
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 302:
+                    errors.append(response.status_code)
+        finally:
+            close_old_connections()
+
+    threads = [threading.Thread(target=post_comments, args=(user,))
+               for user in users]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, latencies, errors
+
+
+def run(mode, url, post, users, per_client):
+    from django.test.utils import override_settings
+
+    from posts import comment_queue
+
+    before = post.comments.count()
+    with override_settings(COMMENT_WRITE_BEHIND=mode == 'write_behind'):
+        elapsed, latencies, errors = burst(url, users, per_client)
+        # Очередь дописывается до конца замера: считаются записанные.
+        started = time.perf_counter()
+        comment_queue.flush()
+        total = elapsed + time.perf_counter() - started
+    written = post.comments.count() - before
+    return {
+        'comments': written,
+        'errors': len(errors),
+        'requests_per_sec': len(latencies) / elapsed,
+        'written_per_sec': written / total,
+        'response': summarize(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', default='small',
+                        choices=('small', 'medium', 'large'))
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--comments', type=int, default=100,
+                        help='комментариев на клиента')
+    parser.add_argument('--db', help='путь к SQLite-базе бенчмарка')
+    parser.add_argument('--output', help='куда сохранить JSON')
+    args = parser.parse_args()
+
+    budget = (10 ** 9, 60)
+    setup_django(args.db, METRICS_ENABLED=False,
+                 RATE_LIMITS={'comment': {'user': budget, 'ip': budget}})
+    migrate()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.urls import reverse
+    from posts.models import Post
+    if not Post.objects.exists():
+        call_command('seed_data', scale=args.scale, stdout=sys.stderr)
+
+    from bench_views import sample_kwargs
+    post = Post.objects.get(pk=sample_kwargs()['post_id'])
+    url = reverse('posts:add_comment', kwargs={'post_id': post.pk})
+    users = list(get_user_model().objects.order_by('pk')[:args.clients])
+    results = {'clients': len(users), 'per_client': args.comments}
+    for mode in ('sync', 'write_behind'):
+        results[mode] = run(mode, url, post, users, args.comments)
+    write_results('comments', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
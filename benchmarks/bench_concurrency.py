@@ -0,0 +1,163 @@
+"""Ленты и страница поста под нагрузкой при медленной базе.
+
+Поднимает многопоточный WSGI-сервер (wsgiref + ThreadingMixIn) в
+отдельном процессе и добавляет каждому SQL-запросу задержку ``--latency``
+— как у базы по сети. Сравнивает последовательное чтение данных view
+(``VIEW_LOADER_THREADS = 0``) с одновременным (``core.concurrency``):
+пропускную способность и p50/p95 при разном числе параллельных
+читателей (``--clients``). Пока процессор не занят полностью, ожидания
+базы перекрываются и страницы отдаются быстрее; при полной загрузке
+процессора выигрыша нет.
+"""
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import migrate, setup_django, summarize, write_results
+
+SERVE_FLAG = '--serve'
+
+
+def serve(db_path, loader_threads, latency):
+    """Дочерний процесс: сервер с задержкой каждого SQL-запроса."""
+    from socketserver import ThreadingMixIn
+    from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+    setup_django(db_path, ALLOWED_HOSTS=['127.0.0.1'],
+                 VIEW_LOADER_THREADS=loader_threads)
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.db.backends.signals import connection_created
+
+    def slow(execute, sql, params, many, context):
+        time.sleep(latency)
+        return execute(sql, params, many, context)
+
+    def add_latency(sender, connection, **kwargs):
+        connection.execute_wrappers.append(slow)
+
+    connection_created.connect(add_latency, weak=False)
+
+    class Server(ThreadingMixIn, WSGIServer):
+        daemon_threads = True
+        request_queue_size = 128
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = Server(('127.0.0.1', 0), QuietHandler)
+    server.set_app(WSGIHandler())
+    print(server.server_port, flush=True)
+    server.serve_forever()
+
+
+def start_server(db_path, loader_threads, latency):
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), SERVE_FLAG, db_path,
+         str(loader_threads), str(latency)],
+        stdout=subprocess.PIPE, text=True)
+    return process, int(process.stdout.readline())
+
+
+def fetch(port, url, cookie):
+    started = time.perf_counter()
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        conn.request('GET', url, headers={'Cookie': cookie})
+        response = conn.getresponse()
+        response.read()
+    finally:
+        conn.close()
+    if response.status != 200:
+        raise RuntimeError(f'{url}: {response.status}')
+    return url, time.perf_counter() - started
+
+
+def load(port, urls, cookie, clients, requests):
+    for url in urls:
+        fetch(port, url, cookie)
+    plan = [urls[i % len(urls)] for i in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        samples = list(pool.map(lambda url: fetch(port, url, cookie), plan))
+    elapsed = time.perf_counter() - started
+    by_url = {url: [] for url in urls}
+    for url, seconds in samples:
+        by_url[url].append(seconds)
+    return {
+        'rps': requests / elapsed,
+        'all': summarize([seconds for _, seconds in samples]),
+        'urls': {url: summarize(values) for url, values in by_url.items()},
+    }
+
+
+def session_cookie(user):
+    from django.conf import settings
+    from django.test import Client
+
+    client = Client()
+    client.force_login(user)
+    return (f'{settings.SESSION_COOKIE_NAME}='
+            f'{client.cookies[settings.SESSION_COOKIE_NAME].value}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', default='small',
+                        choices=('small', 'medium', 'large'))
+    parser.add_argument('--latency', type=float, default=5.0,
+                        help='задержка SQL-запроса, мс')
+    parser.add_argument('--threads', type=int, default=4,
+                        help='VIEW_LOADER_THREADS в одновременном режиме')
+    parser.add_argument('--clients', default='1,4,16',
+                        help='числа параллельных читателей через запятую')
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--db', help='путь к SQLite-базе бенчмарка')
+    parser.add_argument('--output', help='куда сохранить JSON')
+    args = parser.parse_args()
+
+    db_path = setup_django(args.db)
+    migrate()
+    from django.core.management import call_command
+    from posts.models import Post
+    if not Post.objects.exists():
+        call_command('seed_data', scale=args.scale, stdout=sys.stderr)
+
+    from bench_views import reader, sample_kwargs
+    values = sample_kwargs()
+    # Обычный пост, а не самый обсуждаемый: страницу с тысячами
+    # комментариев ограничивает процессор, а не база.
+    post = Post.objects.order_by('-pub_date')[0]
+    urls = ['/', f'/profile/{values["username"]}/',
+            f'/group/{values["slug"]}/', f'/posts/{post.pk}/']
+    cookie = session_cookie(reader())
+
+    report = {}
+    for mode, loader_threads in (('sequential', 0),
+                                 ('concurrent', args.threads)):
+        process, port = start_server(db_path, loader_threads,
+                                     args.latency / 1000)
+        try:
+            report[mode] = {
+                clients: load(port, urls, cookie, int(clients),
+                              args.requests)
+                for clients in args.clients.split(',')
+            }
+        finally:
+            process.terminate()
+            process.wait()
+    write_results('concurrency', {
+        'latency_ms': args.latency, 'threads': args.threads,
+        'modes': report,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == [SERVE_FLAG]:
+        serve(sys.argv[2], int(sys.argv[3]), float(sys.argv[4]))
+    else:
+        main()
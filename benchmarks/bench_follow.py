@@ -0,0 +1,150 @@
+"""Стресс подписок: одновременные follow/unfollow одних и тех же пар.
+
+``--clients`` потоков (по два на читателя) ``--rounds`` раз подписываются
+дважды и отписываются от одного автора — как двойной клик и соседние
+вкладки. Сравниваются прежняя подписка (``exists()`` и ``create()`` в
+транзакции) и ``posts.timeline`` (один INSERT с пропуском конфликтов,
+один DELETE): ошибки по типам, операции в секунду и расхождение
+счётчиков с реальным числом подписок. Затем — подписка на
+``--authors`` авторов по одному и одним ``follow_many``.
+"""
+import argparse
+import sys
+import threading
+import time
+from collections import Counter
+
+from common import measure, migrate, setup_django, write_results
+
+
+def legacy_follow(user, author):
+    from django.db import transaction
+    from posts.models import Follow
+    from posts.timeline import backfill
+
+    with transaction.atomic():
+        if user == author or Follow.objects.filter(
+                user=user, author=author).exists():
+            return
+        Follow.objects.create(user=user, author=author, materialized=True)
+        backfill(user.id, [author.id])
+
+
+def legacy_unfollow(user, author):
+    from django.db import transaction
+    from posts.models import Follow, TimelineEntry
+
+    with transaction.atomic():
+        Follow.objects.filter(user=user, author=author).delete()
+        TimelineEntry.objects.filter(user=user, author=author).delete()
+
+
+def stress(follow, unfollow, author, readers, rounds):
+    from django.db import close_old_connections
+
+    errors = Counter()
+    operations = []
+    barrier = threading.Barrier(2 * len(readers))
+
+    def toggle(reader):
+        barrier.wait()
+        for _ in range(rounds):
+            for action in (follow, follow, unfollow):
+                try:
+                    action(reader, author)
+                    operations.append(1)
+                except Exception as error:
+                    errors[type(error).__name__] += 1
+        close_old_connections()
+
+    threads = [threading.Thread(target=toggle, args=(reader,))
+               for reader in readers * 2]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'operations_per_sec': len(operations) / elapsed,
+        'errors': dict(errors),
+        'counter_drift': drift(author),
+    }
+
+
+def drift(author):
+    """Счётчик подписчиков автора минус реальное число подписок."""
+    from posts.models import Follow, UserCounters
+
+    counted = UserCounters.objects.get(user=author).followers_count
+    return counted - Follow.objects.filter(author=author).count()
+
+
+def bulk(user, authors, repeat):
+    from posts import timeline
+    from posts.models import Follow
+
+    author_ids = [author.id for author in authors]
+
+    def reset():
+        for author in authors:
+            timeline.unfollow(user, author)
+
+    def one_by_one():
+        reset()
+        for author in authors:
+            timeline.follow(user, author)
+
+    def at_once():
+        reset()
+        timeline.follow_many(user, author_ids)
+
+    results = {'authors': len(authors)}
+    results['reset'] = measure(reset, repeat)
+    results['one_by_one'] = measure(one_by_one, repeat)
+    results['follow_many'] = measure(at_once, repeat)
+    results['followed'] = Follow.objects.filter(
+        user=user, author_id__in=author_ids).count()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', default='small',
+                        choices=('small', 'medium', 'large'))
+    parser.add_argument('--clients', type=int, default=4,
+                        help='читателей, у каждого два потока')
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--authors', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--db', help='путь к SQLite-базе бенчмарка')
+    parser.add_argument('--output', help='куда сохранить JSON')
+    args = parser.parse_args()
+
+    setup_django(args.db, METRICS_ENABLED=False)
+    migrate()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from posts import timeline
+    from posts.models import Post
+    if not Post.objects.exists():
+        call_command('seed_data', scale=args.scale, stdout=sys.stderr)
+
+    users = list(get_user_model().objects.order_by('pk')[
+        :args.clients + args.authors + 3])
+    readers, (old_author, new_author, bulk_user) = (
+        users[:args.clients], users[args.clients:args.clients + 3])
+    results = {
+        'clients': 2 * len(readers),
+        'rounds': args.rounds,
+        'legacy': stress(legacy_follow, legacy_unfollow, old_author,
+                         readers, args.rounds),
+        'statement': stress(timeline.follow, timeline.unfollow, new_author,
+                            readers, args.rounds),
+        'bulk': bulk(bulk_user, users[args.clients + 3:], args.repeat),
+    }
+    write_results('follow', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Планы запросов лент до и после составных индексов.
+
+Засевает SQLite-базу (по умолчанию 1 000 000 постов), снимает индексы
+из ``Post.Meta.indexes``/``Comment.Meta.indexes``, печатает
+``EXPLAIN QUERY PLAN`` и время запросов, затем возвращает индексы и
+повторяет замеры.
+"""
+import argparse
+import random
+from datetime import datetime, timedelta, timezone
+
+from common import measure, migrate, setup_django, write_results
+
+BATCH = 10000
+
+
+def seed(posts, users, groups, comments, follows):
+    from django.db import connection, transaction
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    rnd = random.Random(0)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO auth_user (id, password, is_superuser, username, '
+            'first_name, last_name, email, is_staff, is_active, date_joined) '
+            "VALUES (%s, '', 0, %s, '', '', '', 0, 1, %s)",
+            [(i, f'user{i}', start) for i in range(1, users + 1)],
+        )
+        cursor.executemany(
+            'INSERT INTO posts_group (id, title, slug, description, '
+            "posts_count) VALUES (%s, %s, %s, '', 0)",
+            [(i, f'Группа {i}', f'group-{i}') for i in range(1, groups + 1)],
+        )
+        for first in range(1, posts + 1, BATCH):
+            cursor.executemany(
+                'INSERT INTO posts_post (id, text, pub_date, author_id, '
+                "group_id, image, comments_count) VALUES (%s, %s, %s, %s, "
+                "%s, '', 0)",
+                [(i, f'Пост {i}', start + timedelta(seconds=i),
+                  rnd.randint(1, users),
+                  rnd.randint(1, groups) if i % 3 else None)
+                 for i in range(first, min(first + BATCH, posts + 1))],
+            )
+        cursor.executemany(
+            'INSERT INTO posts_comment (text, created, author_id, post_id) '
+            "VALUES ('Комментарий', %s, %s, %s)",
+            [(start + timedelta(seconds=i), rnd.randint(1, users),
+              rnd.randint(1, posts)) for i in range(comments)],
+        )
+        pairs = {(rnd.randint(1, users), rnd.randint(1, users))
+                 for _ in range(follows)}
+        cursor.executemany(
+            'INSERT INTO posts_follow (user_id, author_id, materialized) '
+            'VALUES (%s, %s, 0)',
+            [pair for pair in pairs if pair[0] != pair[1]],
+        )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def feed_queries():
+    from posts.models import Comment, Post
+    from posts.paginators import CursorPaginator
+
+    deep = Post.objects.order_by('pub_date', 'id')[1000]
+    paginator = CursorPaginator(Post.objects.all(), 10)
+    after = paginator._after((deep.pub_date, deep.id))
+    post = Post.objects.order_by('-comments_count').first()
+    return {
+        'index': paginator.object_list[:11],
+        'index_deep_cursor': paginator.object_list.filter(after)[:11],
+        'group': Post.objects.filter(group_id=1).order_by(
+            '-pub_date', '-id')[:11],
+        'profile': Post.objects.filter(author_id=1).order_by(
+            '-pub_date', '-id')[:11],
+        'follow_join': Post.objects.filter(
+            author__following__user_id=1).order_by('-pub_date', '-id')[:11],
+        'comments': Comment.objects.filter(post=post).order_by(
+            'created', 'id'),
+    }
+
+
+def explain(queries, repeat):
+    from django.db import connection
+    report = {}
+    for name, queryset in queries.items():
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        report[name] = {
+            'plan': plan,
+            'timing': measure(lambda: list(queryset.all()), repeat=repeat),
+        }
+    return report
+
+
+def feed_indexes():
+    from posts.models import Comment, Post
+    return [(model, index) for model in (Post, Comment)
+            for index in model._meta.indexes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--groups', type=int, default=100)
+    parser.add_argument('--comments', type=int, default=200000)
+    parser.add_argument('--follows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--db', help='путь к SQLite-базе бенчмарка')
+    parser.add_argument('--output', help='куда сохранить JSON')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    migrate()
+    seed(args.posts, args.users, args.groups, args.comments, args.follows)
+
+    from django.db import connection
+    indexes = feed_indexes()
+    with connection.schema_editor() as editor:
+        for model, index in indexes:
+            editor.remove_index(model, index)
+    before = explain(feed_queries(), args.repeat)
+    with connection.schema_editor() as editor:
+        for model, index in indexes:
+            editor.add_index(model, index)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    after = explain(feed_queries(), args.repeat)
+    write_results('indexes', {
+        'posts': args.posts,
+        'before': before,
+        'after': after,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
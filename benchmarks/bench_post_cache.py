@@ -0,0 +1,118 @@
+"""Страница популярного поста: кэш данных поста и защита от «стаи» промахов.
+
+Открывает самый обсуждаемый пост гостем и читателем с кэшем данных поста
+(``posts.caching.cached_post``) и без него (DummyCache), считает время и
+SQL-запросы на запрос. Затем ``--clients`` потоков одновременно
+открывают пост сразу после сброса его версии: считается, сколько раз
+данные поста строились заново (без замка — почти по разу на поток).
+"""
+import argparse
+import sys
+import threading
+
+from common import measure, migrate, setup_django, write_results
+
+CACHES = {
+    'cached': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'uncached': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+def hot_reads(url, user, repeat):
+    from django.test import Client
+
+    from core import metrics
+
+    results = {}
+    for name, login in (('guest', False), ('reader', True)):
+        client = Client()
+        if login:
+            client.force_login(user)
+        client.get(url)
+        # Запросы считают метрики: они видят и потоки core.concurrency.
+        # Сбор middleware выключен (METRICS_ENABLED), иначе запрос
+        # считался бы в его словарь.
+        with metrics.collect() as values:
+            client.get(url)
+        results[name] = {
+            'request': measure(lambda: client.get(url), repeat),
+            'queries': values['sql_count'],
+        }
+    return results
+
+
+def stampede(url, post_id, clients, rounds):
+    from django.db import close_old_connections
+    from django.test import Client
+    from posts import caching, views
+
+    original = views.load_post
+    builds = []
+
+    def load_post(post_id):
+        builds.append(1)
+        return original(post_id)
+
+    def open_post(barrier):
+        barrier.wait()
+        Client().get(url)
+        close_old_connections()
+
+    views.load_post = load_post
+    try:
+        per_round = []
+        for _ in range(rounds):
+            caching.invalidate_post(post_id)
+            builds.clear()
+            barrier = threading.Barrier(clients)
+            threads = [threading.Thread(target=open_post, args=(barrier,))
+                       for _ in range(clients)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            per_round.append(len(builds))
+    finally:
+        views.load_post = original
+    return {'clients': clients, 'builds_per_round': per_round}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', default='small',
+                        choices=('small', 'medium', 'large'))
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--db', help='путь к SQLite-базе бенчмарка')
+    parser.add_argument('--output', help='куда сохранить JSON')
+    args = parser.parse_args()
+
+    setup_django(args.db, CACHES={
+        'default': CACHES['cached'],
+        'thumbnails': CACHES['cached'],
+    }, THUMBNAIL_CACHE='thumbnails', METRICS_ENABLED=False)
+    migrate()
+    from django.core.management import call_command
+    from django.test.utils import override_settings
+    from django.urls import reverse
+    from posts.models import Post
+    if not Post.objects.exists():
+        call_command('seed_data', scale=args.scale, stdout=sys.stderr)
+
+    from bench_views import reader, sample_kwargs
+    post_id = sample_kwargs()['post_id']
+    url = reverse('posts:post_detail', kwargs={'post_id': post_id})
+    results = {'post_id': post_id}
+    for mode, backend in CACHES.items():
+        with override_settings(CACHES={'default': backend,
+                                       'thumbnails': CACHES['cached']}):
+            results[mode] = hot_reads(url, reader(), args.repeat)
+    results['stampede'] = stampede(url, post_id, args.clients, args.rounds)
+    write_results('post_cache', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
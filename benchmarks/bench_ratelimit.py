@@ -0,0 +1,72 @@
+"""Цена проверки ``core.ratelimit`` на запрос.
+
+Вызывает ``ratelimit.check`` для запроса авторизованного пользователя —
+два счётчика, по пользователю и по IP — с кэшем ``locmem`` и ``sqlite``
+за обёрткой метрик, как в настройках проекта. Бюджет не исчерпывается:
+меряется обычный путь. Время одного вызова — в микросекундах.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from common import percentile, setup_django, write_results
+
+BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sqlite': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(tempfile.mkdtemp(prefix='yatube-rate-'),
+                                 'cache.sqlite3'),
+    },
+}
+
+
+def run(calls):
+    from django.contrib.auth.models import User
+    from django.test import RequestFactory
+
+    from core import ratelimit
+
+    request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.1')
+    request.user = User(pk=1)
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        ratelimit.check(request, 'bench')
+        samples.append(time.perf_counter() - started)
+    return {
+        'calls': calls,
+        'mean_us': 1e6 * sum(samples) / calls,
+        'p50_us': 1e6 * percentile(samples, 0.50),
+        'p95_us': 1e6 * percentile(samples, 0.95),
+        'p99_us': 1e6 * percentile(samples, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--output', help='куда сохранить JSON')
+    args = parser.parse_args()
+
+    budget = (10 ** 9, 60)
+    setup_django(RATE_LIMITS={'bench': {'user': budget, 'ip': budget}})
+    from django.test.utils import override_settings
+
+    results = {}
+    for name, backend in BACKENDS.items():
+        with override_settings(CACHES={
+            'default': {'BACKEND': 'core.metrics.MeasuredCache',
+                        'LOCATION': 'backend'},
+            'backend': backend,
+        }):
+            run(100)
+            results[name] = run(args.calls)
+    write_results('ratelimit', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
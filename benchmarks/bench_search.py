@@ -0,0 +1,98 @@
+"""Полнотекстовый поиск (FTS5) против ``LIKE '%...%'`` по тексту постов.
+
+Засевает SQLite-базу (по умолчанию 1 000 000 постов) текстами из
+словаря с частотами по закону Ципфа, строит индекс и замеряет первую
+страницу поиска и ``count()`` для редкого, среднего и частого слова
+(частое есть в каждом десятом посте).
+"""
+import argparse
+import itertools
+import random
+from datetime import datetime, timedelta, timezone
+
+from common import measure, migrate, setup_django, write_results
+
+BATCH = 10000
+SYLLABLES = ('ка', 'ло', 'ми', 'ну', 'ро', 'се', 'та', 'ви', 'до', 'же',
+             'зо', 'пи', 'ры', 'шу', 'ле', 'вор', 'мак', 'тин', 'раз', 'пол')
+ENDINGS = ('', 'а', 'ы', 'ой', 'ами', 'ах', 'ов', 'ом', 'е', 'ку')
+
+
+def vocabulary(size, rnd):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rnd.choice(SYLLABLES)
+                          for _ in range(rnd.randint(2, 4))))
+    return sorted(words)
+
+
+def seed(posts, words, rnd):
+    from django.db import connection, transaction
+    from posts import search
+
+    stems = vocabulary(words, rnd)
+    weights = list(itertools.accumulate(
+        1 / rank for rank in range(1, len(stems) + 1)))
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO auth_user (id, password, is_superuser, username, '
+            'first_name, last_name, email, is_staff, is_active, date_joined) '
+            "VALUES (1, '', 0, 'author', '', '', '', 0, 1, %s)", [start])
+        for first in range(1, posts + 1, BATCH):
+            rows = [
+                (i, ' '.join(stem + rnd.choice(ENDINGS) for stem in
+                             rnd.choices(stems, cum_weights=weights,
+                                         k=12)),
+                 start + timedelta(seconds=i))
+                for i in range(first, min(first + BATCH, posts + 1))
+            ]
+            cursor.executemany(
+                'INSERT INTO posts_post (id, text, pub_date, author_id, '
+                "group_id, image, comments_count) VALUES (%s, %s, %s, 1, "
+                "NULL, '', 0)", rows)
+            search.fill(cursor, ((i, text) for i, text, _ in rows))
+        cursor.execute(f"INSERT INTO {search.TABLE} ({search.TABLE}) "
+                       f"VALUES ('optimize')")
+    # Слова по убыванию частоты. Самые первые встречаются в каждом втором
+    # посте — это аналог служебных слов, которые в индекс не попадают.
+    return {'common': stems[5], 'medium': stems[len(stems) // 20],
+            'rare': stems[-1]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--db', help='путь к SQLite-базе бенчмарка')
+    parser.add_argument('--output', help='куда сохранить JSON')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    migrate()
+    queries = seed(args.posts, args.words, random.Random(0))
+
+    from posts.models import Post
+    from posts.search import SearchResults
+
+    report = {}
+    for name, word in queries.items():
+        results = SearchResults(word + 'ами')
+        report[name] = {
+            'word': word,
+            'matches': results.count(),
+            'fts_first_page': measure(lambda: results[:10],
+                                      repeat=args.repeat),
+            'fts_count': measure(results.count, repeat=args.repeat),
+            'like_first_page': measure(
+                lambda: list(Post.objects.filter(
+                    text__contains=word).order_by('-pub_date')[:10]),
+                repeat=args.repeat),
+        }
+    write_results('search', {'posts': args.posts, 'queries': report},
+                  args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Одновременные чтения и записи SQLite в нескольких процессах.
+
+Процессы-читатели открывают ленту и считают комментарии поста,
+процессы-писатели добавляют комментарии — как воркеры под ``/`` и
+``add_comment``. После каждой операции соединение закрывается по
+``CONN_MAX_AGE``, как в конце запроса. Сравнивает журнал отката без
+переиспользования соединений (``rollback``) с профилем из настроек:
+``SQLITE_PRAGMAS`` и ``CONN_MAX_AGE`` (``production``).
+"""
+import argparse
+import multiprocessing
+import random
+import sys
+import time
+
+from common import migrate, setup_django, summarize, write_results
+
+PROFILES = {
+    'rollback': ({'journal_mode': 'delete', 'synchronous': 'full'}, 0),
+    'production': (None, 60),
+}
+
+
+def worker(role, seconds, seed, post_ids, author_ids, results):
+    from django.db import OperationalError, close_old_connections
+    from posts.models import Comment, Post
+
+    rnd = random.Random(seed)
+
+    def read():
+        list(Post.objects.select_related('author', 'group')
+             .order_by('-pub_date')[:10])
+        Comment.objects.filter(post_id=rnd.choice(post_ids)).count()
+
+    def write():
+        Comment.objects.create(post_id=rnd.choice(post_ids),
+                               author_id=rnd.choice(author_ids),
+                               text='Нагрузочный комментарий')
+
+    action = read if role == 'reader' else write
+    samples, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            action()
+        except OperationalError:
+            errors += 1
+        else:
+            samples.append(time.perf_counter() - started)
+        close_old_connections()
+    results.put((role, samples, errors))
+
+
+def run(profile, readers, writers, seconds, post_ids, author_ids):
+    from django.conf import settings
+    from django.db import connection
+
+    pragmas, max_age = PROFILES[profile]
+    if pragmas is not None:
+        settings.SQLITE_PRAGMAS = pragmas
+    settings.DATABASES['default']['CONN_MAX_AGE'] = max_age
+    # Режим журнала хранится в файле базы: переключаем его одним
+    # соединением до запуска воркеров.
+    connection.ensure_connection()
+    connection.close()
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    roles = ['reader'] * readers + ['writer'] * writers
+    workers = [
+        context.Process(target=worker, args=(
+            role, seconds, seed, post_ids, author_ids, results))
+        for seed, role in enumerate(roles)
+    ]
+    for process in workers:
+        process.start()
+    collected = [results.get() for _ in workers]
+    for process in workers:
+        process.join()
+
+    report = {}
+    for role in ('reader', 'writer'):
+        samples = [sample for name, values, _ in collected if name == role
+                   for sample in values]
+        report[role] = dict(
+            summarize(samples),
+            per_second=len(samples) / seconds,
+            errors=sum(errors for name, _, errors in collected
+                       if name == role))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', default='small',
+                        choices=('small', 'medium', 'large'))
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--db', help='путь к SQLite-базе бенчмарка')
+    parser.add_argument('--output', help='куда сохранить JSON')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    migrate()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.db import connection
+    from posts.models import Post
+    if not Post.objects.exists():
+        call_command('seed_data', scale=args.scale, stdout=sys.stderr)
+    post_ids = list(Post.objects.values_list('pk', flat=True)[:1000])
+    author_ids = list(
+        get_user_model().objects.values_list('pk', flat=True)[:1000])
+    connection.close()
+
+    write_results('sqlite', {
+        'readers': args.readers, 'writers': args.writers,
+        'seconds': args.seconds,
+        'profiles': {
+            profile: run(profile, args.readers, args.writers, args.seconds,
+                         post_ids, author_ids)
+            for profile in PROFILES
+        },
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
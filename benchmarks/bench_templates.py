@@ -0,0 +1,156 @@
+"""Время отрисовки шаблонов лент: по шаблону и по подключаемому фрагменту.
+
+Открывает ленты (главная, группа, профиль, подписки) при 10, 50 и 100
+постах на странице с загрузчиками шаблонов без кэша и с кэшем
+скомпилированных шаблонов (``cached.Loader``). Кэш Django отключён,
+чтобы фрагменты ``{% cache %}`` рисовались каждый раз (у
+sorl-thumbnail свой кэш). Для каждого
+шаблона — число отрисовок и время на запрос: полное (с вложенными
+шаблонами) и собственное.
+"""
+import argparse
+import sys
+import time
+from collections import defaultdict
+
+from common import migrate, setup_django, summarize, write_results
+
+PAGE_SIZES = (10, 50, 100)
+LOADERS = ['django.template.loaders.filesystem.Loader',
+           'django.template.loaders.app_directories.Loader']
+
+
+class RenderProfile:
+    """Собирает время ``Template._render`` по именам шаблонов."""
+
+    def __init__(self):
+        self.calls = defaultdict(int)
+        self.total = defaultdict(float)
+        self.own = defaultdict(float)
+        self._stack = []
+
+    def install(self):
+        from django.template import base
+
+        original = base.Template._render
+        profile = self
+
+        def _render(template, context):
+            # Время вложенных шаблонов вычитается из собственного.
+            profile._stack.append(0.0)
+            started = time.perf_counter()
+            try:
+                return original(template, context)
+            finally:
+                elapsed = time.perf_counter() - started
+                children = profile._stack.pop()
+                if profile._stack:
+                    profile._stack[-1] += elapsed
+                profile.calls[template.name] += 1
+                profile.total[template.name] += elapsed
+                profile.own[template.name] += elapsed - children
+
+        base.Template._render = _render
+
+    def reset(self):
+        self.calls.clear()
+        self.total.clear()
+        self.own.clear()
+
+    def report(self, requests):
+        return {
+            name: {
+                'calls': self.calls[name] / requests,
+                'total_ms': 1000 * self.total[name] / requests,
+                'own_ms': 1000 * self.own[name] / requests,
+            }
+            for name in sorted(self.total, key=self.total.get, reverse=True)
+        }
+
+
+def templates_setting(cached):
+    from django.conf import settings
+
+    options = dict(settings.TEMPLATES[0]['OPTIONS'])
+    options['loaders'] = ([('django.template.loaders.cached.Loader',
+                            LOADERS)] if cached else LOADERS)
+    return [dict(settings.TEMPLATES[0], APP_DIRS=False, OPTIONS=options)]
+
+
+def feed_urls():
+    from django.urls import reverse
+
+    from bench_views import sample_kwargs
+    values = sample_kwargs()
+    return {
+        'index': reverse('posts:index'),
+        'group': reverse('posts:group_posts',
+                         kwargs={'slug': values['slug']}),
+        'profile': reverse('posts:profile',
+                           kwargs={'username': values['username']}),
+        'follow': reverse('posts:follow_index'),
+    }
+
+
+def run(profile, user, repeat):
+    from django.test import Client
+    from posts import views
+
+    client = Client()
+    client.force_login(user)
+    results = {}
+    for size in PAGE_SIZES:
+        views.NUM_POST = size
+        for name, url in feed_urls().items():
+            client.get(url)
+            profile.reset()
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                response = client.get(url)
+                samples.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f'{url}: {response.status_code}')
+            results[f'{name}/{size}'] = {
+                'request': summarize(samples),
+                'templates': profile.report(repeat),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', default='small',
+                        choices=('small', 'medium', 'large'))
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--db', help='путь к SQLite-базе бенчмарка')
+    parser.add_argument('--output', help='куда сохранить JSON')
+    args = parser.parse_args()
+
+    # Кэш фрагментов и страниц выключен, кэш sorl-thumbnail — нет: иначе
+    # каждая картинка читала бы хранилище ключей из базы.
+    setup_django(args.db, CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+        'thumbnails': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    }, THUMBNAIL_CACHE='thumbnails')
+    migrate()
+    from django.core.management import call_command
+    from django.test.utils import override_settings
+    from posts.models import Post
+    if not Post.objects.exists():
+        call_command('seed_data', scale=args.scale, stdout=sys.stderr)
+
+    from bench_views import reader
+    profile = RenderProfile()
+    profile.install()
+    results = {}
+    for mode, cached in (('uncached', False), ('cached', True)):
+        with override_settings(TEMPLATES=templates_setting(cached)):
+            results[mode] = run(profile, reader(), args.repeat)
+    write_results('templates', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Задержка, число SQL-запросов и память для всех адресов posts, users, about.
+
+Засевает базу командой ``seed_data`` и для каждого адреса из
+``posts/urls.py``, ``users/urls.py`` и ``about/urls.py`` замеряет гостя и
+авторизованного читателя: p50/p95/p99, первый (холодный) запрос, число
+запросов к БД и пик памяти (tracemalloc) за запрос. Результат — JSON;
+``--compare`` сравнивает его с прошлым прогоном и завершается с кодом 1,
+если p50 вырос больше порога или стало больше запросов.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from common import ROOT_DIR, migrate, setup_django, summarize, write_results
+
+NAMESPACES = ('posts', 'users', 'about')
+MODES = ('guest', 'user')
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def sample_kwargs():
+    """Значения параметров адресов: самые «тяжёлые» объекты базы."""
+    from django.contrib.auth import get_user_model
+    from posts.models import Group, Post
+
+    author = get_user_model().objects.order_by(
+        '-counters__followers_count').first()
+    return {
+        'username': author.username,
+        'slug': Group.objects.order_by('-posts_count').first().slug,
+        'post_id': Post.objects.order_by('-comments_count').first().pk,
+    }
+
+
+def url_patterns():
+    """(имя, адрес) для всех адресов приложений из ``NAMESPACES``."""
+    from django.urls import get_resolver, reverse
+
+    values = sample_kwargs()
+    for resolver in get_resolver().url_patterns:
+        namespace = getattr(resolver, 'namespace', None)
+        if namespace not in NAMESPACES:
+            continue
+        for pattern in resolver.url_patterns:
+            name = f'{namespace}:{pattern.name}'
+            kwargs = {key: values[key]
+                      for key in pattern.pattern.converters}
+            yield name, reverse(name, kwargs=kwargs)
+
+
+def reader():
+    """Читатель с самым большим числом подписок."""
+    from django.contrib.auth import get_user_model
+    return get_user_model().objects.order_by(
+        '-counters__following_count').first()
+
+
+def measure_url(url, user, repeat):
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client()
+
+    def get():
+        # Выход и подписки меняют состояние клиента: входим заново перед
+        # каждым запросом, вне замера.
+        if user is not None:
+            client.force_login(user)
+        started = time.perf_counter()
+        response = client.get(url)
+        return response, time.perf_counter() - started
+
+    response, first = get()
+    samples = [get()[1] for _ in range(repeat)]
+    if user is not None:
+        client.force_login(user)
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries:
+        client.get(url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'status': response.status_code,
+        'first_ms': 1000 * first,
+        **summarize(samples),
+        'queries': len(queries),
+        'peak_kib': peak / 1024,
+    }
+
+
+def compare(results, previous_path, threshold, min_delta):
+    """Печатает изменения против прошлого прогона; True — есть регрессии."""
+    with open(previous_path, encoding='utf-8') as stream:
+        previous = json.load(stream)['results']['urls']
+    regressions = []
+    for name, measured in results['urls'].items():
+        for mode in MODES:
+            current = measured[mode]
+            old = previous.get(name, {}).get(mode)
+            if old is None:
+                continue
+            change = (current['p50_ms'] - old['p50_ms']) / max(
+                old['p50_ms'], 1e-9)
+            line = (f'{name} [{mode}]: p50 {old["p50_ms"]:.2f} -> '
+                    f'{current["p50_ms"]:.2f} ms ({change:+.0%}), '
+                    f'запросов {old["queries"]} -> {current["queries"]}')
+            print(line, file=sys.stderr)
+            slower = (change > threshold
+                      and current['p50_ms'] - old['p50_ms'] > min_delta)
+            if slower or current['queries'] > old['queries']:
+                regressions.append(line)
+    for line in regressions:
+        print('РЕГРЕССИЯ:', line, file=sys.stderr)
+    return bool(regressions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', default='small',
+                        choices=('small', 'medium', 'large'))
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--db', help='путь к SQLite-базе бенчмарка')
+    parser.add_argument('--no-seed', action='store_true',
+                        help='база из --db уже засеяна')
+    parser.add_argument('--output', help='куда сохранить JSON')
+    parser.add_argument('--compare', help='JSON прошлого прогона')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='допустимый рост p50, доля (0.2 = 20%%)')
+    parser.add_argument('--min-delta', type=float, default=1.0,
+                        help='рост p50 меньше стольких мс — шум')
+    args = parser.parse_args()
+
+    setup_django(args.db, ALLOWED_HOSTS=['testserver'],
+                 MEDIA_ROOT=tempfile.mkdtemp(prefix='yatube-media-'),
+                 THUMBNAIL_WORKERS=0)
+    from django.core.management import call_command
+    if not args.no_seed:
+        migrate()
+        call_command('seed_data', scale=args.scale)
+        call_command('warm_thumbnails', workers=0)
+
+    user = reader()
+    urls = {}
+    for name, url in url_patterns():
+        urls[name] = {
+            'url': url,
+            'guest': measure_url(url, None, args.repeat),
+            'user': measure_url(url, user, args.repeat),
+        }
+    results = {'commit': git_commit(), 'scale': args.scale, 'urls': urls}
+    write_results('views', results, args.output)
+    if args.compare and compare(results, args.compare, args.threshold,
+                                args.min_delta):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
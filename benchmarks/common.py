@@ -0,0 +1,80 @@
+"""Общая обвязка бенчмарков: настройка Django, замеры, вывод результатов.
+
+Бенчмарки запускаются из корня репозитория, например::
+
+    python benchmarks/bench_indexes.py --posts 1000000
+
+и работают с отдельной SQLite-базой, а не с ``yatube/db.sqlite3``.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.join(ROOT_DIR, 'yatube')
+
+
+def setup_django(db_path=None, **overrides):
+    """Настраивает Django на базу ``db_path`` (по умолчанию временную)."""
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    from django.conf import settings
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='yatube-bench-'),
+                               'bench.sqlite3')
+    settings.DATABASES['default']['NAME'] = db_path
+    settings.DEBUG = False
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    import django
+    django.setup()
+    return db_path
+
+
+def migrate():
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples):
+    """p50/p95/p99/среднее по замерам в секундах, результат в миллисекундах."""
+    return {
+        'runs': len(samples),
+        'mean_ms': 1000 * sum(samples) / len(samples) if samples else 0.0,
+        'p50_ms': 1000 * percentile(samples, 0.50),
+        'p95_ms': 1000 * percentile(samples, 0.95),
+        'p99_ms': 1000 * percentile(samples, 0.99),
+    }
+
+
+def measure(func, repeat=20, warmup=2):
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def write_results(name, results, output=None):
+    """Печатает результаты и, если задан ``output``, сохраняет их в JSON."""
+    payload = {'benchmark': name, 'created': time.time(), 'results': results}
+    text = json.dumps(payload, ensure_ascii=False, indent=2, default=str)
+    if output:
+        with open(output, 'w', encoding='utf-8') as stream:
+            stream.write(text)
+    print(text)
+    return payload
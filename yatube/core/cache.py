@@ -0,0 +1,237 @@
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+import warnings
+
+from django.core.cache.backends.base import (
+    DEFAULT_TIMEOUT, MEMCACHE_MAX_KEY_LENGTH, BaseCache, CacheKeyWarning,
+)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+# Символы, недопустимые в ключах memcached: управляющие и пробел.
+_bad_key_chars = re.compile(r'[\x00-\x20\x7f]')
+# UPDATE ... RETURNING появился в SQLite 3.35.
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35)
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite, общий для всех процессов-воркеров на машине.
+
+    В отличие от ``LocMemCache`` запись и сброс ключа видны сразу всем
+    воркерам, а внешний сервис (memcached, redis) не нужен. Файл открыт
+    в режиме WAL с отображением в память (``mmap_size``), поэтому чтения
+    не блокируют друг друга и писателя. При переполнении вытесняются
+    давно не читанные ключи (LRU): время доступа обновляется не чаще раза
+    в ``LRU_RESOLUTION`` секунд, чтобы чтение почти никогда не писало.
+
+    Опции (``OPTIONS``): ``MAX_ENTRIES``, ``CULL_FREQUENCY`` — как у
+    встроенных бэкендов; ``MMAP_SIZE``, ``BUSY_TIMEOUT``, ``LRU_RESOLUTION``.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._mmap_size = int(options.get('MMAP_SIZE', 256 * 1024 * 1024))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._lru_resolution = float(options.get('LRU_RESOLUTION', 1))
+        self._cull_every = max(1, self._max_entries // 100)
+        self._local = threading.local()
+
+    @property
+    def _conn(self):
+        # Соединение своё у каждого потока и процесса: после fork()
+        # унаследованное соединение SQLite использовать нельзя.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=self._busy_timeout,
+                                   isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA mmap_size={self._mmap_size}')
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._local.sets = 0
+        return conn
+
+    @staticmethod
+    def _dump(value):
+        # Целые храним как есть: так incr() атомарно считает в SQL.
+        if type(value) is int:
+            return value
+        return sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def _load(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def validate_key(self, key):
+        # Те же предупреждения, что у BaseCache, но без цикла по символам
+        # на Python: он дороже самого запроса к SQLite.
+        if len(key) > MEMCACHE_MAX_KEY_LENGTH:
+            warnings.warn(
+                f'Cache key will cause errors if used with memcached: '
+                f'{key!r} (longer than {MEMCACHE_MAX_KEY_LENGTH})',
+                CacheKeyWarning)
+        if _bad_key_chars.search(key):
+            warnings.warn(
+                f'Cache key contains characters that will cause errors if '
+                f'used with memcached: {key!r}', CacheKeyWarning)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _touch_accessed(self, keys, now):
+        self._conn.execute(
+            f'UPDATE cache SET accessed = ? WHERE accessed < ? AND key IN '
+            f'({",".join("?" * len(keys))})',
+            (now, now - self._lru_resolution, *keys),
+        )
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        made = {self._key(key, version): key for key in keys}
+        now = time.time()
+        rows = self._conn.execute(
+            f'SELECT key, value, accessed FROM cache WHERE key IN '
+            f'({",".join("?" * len(made))}) '
+            f'AND (expires IS NULL OR expires > ?)',
+            (*made, now),
+        ).fetchall()
+        stale = [key for key, _, accessed in rows
+                 if accessed < now - self._lru_resolution]
+        if stale:
+            self._touch_accessed(stale, now)
+        return {made[key]: self._load(value) for key, value, _ in rows}
+
+    def _write(self, sql, key, value, timeout, *params):
+        now = time.time()
+        cursor = self._conn.execute(
+            sql, (key, self._dump(value), self.get_backend_timeout(timeout),
+                  now, *params))
+        self._local.sets += 1
+        if self._local.sets % self._cull_every == 0:
+            self._cull(now)
+        return cursor.rowcount
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write(
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?)',
+            self._key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # Вставка или замена только просроченного значения одним
+        # оператором: между процессами add() атомарен.
+        return bool(self._write(
+            'INSERT INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            self._key(key, version), value, timeout, time.time()))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for key, value in data.items():
+                self.set(key, value, timeout, version=version)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._conn.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), self._key(key, version),
+             time.time()),
+        )
+        return bool(cursor.rowcount)
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            placeholders = ','.join('?' * len(keys))
+            self._conn.execute(
+                f'DELETE FROM cache WHERE key IN ({placeholders})', keys)
+
+    def has_key(self, key, version=None):
+        return self._conn.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time()),
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        made = self._key(key, version)
+        conn = self._conn
+        update = ('UPDATE cache SET value = value + ? WHERE key = ? '
+                  "AND typeof(value) = 'integer' "
+                  'AND (expires IS NULL OR expires > ?)')
+        params = (delta, made, time.time())
+        if HAS_RETURNING:
+            # Один оператор: атомарен и без явной транзакции.
+            row = conn.execute(update + ' RETURNING value',
+                               params).fetchone()
+        else:
+            # UPDATE и чтение результата в одной пишущей транзакции:
+            # другой процесс не вклинится между ними.
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                updated = conn.execute(update, params).rowcount
+                row = updated and conn.execute(
+                    'SELECT value FROM cache WHERE key = ?',
+                    (made,)).fetchone()
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+        if not row:
+            raise ValueError(f"Key '{key}' not found")
+        return row[0]
+
+    def clear(self):
+        self._conn.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение переживает запрос: открывать файл заново дорого.
+        pass
+
+    def _cull(self, now):
+        conn = self._conn
+        conn.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            doomed = (count if self._cull_frequency == 0
+                      else count // self._cull_frequency)
+            conn.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY accessed LIMIT ?)', (doomed,))
@@ -0,0 +1,65 @@
+"""Сжатие ответов по Accept-Encoding: brotli, если установлен, или gzip.
+
+``GZipMiddleware`` сжимает всё подряд и не знает brotli; здесь сжимает
+сам view и только то, что стоит сжимать (см. ``COMPRESS_MIN_SIZE``).
+brotli — необязательная зависимость: без пакета ``brotli`` отдаётся gzip.
+"""
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_token_re = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*')
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding с ненулевым q."""
+    accepted = set()
+    for item in header.split(','):
+        match = _token_re.fullmatch(item)
+        if not match:
+            continue
+        name, quality = match.groups()
+        try:
+            if quality is not None and float(quality) <= 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(name.lower())
+    return accepted
+
+
+def negotiate(request):
+    """Кодировка ответа на запрос: 'br', 'gzip' или None."""
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(request, response):
+    """Сжимает тело ``response``, если клиент это принимает и оно велико."""
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if (response.streaming or response.has_header('Content-Encoding')
+            or len(response.content) < settings.COMPRESS_MIN_SIZE):
+        return response
+    encoding = negotiate(request)
+    if encoding == 'br':
+        content = brotli.compress(response.content,
+                                  quality=settings.BROTLI_QUALITY)
+    elif encoding == 'gzip':
+        content = compress_string(response.content)
+    else:
+        return response
+    response.content = content
+    response['Content-Length'] = str(len(content))
+    response['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,77 @@
+"""Одновременная загрузка независимых данных view.
+
+Django 2.2 не умеет async-view и ASGI, поэтому ожидания базы внутри
+запроса перекрываются потоками: у каждого потока своё соединение.
+Выигрыш есть, когда запрос к базе ждёт сеть или диск, а не процессор;
+для локального SQLite пул можно выключить: ``VIEW_LOADER_THREADS = 0``.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from . import metrics, routers
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(settings.VIEW_LOADER_THREADS,
+                                           thread_name_prefix='view-loader')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _run(loader, replica, measured):
+    # Поток пула наследует реплику запроса, метрики копит отдельно:
+    # их прибавит поток запроса.
+    values = dict.fromkeys(metrics.METRICS, 0) if measured else None
+    routers.use_replica(replica)
+    try:
+        with metrics.collect_into(values):
+            return loader(), values
+    finally:
+        routers.reset()
+        # Как в конце запроса: соединение потока закрывается по
+        # CONN_MAX_AGE, а не живёт вместе с потоком.
+        close_old_connections()
+
+
+def gather(*loaders):
+    """Вызывает независимые ``loaders`` одновременно, результаты — по порядку.
+
+    ``None`` вместо загрузчика даёт ``None`` в результатах. Первый
+    загрузчик выполняется в текущем потоке, остальные — в пуле; исключение
+    любого из них поднимается после завершения всех. Внутри транзакции
+    всё выполняется по очереди: другие соединения её данных не видят.
+    """
+    calls = [(index, loader) for index, loader in enumerate(loaders)
+             if loader is not None]
+    results = [None] * len(loaders)
+    if (len(calls) < 2 or not settings.VIEW_LOADER_THREADS
+            or connection.in_atomic_block):
+        for index, loader in calls:
+            results[index] = loader()
+        return results
+    executor = _get_executor()
+    replica = routers.current_replica()
+    measured = metrics.current() is not None
+    (first_index, first), *rest = calls
+    futures = [(index, executor.submit(_run, loader, replica, measured))
+               for index, loader in rest]
+    try:
+        results[first_index] = first()
+    finally:
+        wait([future for _, future in futures])
+    for index, future in futures:
+        results[index], values = future.result()
+        if values is not None:
+            metrics.merge(values)
+    return results
@@ -0,0 +1,20 @@
+"""Настройка соединений SQLite при открытии.
+
+Режим журнала WAL не даёт писателям (``add_comment``, ``post_create``)
+блокировать читателей, ``synchronous=NORMAL`` в этом режиме не теряет
+согласованность базы при сбое, ``busy_timeout`` заставляет писателей
+подождать друг друга вместо ошибки «database is locked». Значения берутся
+из ``SQLITE_PRAGMAS``; соединения живут между запросами по
+``CONN_MAX_AGE``, так что настройка выполняется не на каждый запрос.
+"""
+from django.conf import settings
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Применяет ``SQLITE_PRAGMAS`` к новому соединению SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    # Через соединение sqlite3 напрямую: служебные запросы не попадают в
+    # метрики и бюджеты запросов view.
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
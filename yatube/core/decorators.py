@@ -0,0 +1,21 @@
+def query_budget(queries):
+    """Объявляет, сколько SQL-запросов может сделать view за один запрос.
+
+    Бюджет считается для авторизованного пользователя, вместе с чтением
+    сессии и пользователя, и не должен расти с числом объектов на странице.
+    Проверяется тестами (см. ``posts/tests/test_queries.py``).
+    """
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+def replica_reads(view):
+    """Разрешает читать данные view с реплик (см. ``core/routers.py``).
+
+    Только для view, которые ничего не пишут в базу и могут показать
+    данные с отставанием на время репликации.
+    """
+    view.replica_reads = True
+    return view
@@ -0,0 +1,70 @@
+import sqlite3
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def snapshot(path):
+    """Согласованная копия базы ``path`` в памяти."""
+    source = sqlite3.connect(path)
+    copy = sqlite3.connect(':memory:')
+    try:
+        source.backup(copy)
+    finally:
+        source.close()
+    return copy
+
+
+def restore(copy, path):
+    target = sqlite3.connect(path, timeout=30)
+    try:
+        copy.backup(target)
+    finally:
+        target.close()
+
+
+class Command(BaseCommand):
+    help = ('Модель асинхронной репликации для локальной проверки: '
+            'копирует основную SQLite-базу в файлы реплик '
+            '(YATUBE_DB_REPLICAS) с заданным отставанием.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lag', type=float, default=2.0,
+                            help='Отставание реплик, секунды.')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Как часто снимать копию основной базы.')
+        parser.add_argument('--once', action='store_true',
+                            help='Одна копия с отставанием --lag и выход.')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены: задайте '
+                               'YATUBE_DB_REPLICAS.')
+        lag = options['lag']
+        if lag >= settings.REPLICA_MAX_LAG:
+            self.stderr.write(self.style.WARNING(
+                f'Отставание {lag} с не меньше REPLICA_MAX_LAG: после '
+                f'записи читатели увидят старые данные.'))
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+        replicas = [connections[alias].settings_dict['NAME']
+                    for alias in settings.DATABASE_REPLICAS]
+        # Копии ждут своей очереди: реплика получает состояние основной
+        # базы, каким оно было lag секунд назад.
+        pending = deque()
+        while True:
+            pending.append((time.monotonic() + lag, snapshot(primary)))
+            if options['once']:
+                time.sleep(lag)
+            while pending and pending[0][0] <= time.monotonic():
+                _, copy = pending.popleft()
+                for path in replicas:
+                    restore(copy, path)
+                copy.close()
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Реплики обновлены: {", ".join(replicas)}.'))
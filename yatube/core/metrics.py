@@ -0,0 +1,241 @@
+"""Метрики запросов по имени view, без внешних сервисов.
+
+``MetricsMiddleware`` (см. ``core/middleware.py``) на время запроса
+включает сбор: время SQL-запросов считает ``execute_wrapper`` соединения,
+время шаблонов — бэкенд ``MeasuredTemplates``, попадания и промахи
+кэша — обёртка ``MeasuredCache``, остальное — вызовы ``count()``. Итоги
+запроса попадают в гистограммы процесса ``registry``.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import connections
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('wall_ms', 'sql_count', 'sql_ms', 'template_ms', 'cache_hits',
+           'cache_misses', 'thumbnails')
+# Границы корзин гистограмм: 0 и степени двойки от 0.1 до ~26 000 —
+# миллисекунды и штуки с точностью до раза в два.
+BOUNDS = (0.0,) + tuple(0.1 * 2 ** power for power in range(19))
+
+_local = threading.local()
+_missing = object()
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def percentile(self, fraction):
+        """Верхняя граница корзины, в которую попал перцентиль."""
+        rank = fraction * self.count
+        seen = 0
+        for index, number in enumerate(self.buckets):
+            seen += number
+            if number and seen >= rank:
+                return BOUNDS[index] if index < len(BOUNDS) else float('inf')
+        return 0.0
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+        }
+
+
+class Registry:
+    """Гистограммы ``METRICS`` по именам view."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, values):
+        with self._lock:
+            histograms = self._views.get(view)
+            if histograms is None:
+                histograms = self._views[view] = {
+                    name: Histogram() for name in METRICS}
+            for name, value in values.items():
+                histograms[name].observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            return {view: {name: histogram.summary()
+                           for name, histogram in histograms.items()}
+                    for view, histograms in sorted(self._views.items())}
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def log_line(self):
+        """Одна строка: число запросов, p50/p95 времени и SQL по view."""
+        parts = []
+        for view, summary in self.snapshot().items():
+            wall, sql = summary['wall_ms'], summary['sql_count']
+            parts.append(f'{view} n={wall["count"]} p50={wall["p50"]:g}ms '
+                         f'p95={wall["p95"]:g}ms sql={sql["mean"]:.1f}')
+        return '; '.join(parts)
+
+
+registry = Registry()
+
+
+def count(name, value=1):
+    """Прибавляет ``value`` к метрике текущего запроса, если сбор включён."""
+    values = getattr(_local, 'values', None)
+    if values is not None:
+        values[name] += value
+
+
+def _measure_sql(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        count('sql_ms', 1000 * (time.perf_counter() - started))
+        count('sql_count')
+
+
+def current():
+    """Метрики, которые собираются в этом потоке, или None."""
+    return getattr(_local, 'values', None)
+
+
+def merge(values):
+    """Прибавляет к метрикам потока собранные в другом потоке ``values``."""
+    for name, value in values.items():
+        count(name, value)
+
+
+@contextmanager
+def collect_into(values):
+    """Собирает метрики блока в ``values``, в том числе SQL его потока."""
+    previous = current()
+    _local.values = values
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(_measure_sql))
+            yield values
+    finally:
+        _local.values = previous
+
+
+@contextmanager
+def collect():
+    """Собирает метрики блока в словарь, который отдаёт ``as``."""
+    values = dict.fromkeys(METRICS, 0)
+    started = time.perf_counter()
+    try:
+        with collect_into(values):
+            yield values
+    finally:
+        values['wall_ms'] = 1000 * (time.perf_counter() - started)
+
+
+class MeasuredCache(BaseCache):
+    """Считает попадания и промахи кэша ``LOCATION``, не меняя его работы.
+
+    Ключи передаются как есть: префиксы и версии применяет кэш ``LOCATION``.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._alias = location
+
+    @property
+    def _cache(self):
+        return caches[self._alias]
+
+    def get(self, key, default=None, version=None):
+        value = self._cache.get(key, _missing, version)
+        if value is _missing:
+            count('cache_misses')
+            return default
+        count('cache_hits')
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = self._cache.get_many(keys, version)
+        count('cache_hits', len(values))
+        count('cache_misses', len(keys) - len(values))
+        return values
+
+    def has_key(self, key, version=None):
+        return self._cache.has_key(key, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._cache.add(key, value, timeout, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._cache.set(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._cache.set_many(data, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._cache.touch(key, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        return self._cache.incr(key, delta, version)
+
+    def decr(self, key, delta=1, version=None):
+        return self._cache.decr(key, delta, version)
+
+    def delete(self, key, version=None):
+        return self._cache.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        return self._cache.delete_many(keys, version)
+
+    def clear(self):
+        return self._cache.clear()
+
+    def close(self, **kwargs):
+        return self._cache.close(**kwargs)
+
+
+class MeasuredTemplate(django_backend.Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            count('template_ms', 1000 * (time.perf_counter() - started))
+
+
+class MeasuredTemplates(django_backend.DjangoTemplates):
+    """``DjangoTemplates``, который считает время отрисовки шаблонов.
+
+    Считаются шаблоны, отрисованные через бэкенд (``render``,
+    ``render_to_string``); ``{% include %}`` входит во время шаблона,
+    который его подключил.
+    """
+
+    def from_string(self, template_code):
+        return MeasuredTemplate(
+            super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return MeasuredTemplate(
+            super().get_template(template_name).template, self)
@@ -0,0 +1,67 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics, routers
+
+STICKY_COOKIE = 'primary_reads'
+
+
+class MetricsMiddleware:
+    """Записывает метрики каждого запроса в гистограммы его view.
+
+    Раз в ``METRICS_LOG_INTERVAL`` секунд сводка уходит строкой в лог
+    ``core.metrics``; полные гистограммы отдаёт ``core.views.metrics``.
+    Стоит первым в ``MIDDLEWARE``, чтобы время запроса было полным.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.logged = time.monotonic()
+
+    def __call__(self, request):
+        with metrics.collect() as values:
+            response = self.get_response(request)
+        match = request.resolver_match
+        metrics.registry.record(match.view_name if match else '<unresolved>',
+                                values)
+        if time.monotonic() - self.logged >= settings.METRICS_LOG_INTERVAL:
+            self.logged = time.monotonic()
+            metrics.logger.info('%s', metrics.registry.log_line())
+        return response
+
+
+class ReplicaMiddleware:
+    """Отправляет чтения view с ``replica_reads`` на случайную реплику.
+
+    Кто только что писал в базу, получает cookie ``STICKY_COOKIE`` на
+    ``REPLICA_MAX_LAG`` секунд и до её истечения читает с основной базы:
+    реплика могла ещё не получить его запись. Стоит раньше
+    ``SessionMiddleware``, чтобы запись сессии тоже учитывалась.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.reset()
+        try:
+            response = self.get_response(request)
+            if routers.wrote():
+                response.set_cookie(STICKY_COOKIE, '1',
+                                    max_age=settings.REPLICA_MAX_LAG,
+                                    httponly=True, samesite='Lax')
+        finally:
+            routers.reset()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (getattr(view_func, 'replica_reads', False)
+                and STICKY_COOKIE not in request.COOKIES):
+            routers.use_replica(random.choice(settings.DATABASE_REPLICAS))
@@ -0,0 +1,107 @@
+"""Ограничение частоты пишущих запросов по пользователю и по IP.
+
+Бюджеты задаёт ``RATE_LIMITS``: ``{область: {'user' | 'ip': (запросов,
+за секунд)}}``. Состояние живёт в общем кэше, поэтому лимит общий для
+всех процессов (с бэкендом ``sqlite``; у ``locmem`` он свой у процесса).
+
+Корзину токенов одними атомарными операциями кэша не собрать: ей нужно
+прочитать и записать остаток вместе со временем. Её приближение —
+скользящее окно из двух счётчиков: ``incr`` счётчика текущего окна и
+чтение предыдущего, вес которого убывает по мере хода текущего. Как и
+корзина, окно пропускает короткий всплеск до бюджета и не даёт удвоенного
+всплеска на стыке окон, как у фиксированного окна.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+
+def _count(key, period):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Ключ живёт два окна: следующее окно читает его как предыдущее.
+        if cache.add(key, 1, 2 * period):
+            return 1
+        return cache.incr(key)
+
+
+def _retry_after(limit, period, position, previous, current):
+    """Через сколько секунд следующий запрос уложится в бюджет."""
+    if current < limit and previous:
+        # В этом окне: ждём, пока вес предыдущего окна не упадёт.
+        needed = 1 - (limit - current - 1) / previous
+        return max(needed - position, 0) * period
+    # В следующем окне текущее станет предыдущим.
+    needed = max(1 - (limit - 1) / current, 0) if current else 0
+    return (1 - position + needed) * period
+
+
+def _counted(key, limit, period, now):
+    """Учитывает запрос в окне ``now``: (ключ прошлого окна, данные)."""
+    window, position = divmod(now / period, 1)
+    current = _count(f'rate:{key}:{int(window)}', period)
+    return f'rate:{key}:{int(window) - 1}', (limit, period, position, current)
+
+
+def _wait(previous, limit, period, position, current):
+    if previous * (1 - position) + current <= limit:
+        return 0
+    return _retry_after(limit, period, position, previous, current)
+
+
+def hit(key, limit, period, now=None):
+    """Учитывает запрос с ключом ``key``.
+
+    Возвращает 0, если запрос укладывается в ``limit`` за ``period``
+    секунд, иначе — через сколько секунд повторить. Отклонённые запросы
+    тоже учитываются: непрерывный поток не пройдёт никогда.
+    """
+    now = time.time() if now is None else now
+    previous_key, counted = _counted(key, limit, period, now)
+    return _wait(cache.get(previous_key, 0), *counted)
+
+
+def client_ip(request):
+    """IP клиента. За обратным прокси REMOTE_ADDR должен выставлять он."""
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def check(request, scope):
+    """Секунды до повтора, если запрос превысил бюджеты ``scope``, или 0."""
+    keys = {'ip': client_ip(request)}
+    if request.user.is_authenticated:
+        keys['user'] = request.user.pk
+    now = time.time()
+    counted = dict(
+        _counted(f'{scope}:{kind}:{keys[kind]}', limit, period, now)
+        for kind, (limit, period) in settings.RATE_LIMITS[scope].items()
+        if kind in keys)
+    # Прошлые окна всех бюджетов — одним чтением кэша.
+    previous = cache.get_many(list(counted))
+    return max((_wait(previous.get(key, 0), *values)
+                for key, values in counted.items()), default=0)
+
+
+def rate_limit(scope, methods=None):
+    """Отвечает 429 с Retry-After на запросы сверх бюджетов ``scope``.
+
+    ``methods`` — какие методы учитывать (по умолчанию все): форма,
+    открытая GET, не пишет в базу.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                wait = check(request, scope)
+                if wait:
+                    response = render(request, 'core/429.html', status=429)
+                    response['Retry-After'] = str(max(1, math.ceil(wait)))
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
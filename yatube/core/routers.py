@@ -0,0 +1,59 @@
+"""Чтение с реплик для view, помеченных ``core.decorators.replica_reads``.
+
+Реплику на время запроса выбирает ``ReplicaMiddleware``; всё остальное —
+записи, чтения других view и чтения после ``use_primary()`` — идёт в
+``default``. Состояние своё у каждого потока.
+"""
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Приложения, которые всегда читают с основной базы. Сессию, которой
+# ещё нет на отстающей реплике, SessionMiddleware сочтёт пустой и сотрёт
+# cookie — пользователь окажется разлогинен.
+PRIMARY_APPS = {'sessions'}
+
+_local = threading.local()
+
+
+def reset():
+    _local.replica = None
+    _local.wrote = False
+
+
+def use_replica(alias):
+    _local.replica = alias
+
+
+def current_replica():
+    return getattr(_local, 'replica', None)
+
+
+def use_primary():
+    """Оставшиеся чтения запроса — с основной базы."""
+    _local.replica = None
+
+
+def wrote():
+    """Была ли в запросе запись в основную базу."""
+    return getattr(_local, 'wrote', False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        return getattr(_local, 'replica', None) or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы: связи между их объектами верны.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схему на реплики приносит репликация, а не migrate.
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,97 @@
+"""Хранилище файлов по содержимому (content-addressed).
+
+Имя файла — SHA-256 его содержимого: одинаковые загрузки ложатся в один
+файл, а повторная загрузка ничего не пишет. Каталог из ``upload_to``
+сохраняется, внутри файлы разложены по двум уровням подкаталогов из
+первых символов хэша, чтобы в одном каталоге не копились сотни тысяч
+файлов::
+
+    posts/3f/a2/3fa2…e1.jpg
+
+Файл может быть общим для нескольких объектов, поэтому удалять его
+вместе с объектом нельзя: ссылки считает ``posts.counters``, сирот
+удаляет команда ``collect_media``.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+# umask процесса: mkstemp создаёт файл с правами 0600 без её учёта.
+# Читается при импорте, пока нет других потоков: os.umask её меняет.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+HASHED_NAME = re.compile(r'(^|/)([0-9a-f]{2})/([0-9a-f]{2})/\2\3[0-9a-f]{60}'
+                         r'(\.[^/]*)?$')
+
+
+def is_hashed(name):
+    """Лежит ли файл ``name`` под именем из хэша содержимого."""
+    return HASHED_NAME.search(name) is not None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        name = name.replace('\\', '/')
+        hashed = HASHED_NAME.search(name)
+        if hashed:
+            # Перезапись уже хэшированного файла (например, уменьшенной
+            # картинки) ложится в тот же каталог, а не глубже на уровень.
+            name = posixpath.join(name[:hashed.start()],
+                                  posixpath.basename(name))
+        directory, basename = posixpath.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        name = posixpath.join(directory, hexdigest[:2], hexdigest[2:4],
+                              hexdigest + extension)
+        return super().save(name, content, max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # Одинаковое имя — одинаковое содержимое: суффиксы не нужны.
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            # Файл уже есть. Обновляем время изменения: collect_media не
+            # удалит его, пока загрузка не успела сослаться на файл.
+            os.utime(full_path)
+            return name
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        # Пишем во временный файл и переименовываем: одновременные
+        # загрузки одного содержимого не увидят недописанный файл.
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as stream:
+                if hasattr(content, 'temporary_file_path'):
+                    # Большая загрузка уже лежит во временном файле.
+                    file_move_safe(content.temporary_file_path(), temp_path,
+                                   allow_overwrite=True)
+                else:
+                    for chunk in content.chunks():
+                        stream.write(chunk)
+            # Права — как у FileSystemStorage: FILE_UPLOAD_PERMISSIONS
+            # или по umask, чтобы файл мог читать веб-сервер.
+            mode = self.file_permissions_mode
+            os.chmod(temp_path, 0o666 & ~_UMASK if mode is None else mode)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
@@ -0,0 +1,53 @@
+from django import template
+from django.template.base import TemplateSyntaxError, token_kwargs
+from django.template.context import Context
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, template_name, extra_context):
+        self.template_name = template_name
+        self.extra_context = extra_context
+        self.template = None
+
+    def render(self, context):
+        # Шаблон фрагмента ищется один раз на узел: с кэширующим
+        # загрузчиком узел живёт вместе со скомпилированным шаблоном.
+        if self.template is None:
+            self.template = context.template.engine.get_template(
+                self.template_name)
+        values = {name: value.resolve(context)
+                  for name, value in self.extra_context.items()}
+        # Новый лёгкий Context вместо context.new(): копия RequestContext
+        # со всеми словарями дороже самого фрагмента.
+        fragment_context = Context(values, autoescape=context.autoescape,
+                                   use_l10n=context.use_l10n,
+                                   use_tz=context.use_tz)
+        fragment_context.template = context.template
+        fragment_context.render_context = context.render_context
+        return self.template.render(fragment_context)
+
+
+@register.tag
+def fragment(parser, token):
+    """Рисует шаблон-фрагмент только с переданными переменными.
+
+    ``{% fragment 'includes/post_list.html' post=post %}`` — как
+    ``{% include ... with post=post only %}``, но имя шаблона задано
+    строкой и шаблон ищется не при каждой отрисовке, а один раз. Для
+    фрагментов, которые рисуются в цикле по каждому объекту страницы.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise TemplateSyntaxError(
+            f'{bits[0]} ожидает имя шаблона и переменные name=value.')
+    name = bits[1]
+    if len(name) < 2 or name[0] != name[-1] or name[0] not in '\'"':
+        raise TemplateSyntaxError(
+            f'{bits[0]}: имя шаблона должно быть строкой в кавычках.')
+    extra_context = token_kwargs(bits[2:], parser, support_legacy=False)
+    if len(extra_context) != len(bits) - 2:
+        raise TemplateSyntaxError(
+            f'{bits[0]}: после имени шаблона — только name=value.')
+    return FragmentNode(name[1:-1], extra_context)
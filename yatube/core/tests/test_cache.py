@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.core.cache.backends.base import CacheKeyWarning
+from django.test import SimpleTestCase
+
+from ..cache import SQLiteCache
+
+
+def make_cache(path, **options):
+    return SQLiteCache(path, {'OPTIONS': options})
+
+
+def child_incr(path, times):
+    cache = make_cache(path)
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = make_cache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_basic_operations(self):
+        """get/set/add/delete/get_many ведут себя как у Django-кэшей."""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 'value'))
+        self.assertEqual(self.cache.get_many(['key', 'new', 'missing']),
+                         {'key': {'value': 1}, 'new': 'value'})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+
+    def test_expiry(self):
+        """Просроченный ключ не читается и освобождает место для add()."""
+        self.cache.set('key', 'value', 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.cache.set('forever', 'value', None)
+        self.assertTrue(self.cache.has_key('forever'))
+
+    def test_incr(self):
+        """incr работает с целыми и падает на отсутствующем ключе."""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 10), 11)
+        self.assertEqual(self.cache.decr('counter'), 10)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    @mock.patch('core.cache.HAS_RETURNING', False)
+    def test_incr_without_returning(self):
+        """На SQLite старше 3.35 incr считает в транзакции."""
+        self.test_incr()
+
+    def test_key_warnings(self):
+        """Ключи, негодные для memcached, дают предупреждение."""
+        for key in ('with space', 'x' * 300, 'tab\there'):
+            with self.subTest(key=key), self.assertWarns(CacheKeyWarning):
+                self.cache.set(key, 1)
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читанные ключи."""
+        cache = make_cache(self.path, MAX_ENTRIES=10, CULL_FREQUENCY=2,
+                           LRU_RESOLUTION=0)
+        cache.set('hot', 'value')
+        for i in range(30):
+            cache.set(f'key{i}', i)
+            cache.get('hot')
+        self.assertEqual(cache.get('hot'), 'value')
+        self.assertIsNone(cache.get('key0'))
+
+    def test_shared_between_processes(self):
+        """Процессы видят и атомарно меняют общие ключи."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=child_incr, args=(self.path, 50))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
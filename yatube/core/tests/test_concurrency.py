@@ -0,0 +1,86 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+from .. import concurrency, metrics, routers
+
+User = get_user_model()
+
+
+@override_settings(VIEW_LOADER_THREADS=2)
+class GatherTest(TransactionTestCase):
+    def test_runs_loaders_in_threads(self):
+        """Загрузчики идут в разных потоках, результаты — по порядку."""
+        results = concurrency.gather(
+            threading.get_ident, None, threading.get_ident)
+        self.assertEqual(results[0], threading.get_ident())
+        self.assertIsNone(results[1])
+        self.assertNotEqual(results[2], threading.get_ident())
+
+    def test_reraises_after_all_finished(self):
+        done = []
+
+        def fail():
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            concurrency.gather(lambda: done.append(1), fail)
+        with self.assertRaises(ValueError):
+            concurrency.gather(fail, lambda: done.append(2))
+        self.assertEqual(done, [1, 2])
+
+    def test_passes_replica_and_metrics(self):
+        """Поток пула читает с реплики запроса, его SQL попадает в метрики."""
+        User.objects.create_user(username='author')
+        routers.use_replica('replica1')
+        try:
+            with metrics.collect() as values:
+                replica, users = concurrency.gather(
+                    routers.current_replica,
+                    lambda: (routers.current_replica(),
+                             User.objects.using('default').count()))
+        finally:
+            routers.reset()
+        self.assertEqual(replica, 'replica1')
+        self.assertEqual(users, ('replica1', 1))
+        self.assertEqual(values['sql_count'], 1)
+
+    def test_in_transaction_runs_in_order(self):
+        """В транзакции всё в текущем потоке: другим она не видна."""
+        with transaction.atomic():
+            results = concurrency.gather(threading.get_ident,
+                                         threading.get_ident)
+        self.assertEqual(results, [threading.get_ident()] * 2)
+
+
+@override_settings(VIEW_LOADER_THREADS=2)
+class ConcurrentViewsTest(TransactionTestCase):
+    def test_feed_and_post_pages(self):
+        """Профиль, группа и пост собираются из данных, прочитанных в пуле."""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Группа', slug='group')
+        post = Post.objects.create(author=author, text='Параллельный пост',
+                                   group=group)
+        Follow.objects.create(user=reader, author=author)
+        post.comments.create(author=reader, text='Комментарий')
+        client = Client()
+        client.force_login(reader)
+        response = client.get(reverse('posts:profile',
+                                      kwargs={'username': 'author'}))
+        self.assertContains(response, 'Параллельный пост')
+        self.assertTrue(response.context['following'])
+        response = client.get(reverse('posts:group_posts',
+                                      kwargs={'slug': 'group'}))
+        self.assertContains(response, 'Параллельный пост')
+        response = client.get(reverse('posts:post_detail',
+                                      kwargs={'post_id': post.pk}))
+        self.assertContains(response, 'Комментарий')
+        response = client.get(reverse('posts:profile',
+                                      kwargs={'username': 'missing'}))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,36 @@
+import os
+import shutil
+import tempfile
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import SimpleTestCase, override_settings
+
+
+class SQLitePragmasTest(SimpleTestCase):
+    def open(self, **settings_dict):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        default = connections[DEFAULT_DB_ALIAS]
+        wrapper = default.__class__(
+            dict(default.settings_dict,
+                 NAME=os.path.join(directory, 'db.sqlite3'),
+                 **settings_dict),
+            alias='pragmas')
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper.connection
+
+    def pragma(self, conn, name):
+        return conn.execute(f'PRAGMA {name}').fetchone()[0]
+
+    def test_new_connection_is_configured(self):
+        conn = self.open()
+        self.assertEqual(self.pragma(conn, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(conn, 'synchronous'), 1)
+        self.assertEqual(self.pragma(conn, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(conn, 'cache_size'), -16 * 1024)
+
+    @override_settings(SQLITE_PRAGMAS={'journal_mode': 'delete'})
+    def test_pragmas_come_from_settings(self):
+        conn = self.open()
+        self.assertEqual(self.pragma(conn, 'journal_mode'), 'delete')
@@ -0,0 +1,26 @@
+from django.template import Context, Engine, TemplateSyntaxError
+from django.test import SimpleTestCase
+
+engine = Engine(
+    libraries={'fragments': 'core.templatetags.fragments'},
+    loaders=[('django.template.loaders.locmem.Loader', {
+        'item.html': '[{{ item }}{{ hidden }}]',
+        'page.html': ('{% load fragments %}{% for item in items %}'
+                      '{% fragment "item.html" item=item %}{% endfor %}'),
+    })],
+)
+
+
+class FragmentTagTest(SimpleTestCase):
+    def test_renders_only_passed_variables(self):
+        page = engine.get_template('page.html')
+        self.assertEqual(
+            page.render(Context({'items': [1, 2], 'hidden': 'x'})),
+            '[1][2]')
+
+    def test_requires_quoted_name(self):
+        with self.assertRaises(TemplateSyntaxError):
+            engine.from_string('{% load fragments %}{% fragment name %}')
+        with self.assertRaises(TemplateSyntaxError):
+            engine.from_string(
+                '{% load fragments %}{% fragment "item.html" item %}')
@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from .. import metrics
+
+User = get_user_model()
+
+
+class HistogramTest(SimpleTestCase):
+    def test_percentiles(self):
+        """Перцентиль — верхняя граница корзины с нужным рангом."""
+        histogram = metrics.Histogram()
+        for value in [1] * 90 + [100] * 10:
+            histogram.observe(value)
+        summary = histogram.summary()
+        self.assertEqual(summary['count'], 100)
+        self.assertAlmostEqual(summary['mean'], 10.9)
+        self.assertEqual(summary['p50'], 1.6)
+        self.assertEqual(summary['p99'], 102.4)
+
+    def test_zero_has_own_bucket(self):
+        histogram = metrics.Histogram()
+        histogram.observe(0)
+        self.assertEqual(histogram.percentile(0.5), 0.0)
+
+
+class MetricsMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_user(username='admin', is_staff=True)
+        cls.user = User.objects.create_user(username='user')
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+
+    def test_records_view_metrics(self):
+        """Запрос попадает в гистограммы своего view со всеми метриками."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        index = metrics.registry.snapshot()['posts:index']
+        self.assertEqual(set(index), set(metrics.METRICS))
+        self.assertEqual(index['wall_ms']['count'], 2)
+        self.assertGreater(index['sql_count']['mean'], 0)
+        self.assertGreater(index['template_ms']['mean'], 0)
+        # Второй запрос гостя отдан из кэша страниц.
+        self.assertGreater(index['cache_hits']['mean'], 0)
+        self.assertGreater(index['cache_misses']['mean'], 0)
+
+    def test_cache_counts_only_inside_request(self):
+        cache.set('key', 1)
+        with metrics.collect() as values:
+            cache.get('key')
+            cache.get_many(['key', 'missing'])
+            cache.get('missing')
+        self.assertEqual(values['cache_hits'], 2)
+        self.assertEqual(values['cache_misses'], 2)
+        self.assertEqual(cache.get('missing', 'default'), 'default')
+
+    def test_endpoint_is_admin_only(self):
+        """Гистограммы видны только персоналу."""
+        url = reverse('metrics')
+        client = Client()
+        client.force_login(self.user)
+        self.assertEqual(client.get(url).status_code, 302)
+        client.force_login(self.admin)
+        self.client.get(reverse('about:tech'))
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['about:tech']['wall_ms']['count'],
+                         1)
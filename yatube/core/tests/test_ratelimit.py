@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+from .. import ratelimit
+
+User = get_user_model()
+
+
+class HitTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_budget_within_window(self):
+        for _ in range(2):
+            self.assertEqual(ratelimit.hit('key', 2, 60, now=600), 0)
+        # Третий запрос ждёт, пока вес окна не пропустит ещё один:
+        # в следующем окне 3 * (1 - 2/3) + 1 <= 2.
+        self.assertAlmostEqual(ratelimit.hit('key', 2, 60, now=600), 100)
+
+    def test_previous_window_weight(self):
+        """Запросы прошлого окна весят тем меньше, чем дальше окно."""
+        for _ in range(4):
+            ratelimit.hit('key', 4, 60, now=600)
+        self.assertGreater(ratelimit.hit('key', 4, 60, now=665), 0)
+        self.assertEqual(ratelimit.hit('key', 4, 60, now=710), 0)
+
+
+@override_settings(RATE_LIMITS={'comment': {'user': (2, 60),
+                                            'ip': (3, 60)}})
+class RateLimitViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:add_comment',
+                           kwargs={'post_id': self.post.pk})
+
+    def comment(self, user):
+        client = Client()
+        client.force_login(user)
+        return client.post(self.url, {'text': 'Комментарий'})
+
+    def test_user_budget(self):
+        """Сверх бюджета — 429 с Retry-After, комментарий не создаётся."""
+        for _ in range(2):
+            self.assertEqual(self.comment(self.reader).status_code, 302)
+        response = self.comment(self.reader)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertTemplateUsed(response, 'core/429.html')
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_ip_budget_across_users(self):
+        self.comment(self.reader)
+        self.comment(self.reader)
+        self.assertEqual(self.comment(self.author).status_code, 302)
+        self.assertEqual(self.comment(self.author).status_code, 429)
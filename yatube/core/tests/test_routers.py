@@ -0,0 +1,102 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from posts import caching
+from posts.models import Post
+
+from .. import routers
+from ..decorators import replica_reads
+from ..management.commands.simulate_replication import restore, snapshot
+from ..middleware import STICKY_COOKIE, ReplicaMiddleware
+
+router = routers.ReplicaRouter()
+
+
+@replica_reads
+def read_view(request):
+    return HttpResponse(router.db_for_read(Post))
+
+
+def write_view(request):
+    router.db_for_write(Post)
+    return HttpResponse(router.db_for_read(Post))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def call(self, view, **cookies):
+        request = self.factory.get('/')
+        request.COOKIES.update(cookies)
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaMiddleware(get_response)
+        return middleware(request)
+
+    def test_read_views_use_replica(self):
+        """Чтения помеченного view — с реплики, остальных — с default."""
+        self.assertEqual(self.call(read_view).content, b'replica1')
+        self.assertEqual(self.call(write_view).content, b'default')
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+    def test_sessions_read_primary(self):
+        """Сессии всегда читаются с default: на реплике их может не быть."""
+        routers.use_replica('replica1')
+        self.assertEqual(router.db_for_read(Session), 'default')
+        routers.reset()
+
+    def test_writer_sticks_to_primary(self):
+        """После записи автор читает с default, пока жива cookie."""
+        response = self.call(write_view)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertNotIn(STICKY_COOKIE, self.call(read_view).cookies)
+        self.assertEqual(
+            self.call(read_view, **{STICKY_COOKIE: '1'}).content,
+            b'default')
+
+    def test_fresh_feed_reads_primary(self):
+        """Только что сброшенная лента читается с default."""
+        request = self.factory.get('/')
+        routers.use_replica('replica1')
+        caching.feed_token(request, caching.index_feed())
+        self.assertEqual(router.db_for_read(Post), 'replica1')
+        caching.invalidate_feeds([caching.index_feed()])
+        caching.feed_token(request, caching.index_feed())
+        self.assertEqual(router.db_for_read(Post), 'default')
+        routers.reset()
+
+
+class SimulateReplicationTest(SimpleTestCase):
+    def test_copies_primary(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        primary = os.path.join(directory, 'primary.sqlite3')
+        replica = os.path.join(directory, 'replica.sqlite3')
+        with sqlite3.connect(primary) as conn:
+            conn.execute('CREATE TABLE t (x)')
+            conn.execute('INSERT INTO t VALUES (1)')
+        copy = snapshot(primary)
+        with sqlite3.connect(primary) as conn:
+            conn.execute('INSERT INTO t VALUES (2)')
+        restore(copy, replica)
+        conn = sqlite3.connect(replica)
+        self.addCleanup(conn.close)
+        self.assertEqual(conn.execute('SELECT x FROM t').fetchall(), [(1,)])
+
+    def test_requires_replicas(self):
+        with self.assertRaises(CommandError):
+            call_command('simulate_replication', once=True)
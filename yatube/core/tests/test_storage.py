@@ -0,0 +1,56 @@
+import os
+import shutil
+import stat
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from ..storage import ContentAddressedStorage, is_hashed
+
+
+class ContentAddressedStorageTest(SimpleTestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+        self.storage = ContentAddressedStorage(location=self.location)
+
+    def test_same_content_stored_once(self):
+        first = self.storage.save('posts/a.JPG', ContentFile(b'picture'))
+        second = self.storage.save('posts/b.jpg', ContentFile(b'picture'))
+        self.assertEqual(first, second)
+        self.assertTrue(is_hashed(first))
+        self.assertRegex(first, r'^posts/([0-9a-f]{2})/([0-9a-f]{2})/'
+                                r'\1\2[0-9a-f]{60}\.jpg$')
+        with self.storage.open(first) as stream:
+            self.assertEqual(stream.read(), b'picture')
+        directory = os.path.dirname(self.storage.path(first))
+        self.assertEqual(os.listdir(directory), [os.path.basename(first)])
+
+    def test_different_content_different_names(self):
+        first = self.storage.save('posts/a.jpg', ContentFile(b'one'))
+        second = self.storage.save('posts/a.jpg', ContentFile(b'two'))
+        self.assertNotEqual(first, second)
+        self.assertFalse(is_hashed('posts/a.jpg'))
+
+    def test_resave_hashed_name_keeps_layout(self):
+        """Хэшированное имя не вкладывает новые подкаталоги в старые."""
+        first = self.storage.save('posts/a.jpg', ContentFile(b'picture'))
+        second = self.storage.save(first, ContentFile(b'smaller'))
+        self.assertRegex(second, r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[^/]+$')
+        direct = self.storage.save('posts/b.jpg', ContentFile(b'smaller'))
+        self.assertEqual(second, direct)
+
+    def test_file_mode_follows_umask(self):
+        """Файл читают все, как у FileSystemStorage, а не только владелец."""
+        with mock.patch('core.storage._UMASK', 0o022):
+            name = self.storage.save('posts/a.jpg',
+                                     ContentFile(b'picture'))
+        mode = stat.S_IMODE(os.stat(self.storage.path(name)).st_mode)
+        self.assertEqual(mode, 0o644)
+        storage = ContentAddressedStorage(location=self.location,
+                                          file_permissions_mode=0o640)
+        name = storage.save('posts/b.jpg', ContentFile(b'other'))
+        mode = stat.S_IMODE(os.stat(storage.path(name)).st_mode)
+        self.assertEqual(mode, 0o640)
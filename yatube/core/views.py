@@ -1,6 +1,10 @@
 # core/views.py
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from . import metrics
+
 
 def page_not_found(request, exception):
     # Переменная exception содержит отладочную информацию;
@@ -10,3 +14,10 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def metrics_view(request):
+    """Гистограммы метрик запросов этого процесса по именам view."""
+    return JsonResponse(metrics.registry.snapshot(),
+                        json_dumps_params={'ensure_ascii': False})
@@ -0,0 +1,206 @@
+"""JSON API для чтения, версия 1: ленты, пост, комментарии, профиль.
+
+Ответы собираются из строк ``values()``, а не из моделей: запрос
+выбирает только поля из ``?fields=`` (и поля курсора), а JOIN с автором
+или группой появляется, только если их поля нужны. Списки листаются по
+курсору ``?after=`` (см. ``posts/paginators.py``), размер страницы —
+``?limit=`` до ``API_MAX_LIMIT``. Ответ сжимается по Accept-Encoding
+(``core/compression.py``).
+"""
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_safe
+
+from core.compression import compress
+from core.decorators import query_budget, replica_reads
+from .models import Comment, Group, Post
+from .paginators import CursorPaginator
+
+User = get_user_model()
+
+
+class ApiError(Exception):
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _media_url(name):
+    return default_storage.url(name) if name else None
+
+
+# Поле ответа: (поле для values(), преобразование значения или None).
+POST_FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'pub_date': ('pub_date', _isoformat),
+    'author': ('author__username', None),
+    'group': ('group__slug', None),
+    'image': ('image', _media_url),
+    'image_width': ('image_width', None),
+    'image_height': ('image_height', None),
+    'comments_count': ('comments_count', None),
+}
+COMMENT_FIELDS = {
+    'id': ('id', None),
+    'post': ('post_id', None),
+    'author': ('author__username', None),
+    'text': ('text', None),
+    'created': ('created', _isoformat),
+}
+PROFILE_FIELDS = {
+    'username': ('username', None),
+    'first_name': ('first_name', None),
+    'last_name': ('last_name', None),
+    'posts_count': ('counters__posts_count', None),
+    'followers_count': ('counters__followers_count', None),
+    'following_count': ('counters__following_count', None),
+}
+
+
+def get_fields(request, spec):
+    """Поля ответа из ``?fields=a,b``; без параметра — все поля ``spec``."""
+    names = list(dict.fromkeys(
+        name.strip() for name in request.GET.get('fields', '').split(',')
+        if name.strip()))
+    if not names:
+        return list(spec)
+    unknown = [name for name in names if name not in spec]
+    if unknown:
+        raise ApiError(
+            f'Неизвестные поля: {", ".join(unknown)}. '
+            f'Доступны: {", ".join(spec)}.')
+    return names
+
+
+def get_limit(request):
+    raw = request.GET.get('limit')
+    if raw is None:
+        return settings.API_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= settings.API_MAX_LIMIT:
+        raise ApiError(
+            f'limit — целое число от 1 до {settings.API_MAX_LIMIT}.')
+    return limit
+
+
+def serialize(rows, spec, names):
+    """Словари ответа из строк ``values()``: только поля ``names``."""
+    columns = [(name, *spec[name]) for name in names]
+    return [
+        {name: (row[lookup] if convert is None or row[lookup] is None
+                else convert(row[lookup]))
+         for name, lookup, convert in columns}
+        for row in rows
+    ]
+
+
+def get_list(request, queryset, spec, ordering):
+    """Страница списка по курсору ``?after=`` и её курсор продолжения."""
+    names = get_fields(request, spec)
+    lookups = {spec[name][0] for name in names}
+    lookups.update(name.lstrip('-') for name in ordering)
+    paginator = CursorPaginator(queryset.values(*lookups), get_limit(request),
+                                ordering=ordering)
+    page = paginator.get_page(request.GET.get('after'))
+    return page, {
+        'results': serialize(page.object_list, spec, names),
+        'next': page.next_cursor,
+    }
+
+
+def get_object(request, queryset, spec):
+    names = get_fields(request, spec)
+    row = queryset.values(*{spec[name][0] for name in names}).first()
+    if row is None:
+        raise Http404
+    return serialize([row], spec, names)[0]
+
+
+def api_view(view):
+    """Отдаёт результат ``view`` как JSON; ошибки — как ``{"detail": ...}``."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            status, payload = 200, view(request, *args, **kwargs)
+        except ApiError as error:
+            status, payload = error.status, {'detail': error.detail}
+        except Http404:
+            status, payload = 404, {'detail': 'Не найдено.'}
+        response = HttpResponse(
+            json.dumps(payload, ensure_ascii=False, separators=(',', ':')),
+            content_type='application/json; charset=utf-8', status=status)
+        return compress(request, response)
+    return require_safe(wrapper)
+
+
+def _feed(request, queryset):
+    return get_list(request, queryset, POST_FIELDS, Post._meta.ordering)
+
+
+@replica_reads
+@query_budget(1)
+@api_view
+def index(request):
+    return _feed(request, Post.objects.all())[1]
+
+
+@replica_reads
+@query_budget(2)
+@api_view
+def group_posts(request, slug):
+    # Группа читается, только если лента пуста: иначе она точно есть.
+    page, payload = _feed(request, Post.objects.filter(group__slug=slug))
+    if (not page.object_list and not page.has_previous()
+            and not Group.objects.filter(slug=slug).exists()):
+        raise Http404
+    return payload
+
+
+@replica_reads
+@query_budget(1)
+@api_view
+def profile(request, username):
+    return get_object(request, User.objects.filter(username=username),
+                      PROFILE_FIELDS)
+
+
+@replica_reads
+@query_budget(2)
+@api_view
+def profile_posts(request, username):
+    page, payload = _feed(request,
+                          Post.objects.filter(author__username=username))
+    if (not page.object_list and not page.has_previous()
+            and not User.objects.filter(username=username).exists()):
+        raise Http404
+    return payload
+
+
+@replica_reads
+@query_budget(1)
+@api_view
+def post_detail(request, post_id):
+    return get_object(request, Post.objects.filter(id=post_id), POST_FIELDS)
+
+
+@replica_reads
+@query_budget(1)
+@api_view
+def post_comments(request, post_id):
+    """Комментарии поста, старые — первыми; у несуществующего поста их нет."""
+    return get_list(request, Comment.objects.filter(post_id=post_id),
+                    COMMENT_FIELDS, ('created', 'id'))[1]
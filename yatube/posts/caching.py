@@ -0,0 +1,353 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.http import quote_etag
+
+from core import routers
+
+# Фрагменты карточки поста, см. includes/post_list.html и content.html.
+POST_FRAGMENTS = ('post_card', 'post_content')
+PAGE_PARAMS = ('after', 'page')
+# Сколько ключей карточек сбрасывается одним delete_many.
+CARD_BATCH_SIZE = 500
+# Как часто ждущий промах проверяет, не готовы ли данные, секунды.
+FILL_POLL_INTERVAL = 0.01
+
+
+def index_feed():
+    return 'index'
+
+
+def group_feed(slug):
+    return f'group:{slug}'
+
+
+def profile_feed(username):
+    return f'profile:{username}'
+
+
+def _post_version_key(post_id):
+    return f'post:{post_id}'
+
+
+def _post_payload_key(post_id):
+    return f'post-payload:{post_id}'
+
+
+def _follows_version_key(user_id):
+    return f'follows:{user_id}'
+
+
+def _version_keys(feed):
+    """Версии ленты: ``all`` меняет любые правки, ``head`` — новые посты.
+
+    Страницы по курсору ``?after=`` зависят только от ``all``: новый пост
+    встаёт в начало ленты и не меняет содержимое страниц после курсора.
+    Кроме лент, где на каждой странице видно общее число постов
+    (``_shows_total``).
+    """
+    return f'feed:{feed}:all', f'feed:{feed}:head'
+
+
+def _shows_total(feed):
+    # Профиль на каждой странице пишет «Всего постов» автора.
+    return feed.startswith(profile_feed(''))
+
+
+def _fresh_key(name):
+    return f'fresh:{name}'
+
+
+def _read_keys(feed):
+    """Ключи, которые читаются вместе перед выдачей страницы ленты."""
+    return (*_version_keys(feed), _fresh_key(feed))
+
+
+def _mark_fresh(names):
+    # Реплики отстают от основной базы: только что сброшенные ленты и
+    # посты какое-то время читаются с неё, иначе в кэш и в ETag новой
+    # версии попадёт старое содержимое с реплики.
+    if settings.DATABASE_REPLICAS:
+        cache.set_many(dict.fromkeys(map(_fresh_key, names), True),
+                       settings.REPLICA_MAX_LAG)
+
+
+def _pin_if_fresh(values, name):
+    if _fresh_key(name) in values:
+        routers.use_primary()
+
+
+def _new_version(key):
+    # Версия от времени, а не 1: после вытеснения ключа версии старые
+    # страницы с совпавшей версией не оживут.
+    cache.add(key, int(time.time() * 1000), None)
+    return cache.get(key)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        _new_version(key)
+
+
+def mark_page(request, page_obj):
+    """Запоминает, какую страницу ленты на самом деле показал view.
+
+    Битый курсор ведёт на первую страницу, номер вне диапазона — на
+    последнюю: ключи кэша и фрагментов строятся по показанной странице,
+    иначе каждый выдуманный курсор хранил бы свою копию первой.
+    """
+    if getattr(page_obj.paginator, 'keyset', False):
+        params = {'after': page_obj.cursor} if page_obj.cursor else {}
+    else:
+        params = {'page': str(page_obj.number)}
+    request.feed_page = params
+
+
+def _page_params(request):
+    params = getattr(request, 'feed_page', None)
+    if params is None:
+        params = {name: request.GET[name]
+                  for name in PAGE_PARAMS if name in request.GET}
+    return params
+
+
+def _page_key(feed, request):
+    params = _page_params(request)
+    query = '&'.join(f'{name}={params[name]}'
+                     for name in PAGE_PARAMS if name in params)
+    return f'page:{feed}:{query}'
+
+
+def _token(request, values, feed):
+    _pin_if_fresh(values, feed)
+    params = _page_params(request)
+    all_key, head_key = _version_keys(feed)
+    all_version = values.get(all_key) or _new_version(all_key)
+    if 'after' in params and not _shows_total(feed):
+        return f'{feed}:a{all_version}:{params["after"]}'
+    head_version = values.get(head_key) or _new_version(head_key)
+    return (f'{feed}:a{all_version}:h{head_version}:'
+            f'{params.get("page", "")}')
+
+
+def feed_token(request, feed):
+    """Строка, меняющаяся вместе с содержимым страницы ленты."""
+    return _token(request, cache.get_many(_read_keys(feed)), feed)
+
+
+def feed_cache_context(request, feed):
+    return {'feed_cache': {
+        'token': feed_token(request, feed),
+        'timeout': settings.FEED_CACHE_TIMEOUT,
+    }}
+
+
+def cache_page_for_guests(get_feed):
+    """Отдаёт анонимным пользователям страницу ленты целиком из кэша.
+
+    Страница и версии ленты читаются одним ``get_many``; устаревшая
+    страница узнаётся по несовпадению сохранённой версии.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method != 'GET' or request.user.is_authenticated
+                    or set(request.GET) - set(PAGE_PARAMS)):
+                return view(request, *args, **kwargs)
+            feed = get_feed(**kwargs)
+            page_key = _page_key(feed, request)
+            values = cache.get_many([page_key, *_read_keys(feed)])
+            token = _token(request, values, feed)
+            cached = values.get(page_key)
+            if cached is not None and cached[0] == token:
+                return HttpResponse(cached[1], content_type=cached[2])
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                # Ключ — по странице, которую показал view (mark_page):
+                # выдуманные курсоры не плодят копии первой страницы.
+                cache.set(_page_key(feed, request),
+                          (_token(request, values, feed), response.content,
+                           response['Content-Type']),
+                          settings.FEED_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+def invalidate_feeds(feeds, new_post=False):
+    """Сбрасывает страницы лент: для нового поста — только головы лент."""
+    feeds = set(feeds)
+    for feed in feeds:
+        all_key, head_key = _version_keys(feed)
+        _bump(head_key if new_post else all_key)
+    _mark_fresh(feeds)
+
+
+def invalidate_cards(post_ids):
+    """Сбрасывает фрагменты карточек постов ``post_ids``.
+
+    В карточке видны имя автора и ссылки на профиль и группу: их правка
+    меняет карточки, хотя сами посты не менялись.
+    """
+    keys = []
+    for post_id in post_ids:
+        keys.extend(make_template_fragment_key(name, [post_id])
+                    for name in POST_FRAGMENTS)
+        if len(keys) >= CARD_BATCH_SIZE:
+            cache.delete_many(keys)
+            keys = []
+    if keys:
+        cache.delete_many(keys)
+
+
+def invalidate_post(post_id):
+    invalidate_cards([post_id])
+    _bump(_post_version_key(post_id))
+    _mark_fresh([_post_version_key(post_id)])
+
+
+def invalidate_follows(user_id):
+    """Сбрасывает ETag страниц, где видно, на кого подписан читатель."""
+    _bump(_follows_version_key(user_id))
+
+
+def _etag(*parts):
+    return quote_etag(
+        hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest())
+
+
+def feed_etag(get_feed):
+    """ETag страницы ленты для ``condition``, без запросов к БД.
+
+    Собирается из версий ленты (как ключ кэша страницы) и, для читателя,
+    его id и версии его подписок: от них зависят шапка и кнопка подписки.
+    """
+    def etag(request, **kwargs):
+        feed = get_feed(**kwargs)
+        keys = list(_read_keys(feed))
+        user = request.user
+        if user.is_authenticated:
+            keys.append(_follows_version_key(user.pk))
+        values = cache.get_many(keys)
+        parts = [_token(request, values, feed)]
+        if user.is_authenticated:
+            follows_key = keys[-1]
+            parts += [user.pk,
+                      values.get(follows_key) or _new_version(follows_key)]
+        return _etag(*parts)
+    return etag
+
+
+def _post_dependencies(post):
+    """Версии лент автора и группы поста с их текущими значениями.
+
+    Счётчик постов автора меняют новые и удалённые посты, название
+    группы — её правка; и то и другое сбрасывает эти ленты.
+    """
+    feeds = [profile_feed(post.author.username)]
+    if post.group is not None:
+        feeds.append(group_feed(post.group.slug))
+    keys = [key for feed in feeds for key in _version_keys(feed)]
+    values = cache.get_many(keys)
+    return {key: values.get(key) or _new_version(key) for key in keys}
+
+
+def _post_entry(version, payload):
+    return version, _post_dependencies(payload['post']), payload
+
+
+def _is_current(entry, version):
+    if entry is None or entry[0] != version:
+        return False
+    dependencies = entry[1]
+    return cache.get_many(list(dependencies)) == dependencies
+
+
+def _fill(key, version, build):
+    """Строит данные поста один раз на все одновременные промахи.
+
+    Строит тот, кто первым занял замок ``cache.add``; остальные ждут его
+    результат до ``POST_CACHE_FILL_TIMEOUT`` и только потом, если замок
+    так и не освободился или данные устарели, строят сами.
+    """
+    lock_key = f'lock:{key}'
+    timeout = settings.POST_CACHE_FILL_TIMEOUT
+    if cache.add(lock_key, True, timeout):
+        try:
+            payload = build()
+            cache.set(key, _post_entry(version, payload),
+                      settings.POST_CACHE_TIMEOUT)
+            return payload
+        finally:
+            cache.delete(lock_key)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(FILL_POLL_INTERVAL)
+        values = cache.get_many([key, lock_key])
+        if _is_current(values.get(key), version):
+            return values[key][2]
+        if lock_key not in values:
+            break
+    return build()
+
+
+def cached_post(post_id, build):
+    """Версия поста и данные его страницы: из кэша или от ``build()``.
+
+    Данные в кэше верны, пока не сменились версия поста (правка,
+    комментарий, готовые миниатюры) и версии лент его автора и группы.
+    Версия, данные и признак свежести читаются одним ``get_many`` до
+    загрузки поста: сразу после правки пост читается с основной базы, а
+    не с отстающей реплики. Имя автора может отставать до
+    ``POST_CACHE_TIMEOUT``.
+    """
+    version_key = _post_version_key(post_id)
+    payload_key = _post_payload_key(post_id)
+    values = cache.get_many(
+        [version_key, _fresh_key(version_key), payload_key])
+    _pin_if_fresh(values, version_key)
+    version = values.get(version_key) or _new_version(version_key)
+    entry = values.get(payload_key)
+    if _is_current(entry, version):
+        return version, entry[2]
+    return version, _fill(payload_key, version, build)
+
+
+def store_post(post_id, payload):
+    """Кладёт в кэш данные поста, только что прочитанные после записи.
+
+    Версия читается после записи: если пост успели изменить ещё раз,
+    запись просто не совпадёт с новой версией и данные перестроятся.
+    """
+    key = _post_version_key(post_id)
+    version = cache.get(key) or _new_version(key)
+    cache.set(_post_payload_key(post_id), _post_entry(version, payload),
+              settings.POST_CACHE_TIMEOUT)
+
+
+def post_etag(request, post, version, pending_comments=()):
+    """ETag страницы поста по версии и уже загруженному посту.
+
+    Версию меняют правка, комментарии и готовые миниатюры; число
+    постов автора, его имя и группа берутся из самого поста. Читателю
+    выводится форма комментария с CSRF-токеном: в ETag входит его секрет,
+    а также его ещё не записанные комментарии (``posts.comment_queue``).
+    """
+    group = post.group
+    csrf_secret = None
+    if request.user.is_authenticated:
+        get_token(request)
+        csrf_secret = request.META['CSRF_COOKIE']
+    queued = [comment.queued for comment in pending_comments]
+    return _etag(version, post.comments_count,
+                 post.author.counters.posts_count, post.author.get_full_name(),
+                 group and group.slug, group and group.title, request.user.pk,
+                 csrf_secret, queued)
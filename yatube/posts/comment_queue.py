@@ -0,0 +1,128 @@
+"""Отложенная запись комментариев пачками (write-behind).
+
+При ``COMMENT_WRITE_BEHIND`` ``add_comment`` не пишет комментарий в базу
+сам, а ставит в очередь процесса. Поток-писатель сбрасывает её одним
+``bulk_create`` в одной транзакции, когда набралось
+``COMMENT_BATCH_SIZE`` комментариев или прошло ``COMMENT_FLUSH_INTERVAL``
+секунд с первого из них. Вместо тысяч мелких пишущих транзакций SQLite
+получает несколько крупных.
+
+Очередь живёт в памяти процесса: свои ещё не записанные комментарии
+автор видит сразу (``pending``), если его следующий запрос попал в тот же
+процесс, иначе — после записи пачки. При штатной остановке процесса
+очередь дописывается (``atexit``), при аварийной — теряется.
+"""
+import atexit
+import itertools
+import logging
+import os
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, transaction
+
+from . import counters
+from .models import Comment, Post
+from .signals import invalidate_comments
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+_condition = threading.Condition()
+_queue = []
+# Пачки, которые пишутся сейчас: их комментарии ещё не видны в базе.
+_writing = []
+_sequence = itertools.count(1)
+_writer_pid = None
+
+
+def _ensure_writer():
+    global _writer_pid
+    # Поток принадлежит процессу, который его запустил: после fork()
+    # воркера сервера нужен свой.
+    if _writer_pid == os.getpid():
+        return
+    _writer_pid = os.getpid()
+    threading.Thread(target=_write_loop, name='comment-writer',
+                     daemon=True).start()
+
+
+def enqueue(comment):
+    """Ставит несохранённый ``comment`` в очередь записи."""
+    comment.queued = next(_sequence)
+    with _condition:
+        _ensure_writer()
+        _queue.append(comment)
+        _condition.notify()
+
+
+def pending(post_id, user_id):
+    """Ещё не записанные комментарии ``user_id`` к посту ``post_id``."""
+    if not _queue and not _writing:
+        return []
+    with _condition:
+        return [comment for comment in itertools.chain(_writing, _queue)
+                if comment.post_id == post_id and comment.author_id == user_id]
+
+
+def _write(batch):
+    post_ids = {comment.post_id for comment in batch}
+    author_ids = {comment.author_id for comment in batch}
+    with transaction.atomic():
+        # Пост или автор могли исчезнуть, пока комментарий ждал в очереди.
+        posts = Post.objects.select_related('author').in_bulk(post_ids)
+        authors = set(User.objects.filter(
+            pk__in=author_ids).values_list('pk', flat=True))
+        batch = [comment for comment in batch
+                 if comment.post_id in posts and comment.author_id in authors]
+        Comment.objects.bulk_create(batch)
+        added = Counter(comment.post_id for comment in batch)
+        for post_id, count in added.items():
+            counters.shift_post(post_id, count)
+    # Сигналы bulk_create не шлёт: кэш сбрасывается здесь, после COMMIT.
+    for post_id in added:
+        invalidate_comments(posts[post_id])
+    return len(batch)
+
+
+def flush():
+    """Записывает всё, что есть в очереди; возвращает число комментариев."""
+    with _condition:
+        batch = _queue[:]
+        del _queue[:]
+        _writing.extend(batch)
+    written = 0
+    size = settings.COMMENT_BATCH_SIZE
+    try:
+        for start in range(0, len(batch), size):
+            part = batch[start:start + size]
+            try:
+                written += _write(part)
+            except Exception:
+                logger.exception('Lost %s queued comments', len(part))
+    finally:
+        done = set(map(id, batch))
+        with _condition:
+            _writing[:] = [comment for comment in _writing
+                           if id(comment) not in done]
+    return written
+
+
+def _write_loop():
+    while True:
+        with _condition:
+            _condition.wait_for(lambda: _queue)
+            # Первый комментарий пачки ждёт не дольше интервала.
+            _condition.wait_for(
+                lambda: len(_queue) >= settings.COMMENT_BATCH_SIZE,
+                timeout=settings.COMMENT_FLUSH_INTERVAL)
+        try:
+            flush()
+        finally:
+            close_old_connections()
+
+
+atexit.register(flush)
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, ImageRefs, Post, UserCounters
+
+User = get_user_model()
+
+
+def _shift(queryset, delta, *fields):
+    if delta:
+        queryset.update(**{name: F(name) + delta for name in fields})
+
+
+def shift_user(user_id, delta, *fields):
+    _shift(UserCounters.objects.filter(user_id=user_id), delta, *fields)
+
+
+def shift_follows(user_id, author_ids, delta):
+    """Подписки ``user_id`` на ``author_ids`` добавлены или сняты."""
+    _shift(UserCounters.objects.filter(user_id__in=author_ids), delta,
+           'followers_count')
+    shift_user(user_id, delta * len(author_ids), 'following_count')
+
+
+def shift_group(group_id, delta):
+    if group_id is not None:
+        _shift(Group.objects.filter(pk=group_id), delta, 'posts_count')
+
+
+def shift_post(post_id, delta):
+    _shift(Post.objects.filter(pk=post_id), delta, 'comments_count')
+
+
+def shift_image(name, delta):
+    """Меняет число ссылок на файл картинки ``name`` (пустое — не файл)."""
+    if not name or not delta:
+        return
+    if delta > 0:
+        ImageRefs.objects.get_or_create(name=name)
+    _shift(ImageRefs.objects.filter(name=name), delta, 'refs')
+
+
+def _count(model, field, outer='pk'):
+    """Подзапрос COUNT(*) строк ``model``, ссылающихся на внешнюю строку."""
+    rows = (model.objects.filter(**{field: OuterRef(outer)})
+            .order_by().values(field).annotate(total=Count('pk'))
+            .values('total'))
+    return Coalesce(Subquery(rows), 0)
+
+
+@transaction.atomic
+def rebuild():
+    """Пересчитывает все счётчики по реальным данным."""
+    existing = UserCounters.objects.values_list('user_id', flat=True)
+    UserCounters.objects.bulk_create(
+        [UserCounters(user_id=user_id) for user_id in
+         User.objects.exclude(pk__in=existing).values_list('pk', flat=True)],
+        batch_size=500,
+    )
+    UserCounters.objects.update(
+        posts_count=_count(Post, 'author', 'user'),
+        followers_count=_count(Follow, 'author', 'user'),
+        following_count=_count(Follow, 'user', 'user'),
+    )
+    Group.objects.update(posts_count=_count(Post, 'group'))
+    Post.objects.update(comments_count=_count(Comment, 'post'))
+    # order_by(): иначе сортировка Post.Meta попадает в DISTINCT.
+    images = Post.objects.exclude(image='').order_by().values_list(
+        'image', flat=True)
+    existing = ImageRefs.objects.values_list('name', flat=True)
+    ImageRefs.objects.bulk_create(
+        [ImageRefs(name=name) for name in
+         images.exclude(image__in=existing).distinct()],
+        batch_size=500,
+    )
+    ImageRefs.objects.update(refs=_count(Post, 'image', 'name'))
@@ -1,5 +1,6 @@
 from django import forms
 from django.forms import ModelForm
+from . import images
 from .models import Post, Comment
 
 
@@ -11,6 +12,23 @@ class PostForm(ModelForm):
             'text': forms.Textarea(attrs={'rows': 10, 'cols': 40}),
         }
 
+    # Поля, которые форма меняет в посте: для save(update_fields=...).
+    update_fields = Meta.fields + ('image_width', 'image_height')
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        # Новая загрузка, а не уже сохранённая картинка поста.
+        if image and hasattr(image, 'image'):
+            self.image_size = images.validate(image)
+        return image
+
+    def save(self, commit=True):
+        if 'image' in self.changed_data:
+            # Размеры загрузки; уменьшенной картинки их обновит пул.
+            size = getattr(self, 'image_size', (None, None))
+            self.instance.image_width, self.instance.image_height = size
+        return super().save(commit)
+
 
 class CommentForm(ModelForm):
     class Meta:
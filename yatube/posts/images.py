@@ -0,0 +1,78 @@
+"""Исходные картинки постов: проверка при загрузке и подготовка в пуле.
+
+Форма смотрит только заголовок файла (размеры без декодирования точек)
+и отклоняет слишком тяжёлые картинки. Пул процессов (``thumbnails``)
+затем поворачивает картинку по EXIF, уменьшает её до
+``IMAGE_MAX_DIMENSION`` по длинной стороне и убирает метаданные, а
+итоговые размеры записывает в ``Post.image_width``/``image_height`` —
+шаблонам не нужно открывать файл ради ``width`` и ``height``.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Ключи Image.info с метаданными: EXIF (в том числе геометка), профиль
+# цвета, XMP, комментарии. Плотность JFIF (dpi) есть почти в каждом
+# JPEG и ничего не выдаёт: ради неё картинку не пережимаем. Прозрачность
+# — не метаданные, её сохраняем.
+METADATA = ('exif', 'icc_profile', 'xmp', 'XML:com.adobe.xmp', 'comment',
+            'photoshop')
+KEEP_INFO = ('transparency',)
+JPEG_QUALITY = 90
+
+
+def validate(upload):
+    """Проверяет размер файла и число точек загруженной картинки.
+
+    ``upload`` — файл после ``forms.ImageField``: его атрибут ``image``
+    открыт Pillow только по заголовку.
+    """
+    if upload.size > settings.IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ.',
+            params={'limit': settings.IMAGE_MAX_UPLOAD_SIZE // 2 ** 20},
+            code='file_too_large')
+    width, height = upload.image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка больше %(limit)d мегапикселей.',
+            params={'limit': settings.IMAGE_MAX_PIXELS // 10 ** 6},
+            code='too_many_pixels')
+    return width, height
+
+
+def _needs_rewrite(image, limit):
+    return (max(image.size) > limit
+            or any(key in image.info for key in METADATA))
+
+
+def prepare(name):
+    """Уменьшает картинку ``name`` и убирает метаданные, если нужно.
+
+    Возвращает ``(name, width, height)`` итогового файла. Исходный файл
+    не удаляется: на него могут ссылаться другие посты, его удалит
+    ``collect_media``. Анимацию не трогает: кадры пришлось бы
+    пересобирать по одному.
+    """
+    limit = settings.IMAGE_MAX_DIMENSION
+    with default_storage.open(name) as stream:
+        image = Image.open(stream)
+        if (getattr(image, 'n_frames', 1) > 1
+                or not _needs_rewrite(image, limit)):
+            return (name,) + image.size
+        image_format = image.format
+        # JPEG декодируется сразу в уменьшенном масштабе (1/2…1/8).
+        image.draft(image.mode, (limit, limit))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((limit, limit), Image.LANCZOS)
+    image.info = {key: image.info[key] for key in KEEP_INFO
+                  if key in image.info}
+    options = {'quality': JPEG_QUALITY} if image_format == 'JPEG' else {}
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return ((default_storage.save(name, ContentFile(buffer.getvalue())),)
+            + image.size)
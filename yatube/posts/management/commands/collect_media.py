@@ -0,0 +1,72 @@
+import posixpath
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import delete
+
+from posts import thumbnails
+from posts.models import ImageRefs, Post
+
+BATCH_SIZE = 500
+
+
+def walk(storage, directory):
+    """Имена всех файлов каталога ``directory`` хранилища, рекурсивно."""
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for subdirectory in directories:
+        yield from walk(storage, posixpath.join(directory, subdirectory))
+
+
+def batches(names):
+    batch = []
+    for name in names:
+        batch.append(name)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Удаляет файлы картинок (и их миниатюры), на которые не '
+            'ссылается ни один пост.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=settings.MEDIA_GC_GRACE,
+            help='Не трогать файлы, изменённые за столько секунд.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что было бы удалено.')
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        directory = Post._meta.get_field('image').upload_to.rstrip('/')
+        removed = 0
+        for batch in batches(walk(storage, directory)):
+            referenced = set(ImageRefs.objects.filter(
+                name__in=batch, refs__gt=0).values_list('name', flat=True))
+            for name in batch:
+                # Повторная загрузка того же файла обновляет время его
+                # изменения (core.storage): свежий файл не трогаем.
+                if (name in referenced
+                        or storage.get_modified_time(name) > cutoff):
+                    continue
+                removed += 1
+                if options['dry_run']:
+                    self.stdout.write(name)
+                    continue
+                delete(thumbnails.source(name))
+                ImageRefs.objects.filter(name=name, refs=0).delete()
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} файлов без ссылок: {removed}.'))
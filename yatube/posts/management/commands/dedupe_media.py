@@ -0,0 +1,42 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.storage import is_hashed
+from posts import caching, counters
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов, загруженные до хранилища по '
+            'содержимому, под имена из хэша: одинаковые файлы сливаются в '
+            'один. Старые файлы затем удаляет collect_media.')
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        names = list(Post.objects.exclude(image='').order_by()
+                     .values_list('image', flat=True).distinct())
+        moved = missing = 0
+        for name in names:
+            if is_hashed(name):
+                continue
+            if not storage.exists(name):
+                missing += 1
+                self.stderr.write(f'Нет файла: {name}')
+                continue
+            with storage.open(name) as stream:
+                new_name = storage.save(name, stream)
+            with transaction.atomic():
+                posts = Post.objects.filter(image=name)
+                post_ids = list(posts.values_list('pk', flat=True))
+                posts.update(image=new_name)
+                counters.shift_image(name, -len(post_ids))
+                counters.shift_image(new_name, len(post_ids))
+            for post_id in post_ids:
+                caching.invalidate_post(post_id)
+            moved += 1
+        unique = Post.objects.exclude(image='').values('image').distinct()
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено картинок: {moved}, без файла: {missing}; '
+            f'разных файлов теперь: {unique.count()}. Дальше: '
+            f'warm_thumbnails и collect_media.'))
@@ -0,0 +1,45 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии и подписки в JSONL '
+            '(файл или «-» для stdout) или в каталог CSV-файлов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('jsonl', 'csv'),
+                            default='jsonl')
+        parser.add_argument('--models', nargs='+', choices=transfer.MODELS,
+                            default=transfer.MODELS)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if options['format'] == 'csv':
+            writer = transfer.CsvWriter(path)
+        elif path == '-':
+            writer = transfer.JsonlWriter(sys.stdout)
+        else:
+            writer = transfer.JsonlWriter(open(path, 'w', encoding='utf-8'),
+                                          close=True)
+        # Отчёт — в stderr: stdout может быть самой выгрузкой.
+        report = self.stderr if path == '-' else self.stdout
+        try:
+            for model in transfer.MODELS:
+                if model not in options['models']:
+                    continue
+                started = time.perf_counter()
+                count = 0
+                for row in transfer.export_rows(model):
+                    writer.write(model, row)
+                    count += 1
+                elapsed = time.perf_counter() - started
+                report.write(f'{model}: {count} строк, '
+                             f'{count / max(elapsed, 1e-9):.0f} строк/с')
+        finally:
+            writer.close()
+        report.write(self.style.SUCCESS('Выгрузка завершена.'))
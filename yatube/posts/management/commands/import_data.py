@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Загружает группы, посты, комментарии и подписки из JSONL '
+            '(файл или «-» для stdin) или из каталога CSV-файлов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int,
+                            default=transfer.BATCH_SIZE)
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Создавать неизвестных пользователей (без пароля).')
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересчитывать счётчики, ленты подписок и поиск.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        importer = transfer.Importer(options['batch_size'],
+                                     options['create_users'])
+        started = time.perf_counter()
+        if os.path.isdir(path):
+            importer.load(transfer.read_csv(path))
+        elif path == '-':
+            importer.load(transfer.read_jsonl(sys.stdin))
+        else:
+            with open(path, encoding='utf-8') as stream:
+                importer.load(transfer.read_jsonl(stream))
+        importer.reset_sequences()
+        elapsed = time.perf_counter() - started
+        for model in transfer.MODELS:
+            self.stdout.write(f'{model}: загружено {importer.imported[model]}'
+                              f', пропущено {importer.skipped[model]}')
+        total = sum(importer.imported.values())
+        self.stdout.write(f'Всего {total} строк, '
+                          f'{total / max(elapsed, 1e-9):.0f} строк/с')
+        if not options['no_rebuild']:
+            transfer.rebuild_derived()
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена.'))
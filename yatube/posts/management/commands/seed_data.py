@@ -0,0 +1,180 @@
+import itertools
+import random
+import time
+from datetime import timedelta
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from posts import transfer
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+SCALES = {
+    'small': {'users': 100, 'groups': 10, 'posts': 2000,
+              'comments': 5000, 'follows': 1000},
+    'medium': {'users': 2000, 'groups': 50, 'posts': 50000,
+               'comments': 150000, 'follows': 40000},
+    'large': {'users': 20000, 'groups': 200, 'posts': 1000000,
+              'comments': 3000000, 'follows': 500000},
+}
+# Показатель степенного закона: посты, подписчики и комментарии
+# сосредоточены у немногих авторов и постов, как в живой соцсети.
+POWER = 1.2
+IMAGE_SHARE = 0.2
+GROUP_SHARE = 0.7
+SENTENCES = 2000
+
+
+def power_law(count):
+    """Накопленные веса рангов 1..count для ``random.choices``."""
+    return list(itertools.accumulate(
+        rank ** -POWER for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами, '
+            'постами с картинками, комментариями и подписками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='small')
+        for name in SCALES['small']:
+            parser.add_argument(f'--{name}', type=int,
+                                help='Заменяет значение из --scale.')
+        parser.add_argument('--images', type=int, default=20,
+                            help='Сколько разных картинок у постов.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        sizes = {name: value if options[name] is None else options[name]
+                 for name, value in SCALES[options['scale']].items()}
+        self.rnd = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.sentences = [self.fake.sentence(nb_words=self.rnd.randint(4, 14))
+                          for _ in range(SENTENCES)]
+
+        started = time.perf_counter()
+        usernames = self.create_users(sizes['users'])
+        images = self.create_images(options['images'])
+        importer = transfer.Importer()
+        importer.load(itertools.chain(
+            self.groups(sizes['groups']),
+            self.posts(sizes['posts'], usernames, sizes['groups'], images),
+            self.comments(sizes['comments'], usernames),
+            self.follows(sizes['follows'], usernames),
+        ))
+        transfer.rebuild_derived()
+        elapsed = time.perf_counter() - started
+
+        total = len(usernames) + sum(importer.imported.values())
+        for model in transfer.MODELS:
+            self.stdout.write(f'{model}: {importer.imported[model]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {total} строк за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-9):.0f} строк/с).'))
+
+    def create_users(self, count):
+        fake = self.fake
+        users = [
+            User(username=f'{fake.user_name()}_{i}',
+                 first_name=fake.first_name(), last_name=fake.last_name(),
+                 email=fake.email(), password=make_password(None))
+            for i in range(count)
+        ]
+        transfer.create_users(users)
+        return [user.username for user in users]
+
+    def create_images(self, count):
+        names = []
+        for i in range(count):
+            name = f'posts/seed-{i}.jpg'
+            if not default_storage.exists(name):
+                color = tuple(self.rnd.randrange(256) for _ in range(3))
+                buffer = BytesIO()
+                Image.new('RGB', (1200, 800), color).save(buffer, 'JPEG')
+                name = default_storage.save(name, ContentFile(
+                    buffer.getvalue()))
+            names.append(name)
+        return names
+
+    def groups(self, count):
+        for i in range(count):
+            yield 'group', {
+                'slug': f'group-{i}',
+                'title': f'{self.fake.word().capitalize()} {i}',
+                'description': self.rnd.choice(self.sentences),
+            }
+
+    def _text(self, sentences):
+        return ' '.join(self.rnd.choices(self.sentences, k=sentences))
+
+    def posts(self, count, usernames, groups, images):
+        rnd = self.rnd
+        weights = power_law(len(usernames))
+        self.first_post = (Post.objects.aggregate(Max('id'))['id__max']
+                           or 0) + 1
+        self.posts_count = count
+        # Посты равномерно за последний год, id растёт вместе с датой.
+        self.now = timezone.now()
+        self.step = timedelta(days=365) / max(count, 1)
+        for i in range(count):
+            with_image = images and rnd.random() < IMAGE_SHARE
+            in_group = groups and rnd.random() < GROUP_SHARE
+            yield 'post', {
+                'id': self.first_post + i,
+                'author': rnd.choices(usernames, cum_weights=weights)[0],
+                'group': (f'group-{rnd.randrange(groups)}' if in_group
+                          else None),
+                'text': self._text(rnd.randint(1, 6)),
+                'pub_date': self._pub_date(i).isoformat(),
+                'image': rnd.choice(images) if with_image else '',
+            }
+
+    def _pub_date(self, index):
+        return self.now - self.step * (self.posts_count - index)
+
+    def comments(self, count, usernames):
+        if not self.posts_count:
+            return
+        rnd = self.rnd
+        # Чаще всего комментируют свежие посты.
+        weights = power_law(self.posts_count)
+        first = (Comment.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        for i in range(count):
+            rank = rnd.choices(range(self.posts_count), cum_weights=weights)[0]
+            index = self.posts_count - 1 - rank
+            created = self._pub_date(index) + timedelta(
+                minutes=rnd.randint(1, 600))
+            yield 'comment', {
+                'id': first + i,
+                'post': self.first_post + index,
+                'author': rnd.choice(usernames),
+                'text': self._text(1),
+                'created': min(created, self.now).isoformat(),
+            }
+
+    def follows(self, count, usernames):
+        """Подписки со степенным распределением числа подписчиков."""
+        if len(usernames) < 2:
+            return
+        rnd = self.rnd
+        weights = power_law(len(usernames))
+        average = count / len(usernames)
+        for username in usernames:
+            wanted = min(len(usernames) - 1,
+                         int(rnd.expovariate(1 / average)) if average else 0)
+            authors = set(rnd.choices(usernames, cum_weights=weights,
+                                      k=wanted * 2))
+            authors.discard(username)
+            for author in itertools.islice(authors, wanted):
+                yield 'follow', {'user': username, 'author': author}
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Заранее готовит миниатюры картинок существующих постов, '
+            'уменьшает их оригиналы и заполняет размеры.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+            help='Число процессов; 0 — без пула, в текущем процессе.')
+
+    def handle(self, *args, **options):
+        images = {}
+        unprepared = set()
+        posts = Post.objects.exclude(image='').values_list(
+            'pk', 'image', 'image_width')
+        for pk, name, width in posts.iterator():
+            images.setdefault(name, []).append(pk)
+            if width is None:
+                unprepared.add(name)
+        names = [name for name in images
+                 if name in unprepared or thumbnails.missing(name)]
+        if options['workers']:
+            with thumbnails.make_pool(options['workers']) as pool:
+                done = list(pool.map(thumbnails.process, names))
+        else:
+            done = [thumbnails.process(name) for name in names]
+        thumbnails.refresh(done)
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры готовы для картинок: {len(done)} '
+            f'(всего картинок: {len(images)}).'))
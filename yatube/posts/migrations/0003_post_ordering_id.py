@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_auto_20230416_0326'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='post',
+            options={'ordering': ('-pub_date', '-id'), 'verbose_name': 'Публикация', 'verbose_name_plural': 'Публикации'},
+        ),
+    ]
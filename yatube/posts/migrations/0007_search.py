@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def fill_search_index(apps, schema_editor):
+    from posts.search import fill
+
+    Post = apps.get_model('posts', 'Post')
+    with schema_editor.connection.cursor() as cursor:
+        fill(cursor, Post.objects.values_list('id', 'text').iterator())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE VIRTUAL TABLE posts_post_search USING fts5(terms)',
+            'DROP TABLE posts_post_search',
+        ),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_image_refs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    ImageRefs = apps.get_model('posts', 'ImageRefs')
+    ImageRefs.objects.bulk_create(
+        [ImageRefs(name=row['image'], refs=row['refs'])
+         for row in Post.objects.exclude(image='').order_by()
+         .values('image').annotate(refs=Count('pk'))],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageRefs',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Файл')),
+                ('refs', models.PositiveIntegerField(default=0, verbose_name='Ссылок')),
+            ],
+            options={
+                'verbose_name': 'Ссылки на картинку',
+                'verbose_name_plural': 'Ссылки на картинки',
+            },
+        ),
+        migrations.RunPython(fill_image_refs, migrations.RunPython.noop),
+    ]
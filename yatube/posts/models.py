@@ -13,6 +13,8 @@ class Group(models.Model):
                             verbose_name='Slug группы')
     description = models.TextField(max_length=2000, blank=True, null=True,
                                    verbose_name='Описание группы')
+    posts_count = models.PositiveIntegerField(default=0, editable=False,
+                                              verbose_name='Постов')
 
     def __str__(self):
         return self.title
@@ -48,6 +50,25 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    # Размеры картинки для атрибутов width/height. Не width_field/
+    # height_field ImageField: с ними Django открывает файл при каждой
+    # загрузке поста, пока размеры не заполнены. Заполняют форма и пул
+    # posts.thumbnails, см. posts/images.py.
+    image_width = models.PositiveIntegerField(
+        null=True,
+        editable=False,
+        verbose_name='Ширина картинки'
+    )
+    image_height = models.PositiveIntegerField(
+        null=True,
+        editable=False,
+        verbose_name='Высота картинки'
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев'
+    )
 
     def __str__(self):
         return self.text[:NUM_OF_CHAR]
@@ -55,7 +76,19 @@ class Post(models.Model):
     class Meta:
         verbose_name = 'Публикация'
         verbose_name_plural = 'Публикации'
-        ordering = ('-pub_date',)
+        # id разрешает совпадения pub_date: порядок ленты стабилен,
+        # и по (pub_date, id) работает keyset-пагинация.
+        ordering = ('-pub_date', '-id')
+        # По индексу на каждую ленту: фильтр + полный ORDER BY ленты,
+        # чтобы страница читалась диапазоном без сортировки.
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -84,6 +117,10 @@ class Comment(models.Model):
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text
@@ -103,8 +140,94 @@ class Follow(models.Model):
         verbose_name='Автор поста'
     )
 
+    # Посты автора разложены по ленте читателя (fan-out-on-write).
+    # Для авторов с огромным числом подписчиков остаётся False,
+    # и их посты дочитываются при показе ленты (fan-out-on-read).
+    materialized = models.BooleanField(
+        default=False,
+        verbose_name='Лента материализована'
+    )
+
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique_author_user_following')
         ]
+
+
+class UserCounters(models.Model):
+    """Денормализованные счётчики пользователя, ведутся сигналами."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(default=0,
+                                              verbose_name='Постов')
+    followers_count = models.PositiveIntegerField(default=0,
+                                                  verbose_name='Подписчиков')
+    following_count = models.PositiveIntegerField(default=0,
+                                                  verbose_name='Подписок')
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class ImageRefs(models.Model):
+    """Число постов, которые ссылаются на файл картинки; ведётся сигналами.
+
+    Одинаковые картинки хранятся одним файлом (``core.storage``): файл с
+    нулём ссылок удаляет команда ``collect_media``.
+    """
+    name = models.CharField(max_length=255, primary_key=True,
+                            verbose_name='Файл')
+    refs = models.PositiveIntegerField(default=0, verbose_name='Ссылок')
+
+    class Meta:
+        verbose_name = 'Ссылки на картинку'
+        verbose_name_plural = 'Ссылки на картинки'
+
+    def __str__(self):
+        return self.name
+
+
+class TimelineEntry(models.Model):
+    """Пост в заранее собранной ленте подписок читателя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор поста'
+    )
+    # Копия Post.pub_date: лента читается одним диапазоном индекса.
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_user_post')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+        ]
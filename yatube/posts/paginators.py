@@ -0,0 +1,118 @@
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+CURSOR_SEPARATOR = '|'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage(Page):
+    """Страница keyset-пагинации: знает только соседей, но не свой номер."""
+
+    def __init__(self, object_list, paginator, cursor, has_next):
+        super().__init__(object_list, None, paginator)
+        self.cursor = cursor
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.cursor is not None
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1])
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (keyset/cursor) вместо OFFSET/LIMIT.
+
+    Следующая страница выбирается условием «строго после последнего
+    объекта предыдущей страницы» по полям ``ordering``, поэтому стоимость
+    запроса не зависит от глубины страницы, а ``COUNT(*)`` не нужен.
+    Последнее поле ``ordering`` должно быть уникальным (обычно ``id``).
+    """
+
+    keyset = True
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-id'), **kwargs):
+        self.ordering = tuple(ordering)
+        super().__init__(object_list.order_by(*self.ordering), per_page,
+                         **kwargs)
+
+    @property
+    def fields(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def encode_cursor(self, obj):
+        if isinstance(obj, dict):
+            values = [obj[name] for name in self.fields]
+        else:
+            values = [getattr(obj, name) for name in self.fields]
+        raw = CURSOR_SEPARATOR.join(
+            value.isoformat() if hasattr(value, 'isoformat') else str(value)
+            for value in values
+        )
+        return urlsafe_base64_encode(raw.encode())
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = urlsafe_base64_decode(cursor).decode()
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise InvalidCursor(cursor)
+        parts = raw.split(CURSOR_SEPARATOR)
+        if len(parts) != len(self.fields):
+            raise InvalidCursor(cursor)
+        opts = self.object_list.model._meta
+        try:
+            values = [
+                opts.get_field(name).to_python(part)
+                for name, part in zip(self.fields, parts)
+            ]
+        except ValidationError:
+            raise InvalidCursor(cursor)
+        if any(value is None for value in values):
+            raise InvalidCursor(cursor)
+        return values
+
+    def _after(self, values):
+        """Q-условие «строго после» для (f1, f2, ...) с учётом направления.
+
+        Дублирующая граница ``f1 <= v1`` делает условие диапазоном по
+        индексу: одно только OR-разложение SQLite читает сканированием.
+        """
+        condition = Q()
+        equal = {}
+        for name, value in zip(self.ordering, values):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        first = self.ordering[0]
+        bound = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{bound}': values[0]}) & condition
+
+    def get_page(self, cursor):
+        """Страница после ``cursor``; битый курсор ведёт на первую."""
+        queryset = self.object_list
+        if cursor:
+            try:
+                queryset = queryset.filter(
+                    self._after(self.decode_cursor(cursor)))
+            except InvalidCursor:
+                cursor = None
+        # Лишний объект показывает, есть ли следующая страница.
+        object_list = list(queryset[:self.per_page + 1])
+        has_next = len(object_list) > self.per_page
+        return CursorPage(object_list[:self.per_page], self, cursor or None,
+                          has_next)
@@ -0,0 +1,142 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+В индексе (таблица ``posts_post_search``, rowid — id поста) лежат не
+тексты, а основы слов после стеммера: «котами» и «кот» находят друг
+друга. Индекс обновляют сигналы сохранения и удаления поста, целиком его
+пересобирает команда ``rebuild_search_index``.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .stemmer import stem
+
+TABLE = 'posts_post_search'
+BATCH_SIZE = 1000
+# Ранжируются только столько самых новых совпадений: BM25 по всем
+# совпадениям частого слова на миллионе постов — сотни миллисекунд.
+MAX_RESULTS = 1000
+WORD_RE = re.compile(r'[^\W_]+')
+# Служебные слова (список Snowball) есть почти в каждом посте: в индексе
+# они только раздувают списки документов, а BM25 по ним читает весь список.
+STOP_WORDS = frozenset('''
+    а без более больше будет будто бы был была были было быть в вам вас
+    ведь весь во вот впрочем все всегда всего всех всю вы где да даже два
+    для до другой его ее ей ему если есть еще ж же за зачем здесь и из или
+    им иногда их к как какая какой когда конечно кто куда ли лучше между
+    меня мне много может можно мой моя мы на над надо наконец нас не него
+    нее ней нельзя нет ни нибудь никогда ним них ничего но ну о об один он
+    она они опять от перед по под после потом потому почти при про раз
+    разве с сам свою себе себя сейчас со совсем так такой там тебя тем
+    теперь то тогда того тоже только том тот три тут ты у уж уже хорошо
+    хоть чего чем через что чтоб чтобы чуть эти этого этой этом этот эту я
+'''.split())
+
+
+def terms(text):
+    """Основы слов текста через пробел — так текст лежит в индексе."""
+    words = WORD_RE.findall(text.lower().replace('ё', 'е'))
+    return ' '.join(stem(word) for word in words if word not in STOP_WORDS)
+
+
+def match_expression(query):
+    """Запрос FTS5: все слова запроса, каждое — основой в кавычках.
+
+    Кавычки делают из любого ввода пользователя корректный запрос: слово
+    не может оказаться оператором (``NOT``, ``NEAR``) или синтаксисом.
+    """
+    words = terms(query).split()
+    return ' '.join(f'"{word}"' for word in words) or None
+
+
+def index(post_id, text):
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+        cursor.execute(f'INSERT INTO {TABLE} (rowid, terms) VALUES (%s, %s)',
+                       [post_id, terms(text)])
+
+
+def unindex(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def fill(cursor, rows):
+    """Кладёт в пустой индекс пары (id, текст) пачками по ``BATCH_SIZE``."""
+    batch = []
+    for post_id, text in rows:
+        batch.append((post_id, terms(text)))
+        if len(batch) == BATCH_SIZE:
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, terms) VALUES (%s, %s)', batch)
+            batch = []
+    if batch:
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, terms) VALUES (%s, %s)', batch)
+
+
+@transaction.atomic
+def rebuild():
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        fill(cursor, Post.objects.values_list('id', 'text').iterator())
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+
+
+def filter_posts(queryset, query):
+    """Сужает ``queryset`` до постов, найденных по ``query``, без ранжирования.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [expression]))
+
+
+class SearchResults:
+    """Найденные посты по убыванию релевантности (BM25).
+
+    Ранжируются ``MAX_RESULTS`` самых новых совпадений: их FTS5 читает
+    по убыванию rowid (id поста растёт вместе с датой), не трогая
+    остальные. Результат отдаёт срезы и ``count()``, поэтому страницы
+    строит обычный ``Paginator``: на страницу читается один срез id из
+    индекса и сами посты одним запросом.
+    """
+
+    def __init__(self, query, queryset=None):
+        self.expression = match_expression(query)
+        self.queryset = Post.objects.all() if queryset is None else queryset
+
+    def _matches(self, columns):
+        return (f'SELECT {columns} FROM {TABLE} WHERE {TABLE} MATCH %s '
+                f'ORDER BY rowid DESC LIMIT {MAX_RESULTS}')
+
+    def count(self):
+        if self.expression is None:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM ({self._matches("rowid")})',
+                [self.expression])
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step is not None:
+            raise TypeError('SearchResults supports only slices.')
+        start, stop = key.start or 0, key.stop
+        if self.expression is None or (stop is not None and stop <= start):
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id FROM ({self._matches("rowid AS id, rank")}) '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                [self.expression, -1 if stop is None else stop - start,
+                 start])
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = self.queryset.in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
@@ -0,0 +1,192 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from . import caching, counters, search, timeline
+from .models import (Comment, Follow, Group, Post, TimelineEntry,
+                     UserCounters)
+
+User = get_user_model()
+
+# Поля пользователя, видные в карточках постов.
+USER_CARD_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def post_feeds(post, *group_ids):
+    """Ленты, на страницах которых показан пост."""
+    feeds = [caching.index_feed(), caching.profile_feed(post.author.username)]
+    group_ids = {group_id for group_id in (post.group_id, *group_ids)
+                 if group_id is not None}
+    if group_ids:
+        feeds.extend(caching.group_feed(slug) for slug in Group.objects.filter(
+            pk__in=group_ids).values_list('slug', flat=True))
+    return feeds
+
+
+@receiver(post_save, sender=User)
+def create_user_counters(sender, instance, created, raw=False, **kwargs):
+    # Из фикстуры (raw) пользователь приходит без счётчиков: без строки
+    # профиль падал бы до пересчёта. Если в фикстуре есть и счётчики,
+    # loaddata перезапишет эту строку своей.
+    if created or raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    instance._saved_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    # Вход сохраняет только last_login: ни карточки, ни ленты не меняются.
+    if raw or created or (update_fields is not None
+                          and not USER_CARD_FIELDS & set(update_fields)):
+        return
+    # Имя автора и ссылка на профиль — в карточках всех его постов и в
+    # лентах с ними, включая профиль по прежнему username.
+    usernames = {instance.username, instance._saved_username} - {None}
+    caching.invalidate_feeds([
+        caching.index_feed(),
+        *map(caching.profile_feed, usernames),
+        *(caching.group_feed(slug) for slug in Group.objects.filter(
+            posts__author=instance).distinct().values_list('slug',
+                                                           flat=True)),
+    ])
+    caching.invalidate_cards(
+        instance.posts.values_list('pk', flat=True).iterator())
+    instance._saved_username = instance.username
+
+
+@receiver(post_init, sender=Post)
+def remember_post_group(sender, instance, **kwargs):
+    # Группу поста можно сменить при редактировании: запоминаем исходную,
+    # чтобы перенести счётчик и сбросить кэш старой группы без лишнего
+    # запроса. Отложенное поле (.only()/.defer()) не трогаем, иначе это и
+    # был бы лишний запрос.
+    instance._saved_group_id = instance.__dict__.get('group_id')
+    # Так же исходная картинка: её файл теряет ссылку.
+    image = instance.__dict__.get('image')
+    instance._saved_image = getattr(image, 'name', image)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if raw:
+        return
+    if update_fields is None or 'text' in update_fields:
+        search.index(instance.pk, instance.text)
+    old_group_id = instance._saved_group_id
+    old_image = None if created else instance._saved_image
+    with transaction.atomic():
+        if created:
+            counters.shift_user(instance.author_id, 1, 'posts_count')
+            counters.shift_group(instance.group_id, 1)
+        elif old_group_id != instance.group_id:
+            counters.shift_group(old_group_id, -1)
+            counters.shift_group(instance.group_id, 1)
+        image_saved = update_fields is None or 'image' in update_fields
+        if image_saved and old_image != instance.image.name:
+            counters.shift_image(old_image, -1)
+            counters.shift_image(instance.image.name, 1)
+    instance._saved_group_id = instance.group_id
+    if image_saved:
+        instance._saved_image = instance.image.name
+    if created:
+        # Новый пост сразу попадает в ленты подписчиков автора.
+        timeline.fan_out(instance)
+        caching.invalidate_feeds(post_feeds(instance), new_post=True)
+    else:
+        caching.invalidate_feeds(post_feeds(instance, old_group_id))
+        caching.invalidate_post(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    search.unindex(instance.pk)
+    with transaction.atomic():
+        counters.shift_user(instance.author_id, -1, 'posts_count')
+        counters.shift_group(instance.group_id, -1)
+        counters.shift_image(instance.image.name, -1)
+    caching.invalidate_feeds(post_feeds(instance))
+    caching.invalidate_post(instance.pk)
+
+
+def invalidate_comments(post):
+    """Сбрасывает кэш поста и лент после смены его комментариев."""
+    # Число комментариев показано в карточке поста в лентах.
+    caching.invalidate_feeds(post_feeds(post))
+    caching.invalidate_post(post.pk)
+
+
+def comment_changed(comment, delta):
+    counters.shift_post(comment.post_id, delta)
+    invalidate_comments(comment.post)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        comment_changed(instance, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    comment_changed(instance, -1)
+
+
+@receiver(post_init, sender=Group)
+def remember_group_slug(sender, instance, **kwargs):
+    instance._saved_slug = instance.__dict__.get('slug')
+
+
+def group_feeds(group, slug):
+    """Лента группы, главная и профили авторов, где видна ссылка группы."""
+    authors = User.objects.filter(posts__group=group).distinct()
+    return [caching.group_feed(slug), caching.index_feed(),
+            *(caching.profile_feed(username) for username in
+              authors.values_list('username', flat=True))]
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    old_slug = instance._saved_slug
+    if old_slug == instance.slug:
+        caching.invalidate_feeds([caching.group_feed(instance.slug)])
+    else:
+        caching.invalidate_feeds([caching.group_feed(instance.slug),
+                                  *group_feeds(instance, old_slug)])
+    caching.invalidate_cards(
+        instance.posts.values_list('pk', flat=True).iterator())
+    instance._saved_slug = instance.slug
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    # До удаления: потом посты группы уже отвязаны (SET_NULL).
+    caching.invalidate_feeds(group_feeds(instance, instance.slug))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        with transaction.atomic():
+            counters.shift_follows(instance.user_id, [instance.author_id], 1)
+        caching.invalidate_follows(instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    with transaction.atomic():
+        counters.shift_follows(instance.user_id, [instance.author_id], -1)
+        # Удаление через ORM или админку: посты автора уходят из ленты,
+        # как при timeline.unfollow.
+        TimelineEntry.objects.filter(user_id=instance.user_id,
+                                     author_id=instance.author_id).delete()
+    caching.invalidate_follows(instance.user_id)
@@ -0,0 +1,123 @@
+"""Стеммер Snowball для русского языка.
+
+Перенос алгоритма https://snowballstem.org/algorithms/russian/stemmer.html
+без зависимостей. Слова на других языках возвращаются как есть.
+"""
+from functools import lru_cache
+
+VOWELS = frozenset('аеиоуыэюя')
+
+# Окончание -> должно ли перед ним стоять «а» или «я».
+PERFECTIVE_GERUND = {
+    **dict.fromkeys(('в', 'вши', 'вшись'), True),
+    **dict.fromkeys(('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'), False),
+}
+ADJECTIVE = dict.fromkeys((
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им',
+    'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая',
+    'яя', 'ою', 'ею'), False)
+PARTICIPLE = {
+    **dict.fromkeys(('ем', 'нн', 'вш', 'ющ', 'щ'), True),
+    **dict.fromkeys(('ивш', 'ывш', 'ующ'), False),
+}
+REFLEXIVE = dict.fromkeys(('ся', 'сь'), False)
+VERB = {
+    **dict.fromkeys((
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+        'ют', 'ны', 'ть', 'ешь', 'нно'), True),
+    **dict.fromkeys((
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+        'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+        'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'), False),
+}
+NOUN = dict.fromkeys((
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я'),
+    False)
+DERIVATIONAL = dict.fromkeys(('ост', 'ость'), False)
+SUPERLATIVE = dict.fromkeys(('ейш', 'ейше'), False)
+LONGEST_ENDING = 6
+
+
+def _after_vowel_consonant(word, start):
+    """Начало области за первой парой «гласная, согласная» от ``start``."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _longest(word, endings):
+    """Самое длинное из ``endings``, которым кончается ``word``."""
+    for length in range(min(LONGEST_ENDING, len(word)), 0, -1):
+        if word[-length:] in endings:
+            return word[-length:]
+    return ''
+
+
+def _remove(word, endings):
+    """Отрезает самое длинное из ``endings``; ``None`` — окончания нет.
+
+    Как и в Snowball, если условие самого длинного окончания не выполнено,
+    более короткие не пробуются.
+    """
+    found = _longest(word, endings)
+    if not found:
+        return None
+    stem = word[:-len(found)]
+    if endings[found] and not stem.endswith(('а', 'я')):
+        return None
+    return stem
+
+
+def _adjectival(word):
+    stem = _remove(word, ADJECTIVE)
+    if stem is None:
+        return None
+    without_participle = _remove(stem, PARTICIPLE)
+    return stem if without_participle is None else without_participle
+
+
+def _step1(ending):
+    stemmed = _remove(ending, PERFECTIVE_GERUND)
+    if stemmed is not None:
+        return stemmed
+    reflexive = _remove(ending, REFLEXIVE)
+    if reflexive is not None:
+        ending = reflexive
+    stemmed = _adjectival(ending)
+    if stemmed is None:
+        stemmed = _remove(ending, VERB)
+    if stemmed is None:
+        stemmed = _remove(ending, NOUN)
+    return ending if stemmed is None else stemmed
+
+
+def _tidy_up(ending):
+    superlative = _longest(ending, SUPERLATIVE)
+    if superlative:
+        ending = ending[:-len(superlative)]
+    if ending.endswith('нн'):
+        return ending[:-1]
+    if not superlative and ending.endswith('ь'):
+        return ending[:-1]
+    return ending
+
+
+@lru_cache(maxsize=100000)
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv = next((i + 1 for i, char in enumerate(word) if char in VOWELS),
+              len(word))
+    # Все окончания ищутся в RV — части слова после первой гласной.
+    head, ending = word[:rv], word[rv:]
+    r2 = _after_vowel_consonant(word, _after_vowel_consonant(word, 0)) - rv
+
+    ending = _step1(ending)
+    if ending.endswith('и'):
+        ending = ending[:-1]
+    derivational = _longest(ending, DERIVATIONAL)
+    if derivational and len(ending) - len(derivational) >= r2:
+        ending = ending[:-len(derivational)]
+    return head + _tidy_up(ending)
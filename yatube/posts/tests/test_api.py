@@ -0,0 +1,115 @@
+import gzip
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import compression
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(API_PAGE_SIZE=2)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author',
+                                              first_name='Лев')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {i}',
+                                group=cls.group if i % 2 else None)
+            for i in range(3)
+        ]
+        cls.comment = Comment.objects.create(
+            post=cls.posts[0], author=cls.author, text='Комментарий')
+
+    def setUp(self):
+        self.client = Client()
+
+    def get(self, name, query=None, **kwargs):
+        response = self.client.get(reverse(f'posts:{name}', kwargs=kwargs),
+                                   query or {})
+        self.assertEqual(response['Content-Type'],
+                         'application/json; charset=utf-8')
+        return response, json.loads(response.content)
+
+    def test_feed_pages_by_cursor(self):
+        """Лента листается по курсору next до конца."""
+        response, data = self.get('api_index')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post['id'] for post in data['results']],
+                         [self.posts[2].id, self.posts[1].id])
+        self.assertEqual(data['results'][0]['author'], 'author')
+        self.assertEqual(data['results'][0]['pub_date'],
+                         self.posts[2].pub_date.isoformat())
+        self.assertIsNone(data['results'][0]['image'])
+        _, data = self.get('api_index', {'after': data['next']})
+        self.assertEqual([post['id'] for post in data['results']],
+                         [self.posts[0].id])
+        self.assertIsNone(data['next'])
+
+    def test_sparse_fields(self):
+        """?fields= оставляет в ответе только перечисленные поля."""
+        _, data = self.get('api_group_posts', {'fields': 'id,group'},
+                           slug='group')
+        self.assertEqual(data['results'],
+                         [{'id': self.posts[1].id, 'group': 'group'}])
+        response, data = self.get('api_index', {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', data['detail'])
+
+    def test_limit(self):
+        _, data = self.get('api_index', {'limit': 3})
+        self.assertEqual(len(data['results']), 3)
+        response, _ = self.get('api_index', {'limit': 101})
+        self.assertEqual(response.status_code, 400)
+
+    def test_profile_post_and_comments(self):
+        _, data = self.get('api_profile', username='author')
+        self.assertEqual(data['first_name'], 'Лев')
+        self.assertEqual(data['posts_count'], 3)
+        _, data = self.get('api_profile_posts', {'fields': 'text'},
+                           username='author')
+        self.assertEqual(data['results'][0], {'text': 'Пост 2'})
+        _, data = self.get('api_post', post_id=self.posts[0].id)
+        self.assertEqual(data['comments_count'], 1)
+        _, data = self.get('api_post_comments', post_id=self.posts[0].id)
+        self.assertEqual(data['results'][0]['text'], 'Комментарий')
+
+    def test_missing_objects(self):
+        """Несуществующие автор, группа и пост — 404 в JSON."""
+        for name, kwargs in (('api_profile', {'username': 'nobody'}),
+                             ('api_profile_posts', {'username': 'nobody'}),
+                             ('api_group_posts', {'slug': 'nothing'}),
+                             ('api_post', {'post_id': 0})):
+            with self.subTest(name=name):
+                response, data = self.get(name, **kwargs)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('detail', data)
+
+    def test_read_only(self):
+        response = self.client.post(reverse('posts:api_index'))
+        self.assertEqual(response.status_code, 405)
+
+    @override_settings(COMPRESS_MIN_SIZE=0)
+    def test_gzip(self):
+        response = self.client.get(reverse('posts:api_index'),
+                                   HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(data['results']), 2)
+        response = self.client.get(reverse('posts:api_index'),
+                                   HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class NegotiationTest(TestCase):
+    def test_accepted_encodings(self):
+        self.assertEqual(
+            compression.accepted_encodings('gzip;q=0.5, br, deflate;q=0'),
+            {'gzip', 'br'})
+        self.assertEqual(compression.accepted_encodings(''), set())
@@ -0,0 +1,285 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import caching
+from ..models import Comment, Group, Post
+from ..views import NUM_POST
+
+User = get_user_model()
+
+
+class FeedCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {i}',
+                                group=cls.group)
+            for i in range(NUM_POST + 2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.index_url = reverse('posts:index')
+
+    def test_guest_hit_is_one_cache_read(self):
+        """Повторная главная для гостя отдаётся из кэша без запросов к БД."""
+        first = self.guest_client.get(self.index_url)
+        with self.assertNumQueries(0):
+            second = self.guest_client.get(self.index_url)
+        self.assertEqual(first.content, second.content)
+
+    def test_new_post_keeps_cursor_pages(self):
+        """Новый пост сбрасывает голову ленты, но не страницы по курсору."""
+        first = self.guest_client.get(self.index_url)
+        after_url = (self.index_url + '?after='
+                     + first.context['page_obj'].next_cursor)
+        self.guest_client.get(after_url)
+        Post.objects.create(author=self.author, text='Новый пост')
+        with self.assertNumQueries(0):
+            self.guest_client.get(after_url)
+        response = self.guest_client.get(self.index_url)
+        self.assertContains(response, 'Новый пост')
+
+    def test_new_post_updates_profile_cursor_pages(self):
+        """Страница профиля по курсору показывает новое число постов."""
+        url = reverse('posts:profile',
+                      kwargs={'username': self.author.username})
+        first = self.guest_client.get(url)
+        after_url = f'{url}?after={first.context["page_obj"].next_cursor}'
+        response = self.guest_client.get(after_url)
+        self.assertContains(response, f'Всего постов: {NUM_POST + 2}')
+        etag = response['ETag']
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.guest_client.get(after_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, f'Всего постов: {NUM_POST + 3}')
+
+    def test_bogus_cursors_share_first_page(self):
+        """Битые курсоры не кладут в кэш свои копии первой страницы."""
+        for cursor in ('bogus1', 'bogus2'):
+            self.guest_client.get(self.index_url, {'after': cursor})
+            self.assertIsNone(cache.get(
+                f'page:{caching.index_feed()}:after={cursor}'))
+        self.assertIsNotNone(cache.get(f'page:{caching.index_feed()}:'))
+        with self.assertNumQueries(0):
+            self.guest_client.get(self.index_url)
+        self.guest_client.get(self.index_url, {'page': '999'})
+        self.assertIsNone(cache.get(f'page:{caching.index_feed()}:page=999'))
+        self.assertIsNotNone(cache.get(f'page:{caching.index_feed()}:page=2'))
+
+    def test_edit_and_delete_invalidate_feeds(self):
+        """Правка и удаление поста сбрасывают ленты с ним."""
+        post = self.posts[-1]
+        urls = [
+            self.index_url,
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+        ]
+        for url in urls:
+            self.guest_client.get(url)
+        post.text = 'Исправленный пост'
+        post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url),
+                                    'Исправленный пост')
+        post.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotContains(self.guest_client.get(url),
+                                       'Исправленный пост')
+
+    def test_unrelated_feed_stays_cached(self):
+        """Пост в другой группе не сбрасывает кэш этой группы."""
+        url = reverse('posts:group_posts', kwargs={'slug': self.group.slug})
+        self.guest_client.get(url)
+        other = Group.objects.create(title='Другая', slug='other')
+        Post.objects.create(author=self.author, text='Чужой', group=other)
+        with self.assertNumQueries(0):
+            self.guest_client.get(url)
+
+    def test_comment_updates_post_card(self):
+        """Комментарий обновляет счётчик в карточке поста."""
+        post = self.posts[-1]
+        self.assertContains(self.guest_client.get(self.index_url),
+                            'Комментариев: 0')
+        Comment.objects.create(post=post, author=self.author, text='Ок')
+        self.assertContains(self.guest_client.get(self.index_url),
+                            'Комментариев: 1')
+
+    def test_author_rename_updates_cards(self):
+        """Новое имя автора видно в карточках, в том числе читателю."""
+        reader = Client()
+        reader.force_login(User.objects.create_user(username='reader'))
+        for client in (self.guest_client, reader):
+            client.get(self.index_url)
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Лев'
+        author.last_name = 'Толстой'
+        author.save()
+        for client in (self.guest_client, reader):
+            with self.subTest(client=client):
+                self.assertContains(client.get(self.index_url),
+                                    'Лев Толстой')
+
+    def test_login_keeps_cards(self):
+        self.guest_client.get(self.index_url)
+        self.author.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            self.guest_client.get(self.index_url)
+
+    def test_group_edit_invalidates_group_page(self):
+        """Правка группы сбрасывает её страницу."""
+        url = reverse('posts:group_posts', kwargs={'slug': self.group.slug})
+        self.guest_client.get(url)
+        self.group.description = 'Новое описание'
+        self.group.save()
+        self.assertContains(self.guest_client.get(url), 'Новое описание')
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def revalidate(self, client, url):
+        """Статус повторного запроса с ETag первого ответа."""
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_unchanged_feed_is_not_modified(self):
+        """Неизменная лента — 304 без запросов к БД и без шаблона."""
+        url = reverse('posts:index')
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_feed_etag_depends_on_reader_and_follows(self):
+        """ETag профиля свой у каждого читателя и меняется с подпиской."""
+        url = reverse('posts:profile',
+                      kwargs={'username': self.author.username})
+        self.assertEqual(self.revalidate(self.reader_client, url), 304)
+        guest_etag = self.guest_client.get(url)['ETag']
+        etag = self.reader_client.get(url)['ETag']
+        self.assertNotEqual(guest_etag, etag)
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author.username}))
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Отписаться')
+
+    def test_post_detail(self):
+        """Страница поста — 304, пока не изменились пост и комментарии."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.assertEqual(self.revalidate(self.guest_client, url), 304)
+        self.assertEqual(self.revalidate(self.reader_client, url), 304)
+        etag = self.reader_client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Коммент')
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Коммент')
+        etag = response['ETag']
+        Post.objects.create(author=self.author, text='Ещё пост')
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class PostCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(author=cls.author, text='Пост',
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.url = reverse('posts:post_detail',
+                           kwargs={'post_id': self.post.pk})
+
+    def test_hit_reads_no_database(self):
+        self.guest_client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(self.url)
+        self.assertContains(response, 'Пост')
+
+    def test_edit_and_comment_write_through(self):
+        """Правка и комментарий сразу кладут в кэш новые данные поста."""
+        self.guest_client.get(self.url)
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            {'text': 'Новый текст', 'group': self.group.pk})
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(self.url)
+        self.assertContains(response, 'Новый текст')
+        self.author_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Свежий комментарий'})
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(self.url)
+        self.assertContains(response, 'Свежий комментарий')
+
+    def test_group_rename_refreshes_post(self):
+        self.guest_client.get(self.url)
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertContains(self.guest_client.get(self.url),
+                            'Новое название')
+
+    def test_concurrent_misses_build_once(self):
+        """Одновременные промахи строят данные поста один раз."""
+        post = Post.objects.select_related('author', 'group').get(
+            pk=self.post.pk)
+        calls = []
+
+        def build():
+            calls.append(1)
+            time.sleep(0.05)
+            return {'post': post}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            caching.cached_post(post.pk, build)[1]['post'].pk))
+            for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, [post.pk] * 8)
+
+    @override_settings(POST_CACHE_FILL_TIMEOUT=0.05)
+    def test_stuck_lock_falls_back_to_build(self):
+        """Занятый и не отпущенный замок не мешает построить данные."""
+        cache.add(f'lock:post-payload:{self.post.pk}', True)
+        version, payload = caching.cached_post(
+            self.post.pk, lambda: {'post': self.post})
+        self.assertEqual(payload['post'], self.post)
@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import comment_queue
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+# Пачку пишет сам тест (flush): поток-писатель за время теста не успеет.
+@override_settings(COMMENT_WRITE_BEHIND=True, COMMENT_BATCH_SIZE=100,
+                   COMMENT_FLUSH_INTERVAL=60)
+class CommentQueueTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(comment_queue.flush)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.url = reverse('posts:post_detail',
+                           kwargs={'post_id': self.post.pk})
+
+    def comment(self, text, post_id=None):
+        return self.reader_client.post(
+            reverse('posts:add_comment',
+                    kwargs={'post_id': post_id or self.post.pk}),
+            {'text': text})
+
+    def test_author_sees_queued_comment(self):
+        """Автор сразу видит свой комментарий, остальные — после записи."""
+        etag = self.reader_client.get(self.url)['ETag']
+        # Только сессия и пользователь: ни поста, ни INSERT.
+        with self.assertNumQueries(2):
+            self.comment('Из очереди')
+        self.assertFalse(Comment.objects.exists())
+        response = self.reader_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Из очереди')
+        self.assertContains(response, 'публикуется')
+        self.assertNotContains(self.author_client.get(self.url), 'Из очереди')
+        self.assertEqual(comment_queue.flush(), 1)
+        response = self.author_client.get(self.url)
+        self.assertContains(response, 'Из очереди')
+        self.assertEqual(response.context['post'].comments_count, 1)
+
+    def test_flush_in_batches(self):
+        for i in range(5):
+            self.comment(f'Комментарий {i}')
+        # Три пачки: посты, авторы, INSERT и счётчик в каждой.
+        with self.settings(COMMENT_BATCH_SIZE=2):
+            self.assertEqual(comment_queue.flush(), 5)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 5)
+        self.assertEqual(comment_queue.pending(self.post.pk, self.reader.pk),
+                         [])
+
+    def test_drops_comments_to_deleted_posts(self):
+        post = Post.objects.create(author=self.author, text='Удаляется')
+        self.comment('Пропадёт', post.pk)
+        self.comment('Останется')
+        post.delete()
+        self.assertEqual(comment_queue.flush(), 1)
+        self.assertEqual(list(Comment.objects.values_list('text', flat=True)),
+                         ['Останется'])
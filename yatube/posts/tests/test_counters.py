@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.other_group = Group.objects.create(title='Другая',
+                                               slug='other')
+
+    def assertCounters(self, user, **expected):
+        counters = UserCounters.objects.get(user=user)
+        for name, value in expected.items():
+            with self.subTest(name=name):
+                self.assertEqual(getattr(counters, name), value)
+
+    def test_post_counters(self):
+        """Счётчики постов автора и группы следуют за постами."""
+        post = Post.objects.create(author=self.author, text='Пост',
+                                   group=self.group)
+        self.assertCounters(self.author, posts_count=1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.other_group.posts_count, 0)
+        self.assertCounters(self.author, posts_count=0)
+
+    def test_comment_counter(self):
+        """Счётчик комментариев поста следует за комментариями."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text='Комментарий')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Счётчики подписчиков и подписок следуют за подписками."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertCounters(self.author, followers_count=1)
+        self.assertCounters(self.reader, following_count=1)
+        follow.delete()
+        self.assertCounters(self.author, followers_count=0)
+        self.assertCounters(self.reader, following_count=0)
+
+    def test_rebuild_counters_command(self):
+        """Команда rebuild_counters восстанавливает счётчики."""
+        Post.objects.bulk_create([
+            Post(author=self.author, text='Пост', group=self.group)
+            for _ in range(3)
+        ])
+        UserCounters.objects.filter(user=self.reader).delete()
+        call_command('rebuild_counters', stdout=open('/dev/null', 'w'))
+        self.assertCounters(self.author, posts_count=3)
+        self.assertCounters(self.reader, posts_count=0)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 3)
+
+    def test_profile_reads_counter(self):
+        """Профиль берёт число постов из счётчика, без COUNT(*)."""
+        Post.objects.create(author=self.author, text='Пост')
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().get(reverse('posts:profile', kwargs={
+                'username': self.author.username}))
+        self.assertEqual(response.context['count'], 1)
+        for query in queries:
+            self.assertNotIn('COUNT(', query['sql'])
@@ -0,0 +1,89 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class FollowStatementTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def url(self, name, username='author'):
+        return reverse(f'posts:{name}', kwargs={'username': username})
+
+    def test_follow_is_idempotent(self):
+        """Повторная подписка не падает и не меняет счётчики."""
+        self.assertEqual(timeline.follow(self.reader, self.author), (1, 1))
+        self.assertEqual(timeline.follow(self.reader, self.author), (1, 1))
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(timeline.follow(self.reader, self.reader), (0, 1))
+
+    def test_follow_after_concurrent_insert(self):
+        """Подписка, которую уже создал соседний запрос, — не 500."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(self.url('profile_follow'),
+                                   HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.json(), {'following': True,
+                                           'followers_count': 1,
+                                           'following_count': 1})
+
+    def test_unfollow_returns_counts(self):
+        timeline.follow(self.reader, self.author)
+        response = self.client.get(self.url('profile_unfollow'),
+                                   HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.json(), {'following': False,
+                                           'followers_count': 0,
+                                           'following_count': 0})
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(timeline.unfollow(self.reader, self.author), (0, 0))
+
+    def test_unfollow_missing_author(self):
+        response = self.client.get(self.url('profile_unfollow', 'missing'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_follow_many(self):
+        """Пропускаются сам читатель, неизвестные и уже подписанные."""
+        timeline.follow(self.reader, self.other)
+        response = self.client.post(reverse('posts:follow_many'), {
+            'username': ['author', 'other', 'reader', 'missing']})
+        self.assertRedirects(response, reverse('posts:follow_index'))
+        self.assertEqual(
+            sorted(Follow.objects.values_list('author__username', flat=True)),
+            ['author', 'other'])
+        self.assertEqual(timeline.follow_counts(self.reader, self.author),
+                         (1, 2))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.post).exists())
+
+    def test_follow_many_limits(self):
+        url = reverse('posts:follow_many')
+        self.assertEqual(self.client.get(url).status_code, 405)
+        with self.settings(FOLLOW_MANY_LIMIT=1):
+            response = self.client.post(
+                url, {'username': ['author', 'other']})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Follow.objects.exists())
+
+    @mock.patch('posts.timeline._has_returning', return_value=False)
+    def test_follow_many_without_returning(self, has_returning):
+        timeline.follow(self.reader, self.other)
+        self.assertEqual(timeline.follow_many(
+            self.reader, [self.author.pk, self.other.pk]), 1)
+        self.assertEqual(timeline.follow_counts(self.reader, self.author),
+                         (1, 2))
+        self.assertTrue(Follow.objects.get(author=self.author).materialized)
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import counters, thumbnails
+from ..models import ImageRefs, Post
+from .test_thumbnails import SMALL_GIF, uploaded
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class MediaTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def refs(self, name):
+        return ImageRefs.objects.get(name=name).refs
+
+    def collect(self):
+        call_command('collect_media', grace=0, stdout=StringIO())
+
+    def test_same_image_shares_file(self):
+        first = Post.objects.create(author=self.author, text='Первый',
+                                    image=uploaded('one.gif'))
+        second = Post.objects.create(author=self.author, text='Второй',
+                                     image=uploaded('two.gif'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.refs(first.image.name), 2)
+        first.delete()
+        self.assertEqual(self.refs(second.image.name), 1)
+
+    def test_rebuild_counts_shared_image(self):
+        """Пересчёт создаёт одну запись на файл, общий для постов."""
+        post = Post.objects.create(author=self.author, text='Первый',
+                                   image=uploaded())
+        Post.objects.create(author=self.author, text='Второй',
+                            image=uploaded())
+        ImageRefs.objects.all().delete()
+        counters.rebuild()
+        self.assertEqual(self.refs(post.image.name), 2)
+
+    def test_collect_removes_only_orphans(self):
+        kept = Post.objects.create(author=self.author, text='Остаётся',
+                                   image=uploaded())
+        post = Post.objects.create(author=self.author, text='Удаляется',
+                                   image=uploaded())
+        post.image = ContentFile(b'GIF89a other', name='other.gif')
+        post.save()
+        orphan = default_storage.save('posts/orphan.gif',
+                                      ContentFile(b'orphan'))
+        self.assertEqual(self.refs(kept.image.name), 1)
+        self.assertEqual(self.refs(post.image.name), 1)
+        other = post.image.name
+        post.delete()
+        self.collect()
+        self.assertTrue(default_storage.exists(kept.image.name))
+        self.assertFalse(default_storage.exists(other))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(ImageRefs.objects.filter(name=other).exists())
+
+    def test_collect_removes_thumbnails(self):
+        post = Post.objects.create(author=self.author, text='Пост',
+                                   image=uploaded())
+        thumbnails.schedule(post)
+        name = post.image.name
+        post.delete()
+        self.collect()
+        self.assertFalse(default_storage.exists(name))
+        self.assertEqual(len(thumbnails.missing(name)),
+                         len(thumbnails.GEOMETRIES))
+
+    def test_grace_keeps_fresh_files(self):
+        name = default_storage.save('posts/fresh.gif', ContentFile(b'new'))
+        call_command('collect_media', stdout=StringIO())
+        self.assertTrue(default_storage.exists(name))
+
+    def test_dedupe_merges_old_files(self):
+        legacy = FileSystemStorage()
+        names = [legacy.save('posts/legacy.gif', ContentFile(SMALL_GIF))
+                 for _ in range(2)]
+        self.assertNotEqual(*names)
+        for name in names:
+            Post.objects.create(author=self.author, text=name, image=name)
+        call_command('dedupe_media', stdout=StringIO())
+        images = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(images), 1)
+        name = images.pop()
+        self.assertEqual(self.refs(name), 2)
+        self.collect()
+        self.assertTrue(default_storage.exists(name))
+        for old in names:
+            self.assertFalse(os.path.exists(legacy.path(old)))
@@ -0,0 +1,91 @@
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from ..models import Comment, Follow, Group, Post
+from .. import counters, timeline
+
+User = get_user_model()
+
+SCALES = (10, 100, 1000)
+
+
+class QueryBudgetMixin:
+    """Проверка бюджета SQL-запросов, объявленного у view."""
+
+    def assertWithinQueryBudget(self, client, url):
+        view = resolve(urlsplit(url).path).func
+        budget = getattr(view, 'query_budget', None)
+        self.assertIsNotNone(budget, f'У view для {url} не объявлен бюджет')
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{url}: {len(queries)} запросов при бюджете {budget}:\n'
+            + '\n'.join(query['sql'] for query in queries)
+        )
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author',
+                                              first_name='Лев')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(author=cls.author, text='Пост',
+                                       group=cls.group)
+        Follow.objects.create(user=cls.reader, author=cls.author,
+                              materialized=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def grow_to(self, scale):
+        """Доводит число постов и комментариев к посту до ``scale``."""
+        missing = scale - Post.objects.count()
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'Пост {i}', group=self.group)
+            for i in range(missing)
+        ])
+        missing = scale - Comment.objects.count()
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.reader, text=f'Коммент {i}')
+            for i in range(missing)
+        ])
+        counters.rebuild()
+        timeline.rebuild()
+
+    def test_feed_views_within_budget(self):
+        """Число запросов ленты и поста не зависит от числа объектов."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:post_comments',
+                    kwargs={'post_id': self.post.id}),
+            reverse('posts:api_index') + '?limit=100',
+            reverse('posts:api_group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:api_profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:api_profile_posts',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:api_post', kwargs={'post_id': self.post.id}),
+            reverse('posts:api_post_comments',
+                    kwargs={'post_id': self.post.id}),
+        ]
+        for scale in SCALES:
+            self.grow_to(scale)
+            for url in urls:
+                with self.subTest(scale=scale, url=url):
+                    self.assertWithinQueryBudget(self.client, url)
@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+from ..stemmer import stem
+from ..views import NUM_POST
+from .test_queries import QueryBudgetMixin
+
+User = get_user_model()
+
+
+class StemmerTest(TestCase):
+    def test_snowball_stems(self):
+        """Стеммер совпадает с эталонными основами Snowball."""
+        for word, expected in (
+            ('вагонов', 'вагон'),
+            ('важнейшими', 'важн'),
+            ('валялась', 'валя'),
+            ('вежливости', 'вежлив'),
+            ('прочитав', 'прочита'),
+            ('Ёлками', 'елк'),
+            ('python', 'python'),
+        ):
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+
+class SearchTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.cats = Post.objects.create(
+            author=cls.author, text='Коты гуляли по крышам')
+        cls.cat = Post.objects.create(
+            author=cls.author, text='Кот, коту, котом: про кота и крышу')
+        cls.dog = Post.objects.create(author=cls.author, text='Собака спала')
+
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('posts:search')
+
+    def found(self, query):
+        return list(search.SearchResults(query)[:NUM_POST])
+
+    def test_stemmed_and_ranked(self):
+        """Словоформы находят друг друга, релевантные посты — первыми."""
+        self.assertEqual(self.found('котов'), [self.cat, self.cats])
+        self.assertEqual(self.found('крыша коты'), [self.cat, self.cats])
+        self.assertEqual(self.found('кот собака'), [])
+        self.assertEqual(self.found('и на по'), [])
+        self.assertEqual(self.found('коты и крыши'), [self.cat, self.cats])
+
+    def test_index_follows_edits(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        self.dog.text = 'Собака спала на крыше'
+        self.dog.save()
+        self.assertIn(self.dog, self.found('крыши'))
+        Post.objects.filter(pk=self.cats.pk).delete()
+        self.assertNotIn(self.cats, self.found('крыши'))
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 во вводе пользователя не ломают поиск."""
+        for query in ('"', 'NOT', 'кот OR собака', 'кот*', '(', ''):
+            with self.subTest(query=query):
+                response = self.client.get(self.url, {'q': query})
+                self.assertEqual(response.status_code, 200)
+
+    def test_paginated_view(self):
+        """Страницы поиска нумерованы и сохраняют запрос в ссылках."""
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'Кошка номер {i}')
+            for i in range(NUM_POST + 1)
+        ])
+        search.rebuild()
+        response = self.client.get(self.url, {'q': 'кошки'})
+        self.assertEqual(response.context['paginator'].count, NUM_POST + 1)
+        self.assertEqual(len(response.context['page_obj']), NUM_POST)
+        self.assertContains(response, 'href="?q=%D0%BA%D0%BE%D1%88%D0%BA%D0'
+                                      '%B8&amp;page=2"')
+        self.assertWithinQueryBudget(self.client, self.url + '?q=кошки')
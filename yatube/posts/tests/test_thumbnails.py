@@ -0,0 +1,192 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def uploaded(name='small.gif'):
+    return SimpleUploadedFile(name=name, content=SMALL_GIF,
+                              content_type='image/gif')
+
+
+def photo(size=(400, 200), orientation=6):
+    """JPEG с EXIF: поворотом ``orientation`` и моделью камеры."""
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x0110] = 'Camera'
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(name='photo.jpg', content=buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_template_never_resizes(self):
+        """Без готовой миниатюры шаблон показывает исходную картинку."""
+        post = Post.objects.create(author=self.author, text='Пост',
+                                   image=uploaded())
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, post.image.url)
+        self.assertEqual(len(thumbnails.missing(post.image.name)),
+                         len(thumbnails.GEOMETRIES))
+
+    def test_upload_generates_thumbnails(self):
+        """Загрузка картинки через форму готовит все миниатюры."""
+        self.client.post(reverse('posts:post_create'),
+                         {'text': 'С картинкой', 'image': uploaded()})
+        post = Post.objects.get(text='С картинкой')
+        self.assertEqual(thumbnails.missing(post.image.name), [])
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertNotContains(response, post.image.url)
+
+    def test_warm_thumbnails(self):
+        """Команда готовит миниатюры для уже сохранённых постов."""
+        post = Post.objects.create(author=self.author, text='Пост',
+                                   image=uploaded())
+        call_command('warm_thumbnails', workers=0, stdout=StringIO())
+        self.assertEqual(thumbnails.missing(post.image.name), [])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0,
+                   IMAGE_MAX_DIMENSION=100)
+class ImagePipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def create(self, image):
+        return self.client.post(reverse('posts:post_create'),
+                                {'text': 'С картинкой', 'image': image})
+
+    def test_small_image_keeps_file_and_stores_size(self):
+        self.create(uploaded())
+        post = Post.objects.get(text='С картинкой')
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        with post.image.open() as stream:
+            self.assertEqual(stream.read(), SMALL_GIF)
+
+    def test_plain_jpeg_keeps_file(self):
+        """JPEG без EXIF в пределах размера не пережимается."""
+        buffer = BytesIO()
+        Image.new('RGB', (80, 60), 'red').save(buffer, 'JPEG', dpi=(72, 72))
+        content = buffer.getvalue()
+        self.create(SimpleUploadedFile(name='plain.jpg', content=content,
+                                       content_type='image/jpeg'))
+        post = Post.objects.get(text='С картинкой')
+        self.assertEqual(post.image.name,
+                         default_storage.save('posts/plain.jpg',
+                                              BytesIO(content)))
+        with post.image.open() as stream:
+            self.assertEqual(stream.read(), content)
+
+    def test_large_photo_downsampled_without_metadata(self):
+        """Оригинал повёрнут по EXIF, уменьшен и очищен от метаданных."""
+        self.create(photo())
+        post = Post.objects.get(text='С картинкой')
+        self.assertEqual((post.image_width, post.image_height), (50, 100))
+        with post.image.open() as stream:
+            image = Image.open(stream)
+            self.assertEqual(image.size, (50, 100))
+            self.assertNotIn('exif', image.info)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, 'height="339"')
+
+    def test_downsampled_photo_path(self):
+        """Уменьшенная картинка лежит там же, где такая же загрузка."""
+        self.create(photo(size=(400, 300), orientation=1))
+        name = Post.objects.get(text='С картинкой').image.name
+        self.assertRegex(name, r'^posts/([0-9a-f]{2})/([0-9a-f]{2})/'
+                               r'\1\2[0-9a-f]{60}\.jpg$')
+        with default_storage.open(name) as stream:
+            self.assertEqual(
+                default_storage.save('posts/copy.jpg', stream), name)
+
+    def test_processing_refreshes_all_posts_with_image(self):
+        """Переименованная картинка видна во всех её постах и лентах."""
+        posts = [Post.objects.create(author=self.author, text=f'Пост {i}',
+                                     image=photo(orientation=1))
+                 for i in range(2)]
+        old_url = posts[1].image.url
+        guest = Client()
+        detail_url = reverse('posts:post_detail',
+                             kwargs={'post_id': posts[1].pk})
+        self.assertContains(guest.get(detail_url), old_url)
+        self.assertContains(guest.get(reverse('posts:index')), old_url)
+        thumbnails.schedule(posts[0])
+        posts[1].refresh_from_db()
+        self.assertNotEqual(posts[1].image.url, old_url)
+        for url in (detail_url, reverse('posts:index')):
+            with self.subTest(url=url):
+                self.assertNotContains(guest.get(url), old_url)
+
+    @override_settings(IMAGE_MAX_PIXELS=1)
+    def test_rejects_too_many_pixels(self):
+        response = self.create(uploaded())
+        self.assertTrue(response.context['form'].has_error(
+            'image', 'too_many_pixels'))
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=10)
+    def test_rejects_large_file(self):
+        response = self.create(uploaded())
+        self.assertTrue(response.context['form'].has_error(
+            'image', 'file_too_large'))
+        self.assertFalse(Post.objects.exists())
+
+    def test_edit_updates_size(self):
+        post = Post.objects.create(author=self.author, text='Пост',
+                                   image=uploaded())
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Пост', 'image': photo(orientation=1)})
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (100, 50))
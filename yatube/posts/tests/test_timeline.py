@@ -0,0 +1,105 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry
+from .. import timeline
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(author=cls.author,
+                                           text='Старый пост')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def follow(self):
+        self.reader_client.get(reverse('posts:profile_follow', kwargs={
+            'username': self.author.username}))
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту уже опубликованные посты автора."""
+        self.follow()
+        self.assertTrue(Follow.objects.get(user=self.reader).materialized)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленту подписчика при сохранении."""
+        self.follow()
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [post, self.old_post])
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        self.follow()
+        self.reader_client.get(reverse('posts:profile_unfollow', kwargs={
+            'username': self.author.username}))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_orm_delete_prunes_timeline(self):
+        """Подписка, удалённая через ORM, тоже убирает посты из ленты."""
+        self.follow()
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    @override_settings(FOLLOW_FANOUT_LIMIT=0)
+    def test_popular_author_is_read_on_demand(self):
+        """Посты популярного автора дочитываются при показе ленты."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=other,
+                              materialized=True)
+        other_post = Post.objects.create(author=other, text='Другой пост')
+        self.follow()
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertFalse(Follow.objects.get(
+            user=self.reader, author=self.author).materialized)
+        self.assertFalse(TimelineEntry.objects.filter(
+            author=self.author).exists())
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [new_post, other_post, self.old_post])
+
+    def test_cursor_pages_merge_both_sources(self):
+        """Курсор ленты подписок проходит обе части ленты без повторов."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=other)
+        self.follow()
+        for i in range(7):
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            Post.objects.create(author=other, text=f'Другой {i}')
+        expected = list(Post.objects.filter(
+            author__following__user=self.reader))
+        seen = []
+        cursor = None
+        while True:
+            page = timeline.get_page(self.reader, cursor, 4)
+            seen.extend(page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+
+    def test_rebuild_restores_timeline(self):
+        """Пересборка восстанавливает ленту из подписок."""
+        self.follow()
+        TimelineEntry.objects.all().delete()
+        timeline.rebuild()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
@@ -0,0 +1,153 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TransferTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.author, text='Про котов',
+                                       group=cls.group)
+        cls.comment = Comment.objects.create(post=cls.post, author=cls.reader,
+                                             text='Коммент')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def snapshot(self):
+        return (
+            list(Group.objects.values_list('slug', 'title', 'description')),
+            list(Post.objects.values_list('id', 'author__username',
+                                          'group__slug', 'text', 'pub_date')),
+            list(Comment.objects.values_list('id', 'post_id',
+                                             'author__username', 'created')),
+            list(Follow.objects.values_list('user__username',
+                                            'author__username')),
+        )
+
+    def wipe(self):
+        for model in (Follow, Comment, Post, Group):
+            model.objects.all().delete()
+        User.objects.exclude(pk__in=[self.author.pk, self.reader.pk]).delete()
+
+    def roundtrip(self, path, fmt):
+        before = self.snapshot()
+        call_command('export_data', path, format=fmt, stdout=StringIO())
+        self.wipe()
+        call_command('import_data', path, stdout=StringIO())
+        self.assertEqual(self.snapshot(), before)
+
+    def test_jsonl_roundtrip(self):
+        """Выгрузка в JSONL и загрузка обратно сохраняют данные и даты."""
+        self.roundtrip(os.path.join(self.directory, 'dump.jsonl'), 'jsonl')
+
+    def test_csv_roundtrip(self):
+        """Выгрузка в каталог CSV и загрузка обратно сохраняют данные."""
+        self.roundtrip(self.directory, 'csv')
+
+    def test_import_rebuilds_derived_data(self):
+        """После загрузки пересчитаны счётчики, ленты и поисковый индекс."""
+        path = os.path.join(self.directory, 'dump.jsonl')
+        call_command('export_data', path, stdout=StringIO())
+        self.wipe()
+        call_command('import_data', path, stdout=StringIO())
+        post = Post.objects.get()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Group.objects.get().posts_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(list(search.SearchResults('кот')[:1]), [post])
+
+    def test_unknown_users_and_reimport(self):
+        """Неизвестные авторы пропускаются или создаются; дублей нет."""
+        path = os.path.join(self.directory, 'new.jsonl')
+        created = datetime(2021, 5, 1, tzinfo=timezone.utc).isoformat()
+        rows = [
+            {'model': 'post', 'id': 100, 'author': 'stranger', 'group': None,
+             'text': 'Чужой пост', 'pub_date': created, 'image': ''},
+            {'model': 'comment', 'id': 100, 'post': 100,
+             'author': 'stranger', 'text': 'Чужой коммент',
+             'created': created},
+        ]
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.writelines(json.dumps(row) + '\n' for row in rows)
+        call_command('import_data', path, stdout=StringIO())
+        self.assertFalse(Post.objects.filter(pk=100).exists())
+        for _ in range(2):
+            call_command('import_data', path, create_users=True,
+                         stdout=StringIO())
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.author.username, 'stranger')
+        self.assertFalse(post.author.has_usable_password())
+        self.assertEqual(post.pub_date.isoformat(), created)
+        self.assertEqual(Comment.objects.filter(post=post).count(), 1)
+
+    def test_reimport_reports_only_new_rows(self):
+        """Повторная загрузка не считает загруженными уже бывшие строки."""
+        path = os.path.join(self.directory, 'dump.jsonl')
+        call_command('export_data', path, stdout=StringIO())
+        with open(path, encoding='utf-8') as stream:
+            rows = [json.loads(line) for line in stream]
+        with open(path, 'a', encoding='utf-8') as stream:
+            stream.write(json.dumps(dict(rows[-1])) + '\n')
+        output = StringIO()
+        call_command('import_data', path, stdout=output)
+        for model in ('group', 'post', 'comment', 'follow'):
+            with self.subTest(model=model):
+                self.assertIn(f'{model}: загружено 0', output.getvalue())
+        self.assertIn('Всего 0 строк', output.getvalue())
+
+    def test_created_users_have_counters(self):
+        """Созданный при загрузке автор открывается и без пересчёта."""
+        path = os.path.join(self.directory, 'new.jsonl')
+        created = datetime(2021, 5, 1, tzinfo=timezone.utc).isoformat()
+        row = {'model': 'post', 'id': 100, 'author': 'stranger',
+               'group': None, 'text': 'Чужой пост', 'pub_date': created,
+               'image': ''}
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(json.dumps(row) + '\n')
+        call_command('import_data', path, create_users=True, no_rebuild=True,
+                     stdout=StringIO())
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'stranger'}))
+        self.assertEqual(response.status_code, 200)
+
+    def test_fixture_users_have_counters(self):
+        """Пользователь из фикстуры (loaddata) открывается без пересчёта."""
+        path = os.path.join(self.directory, 'users.json')
+        with open(path, 'w', encoding='utf-8') as stream:
+            json.dump([
+                {'model': 'auth.user', 'pk': 100,
+                 'fields': {'username': 'fixture', 'password': '!'}},
+                {'model': 'auth.user', 'pk': 101,
+                 'fields': {'username': 'counted', 'password': '!'}},
+                {'model': 'posts.usercounters', 'pk': 101,
+                 'fields': {'followers_count': 3}},
+            ], stream)
+        call_command('loaddata', path, verbosity=0)
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'fixture'}))
+        self.assertEqual(response.status_code, 200)
+        # Счётчики из самой фикстуры не затираются.
+        self.assertEqual(User.objects.get(
+            username='counted').counters.followers_count, 3)
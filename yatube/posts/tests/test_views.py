@@ -2,8 +2,9 @@ from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from django.urls import reverse
 from django import forms
-from ..models import Group, Post, User, Follow
-from posts.views import NUM_POST
+from ..models import Comment, Group, Post, User, Follow
+from posts.views import NUM_COMMENTS, NUM_POST
+from posts import counters
 from django.core.cache import cache
 
 User = get_user_model()
@@ -145,9 +146,9 @@ class PostPagesTests(TestCase):
         """Кэш index сформирован с правильным контекстом."""
         response = self.authorized_client.get(reverse('posts:index'))
         content = response.content
-        post_id = PostPagesTests.post.id
-        instance = Post.objects.get(pk=post_id)
-        instance.delete()
+        # Правка в обход сигналов не сбрасывает кэш ленты.
+        Post.objects.filter(pk=PostPagesTests.post.id).update(
+            text='Другой текст')
         new_response = self.authorized_client.get(reverse('posts:index'))
         new_content = new_response.content
         self.assertEqual(content, new_content)
@@ -181,6 +182,8 @@ class PaginatorViewsTest(TestCase):
             )
         ]
         Post.objects.bulk_create(list_objs)
+        # bulk_create не шлёт сигналов: досчитываем счётчики вручную.
+        counters.rebuild()
 
     def setUp(self):
         self.authorized_client = Client()
@@ -204,6 +207,93 @@ class PaginatorViewsTest(TestCase):
                           pages_names,
                           page_offset)
 
+    def test_cursor_pages_walk_whole_feed(self):
+        """Ссылки ?after= обходят ленту без пропусков и повторов."""
+        pages_names = [
+            reverse('posts:index'),
+            reverse('posts:group_posts',
+                    kwargs={'slug': PaginatorViewsTest.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': PaginatorViewsTest.user.username}),
+        ]
+        expected = list(Post.objects.values_list('id', flat=True))
+        for url in pages_names:
+            with self.subTest(url=url):
+                seen = []
+                page_url = url
+                while page_url:
+                    response = self.authorized_client.get(page_url)
+                    page_obj = response.context['page_obj']
+                    seen.extend(post.id for post in page_obj)
+                    page_url = (url + '?after=' + page_obj.next_cursor
+                                if page_obj.has_next() else None)
+                self.assertEqual(seen, expected)
+
+    def test_cursor_page_has_no_count_query(self):
+        """Страница по курсору не выполняет COUNT(*)."""
+        response = self.authorized_client.get(reverse('posts:index'))
+        cursor = response.context['page_obj'].next_cursor
+        with self.assertNumQueries(3):
+            # Сессия, пользователь и одна выборка постов.
+            response = self.authorized_client.get(
+                reverse('posts:index') + '?after=' + cursor)
+        self.assertEqual(len(response.context['page_obj']),
+                         PaginatorViewsTest.NUM_POST_OF_PAGE_2)
+
+    def test_invalid_cursor_shows_first_page(self):
+        """Битый курсор ведёт на первую страницу."""
+        response = self.authorized_client.get(
+            reverse('posts:index') + '?after=broken')
+        self.assertEqual(len(response.context['page_obj']), NUM_POST)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
+class CommentPaginationTest(TestCase):
+    NUM_COMMENTS_OF_PAGE_2 = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.user,
+                    text=f'Комментарий #{i}')
+            for i in range(
+                NUM_COMMENTS + CommentPaginationTest.NUM_COMMENTS_OF_PAGE_2)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_post_page_shows_first_comments(self):
+        """Страница поста показывает только первую страницу комментариев."""
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}))
+        page = response.context['comments_page']
+        self.assertEqual(len(page), NUM_COMMENTS)
+        self.assertEqual(page[0].text, 'Комментарий #0')
+        self.assertContains(response, page.next_cursor)
+
+    def test_fragment_continues_after_cursor(self):
+        """Фрагмент отдаёт следующие комментарии без поста и формы."""
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}))
+        cursor = response.context['comments_page'].next_cursor
+        response = self.client.get(reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'after': cursor})
+        self.assertTemplateUsed(response, 'includes/comments.html')
+        self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+        page = response.context['comments_page']
+        self.assertEqual([comment.text for comment in page], [
+            f'Комментарий #{i}' for i in range(
+                NUM_COMMENTS,
+                NUM_COMMENTS + CommentPaginationTest.NUM_COMMENTS_OF_PAGE_2)
+        ])
+        self.assertFalse(page.has_next())
+
 
 def get_page_contains(self, client, page_names, page_offset):
     for page_URL, num_of_posts_in_page in page_offset.items():
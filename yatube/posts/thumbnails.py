@@ -0,0 +1,184 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from core import metrics
+
+from . import caching, counters, images
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Все миниатюры картинок постов, которые выводят шаблоны
+# (includes/post_list.html, includes/content.html, posts/post_detail.html).
+# Параметры должны совпадать с тегом {% thumbnail %} буква в букву:
+# от них зависит имя файла миниатюры.
+GEOMETRIES = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+# Сколько имён картинок проверяется одним запросом в refresh().
+REFRESH_BATCH_SIZE = 500
+
+_pool = None
+_pool_pid = None
+_lock = threading.Lock()
+
+
+class PregeneratedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, который в запросе только ищет миниатюру.
+
+    Готовую миниатюру отдаёт из хранилища ключей, а при промахе не
+    декодирует картинку, а возвращает ``None``: тег ``{% thumbnail %}``
+    рисует ветку ``{% empty %}`` с исходной картинкой. Миниатюры готовит
+    пул процессов (``schedule``) и команда ``warm_thumbnails``.
+    """
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        thumbnail = self.lookup(file_, geometry_string, **options)
+        if thumbnail is None:
+            logger.debug('Thumbnail for [%s] at [%s] is not ready',
+                         file_, geometry_string)
+        return thumbnail
+
+    def lookup(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        # Те же умолчания, что у ThumbnailBackend.get_thumbnail: иначе
+        # не совпадёт имя файла миниатюры.
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        thumbnail = ImageFile(name, default.storage)
+        cached = default.kvstore.get(thumbnail)
+        if cached is None and hasattr(default.kvstore, 'cache'):
+            # Промах sorl кэширует надолго, а миниатюру готовит другой
+            # процесс: забываем промах, чтобы увидеть готовую миниатюру.
+            default.kvstore.cache.delete(add_prefix(thumbnail.key))
+        return cached
+
+
+def source(name):
+    # Хранилище картинок постов, а не миниатюр: оно входит в ключ sorl, и
+    # ключ должен совпасть с ключом тега {% thumbnail post.image %}.
+    return ImageFile(name, default_storage)
+
+
+def missing(name):
+    """Геометрии, для которых у картинки ``name`` ещё нет миниатюры."""
+    backend = PregeneratedThumbnailBackend()
+    return [(geometry, options) for geometry, options in GEOMETRIES
+            if backend.lookup(source(name), geometry, **options) is None]
+
+
+def generate(name):
+    """Готовит недостающие миниатюры картинки ``name``."""
+    backend = ThumbnailBackend()
+    for geometry, options in missing(name):
+        backend.get_thumbnail(source(name), geometry, **options)
+    return name
+
+
+def process(name):
+    """Готовит исходную картинку ``name`` (см. ``images``) и миниатюры.
+
+    Новые размеры и, если файл пришлось переименовать, новое имя
+    получают все посты с этой картинкой.
+    """
+    new_name, width, height = images.prepare(name)
+    with transaction.atomic():
+        moved = Post.objects.filter(image=name).update(
+            image=new_name, image_width=width, image_height=height)
+        if new_name != name:
+            counters.shift_image(name, -moved)
+            counters.shift_image(new_name, moved)
+    return generate(new_name)
+
+
+def make_pool(workers):
+    # spawn, а не fork: форк процесса с потоками и открытыми соединениями
+    # к базе небезопасен. Дочерний процесс сам настраивает Django.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup,
+    )
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    with _lock:
+        # Пул принадлежит процессу, который его создал: после fork()
+        # воркера сервера нужен свой.
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = make_pool(settings.THUMBNAIL_WORKERS)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def refresh(names):
+    """Сбрасывает кэш постов с картинками ``names`` и лент с ними.
+
+    ``process`` меняет имя и размеры картинки всем её постам через
+    ``update()``, без сигналов: карточки, данные постов и страницы лент
+    иначе остались бы со старым именем и размерами.
+    """
+    names = list(names)
+    feeds = set()
+    for start in range(0, len(names), REFRESH_BATCH_SIZE):
+        posts = Post.objects.filter(
+            image__in=names[start:start + REFRESH_BATCH_SIZE],
+        ).values_list('pk', 'author__username', 'group__slug')
+        for post_id, username, slug in posts:
+            caching.invalidate_post(post_id)
+            feeds.update((caching.index_feed(),
+                          caching.profile_feed(username)))
+            if slug is not None:
+                feeds.add(caching.group_feed(slug))
+    caching.invalidate_feeds(feeds)
+
+
+def _generated(post_id, future):
+    error = future.exception()
+    if error is not None:
+        logger.error('Thumbnails for post %s failed', post_id,
+                     exc_info=error)
+        return
+    # Колбэк идёт в служебном потоке пула: его соединение закрываем.
+    try:
+        refresh([future.result()])
+    finally:
+        connection.close()
+
+
+def schedule(post):
+    """Ставит в очередь пула подготовку картинки поста и её миниатюр.
+
+    При ``THUMBNAIL_WORKERS = 0`` миниатюры готовятся сразу, в текущем
+    процессе.
+    """
+    if not post.image:
+        return
+    metrics.count('thumbnails')
+    if not settings.THUMBNAIL_WORKERS:
+        refresh([process(post.image.name)])
+        return
+    future = _get_pool().submit(process, post.image.name)
+    future.add_done_callback(lambda future: _generated(post.pk, future))
@@ -0,0 +1,213 @@
+from heapq import merge
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from . import caching, counters
+from .models import Follow, Post, TimelineEntry, UserCounters
+from .paginators import CursorPage, CursorPaginator
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+
+def _bulk_insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по материализованным лентам подписчиков."""
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id, materialized=True,
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post.id,
+                      author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in follower_ids.iterator()
+    )
+
+
+def _ignore_conflicts(sql):
+    """INSERT, пропускающий строки, которые нарушили бы уникальность."""
+    ops = connection.ops
+    return ' '.join(filter(None, (
+        ops.insert_statement(ignore_conflicts=True), sql,
+        ops.ignore_conflicts_suffix_sql(ignore_conflicts=True))))
+
+
+def backfill(user_id, author_ids):
+    """Кладёт в ленту читателя все уже опубликованные посты авторов."""
+    if not author_ids:
+        return
+    entries, posts = TimelineEntry._meta.db_table, Post._meta.db_table
+    marks = ', '.join(['%s'] * len(author_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(_ignore_conflicts(
+            f'{entries} (user_id, post_id, author_id, pub_date) '
+            f'SELECT %s, id, author_id, pub_date FROM {posts} '
+            f'WHERE author_id IN ({marks})'), [user_id, *author_ids])
+
+
+def _has_returning():
+    """Возвращает ли база вставленные строки (INSERT ... RETURNING)."""
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return connection.vendor == 'postgresql'
+
+
+def _insert_follows(user_id, author_ids):
+    """Подписывает читателя на авторов; [(автор, materialized)] новых.
+
+    Подписка — один INSERT ... SELECT без предварительной проверки:
+    существующие пары пропускает сама база, поэтому одновременные
+    запросы не упираются в ``unique_author_user_following``. Там же
+    решается, раскладывать ли посты автора по ленте, и отбрасываются
+    несуществующие авторы и сам читатель.
+    """
+    follows, users, user_counters = (
+        model._meta.db_table for model in (Follow, User, UserCounters))
+    sql = _ignore_conflicts(
+        f'{follows} (user_id, author_id, materialized) '
+        f'SELECT %s, u.id, COALESCE(c.followers_count, 0) < %s '
+        f'FROM {users} u LEFT JOIN {user_counters} c ON c.user_id = u.id '
+        f'WHERE u.id <> %s AND u.id IN ({{}})')
+    params = [user_id, settings.FOLLOW_FANOUT_LIMIT, user_id]
+    with connection.cursor() as cursor:
+        if _has_returning():
+            marks = ', '.join(['%s'] * len(author_ids))
+            cursor.execute(sql.format(marks) + ' RETURNING author_id, '
+                           'materialized', [*params, *author_ids])
+            return [(author_id, bool(materialized))
+                    for author_id, materialized in cursor.fetchall()]
+        # Без RETURNING вставленные строки видны только по rowcount.
+        added = []
+        for author_id in author_ids:
+            cursor.execute(sql.format('%s'), [*params, author_id])
+            if cursor.rowcount:
+                added.append(author_id)
+    return list(Follow.objects.filter(
+        user_id=user_id, author_id__in=added,
+    ).values_list('author_id', 'materialized'))
+
+
+def follow_many(user, author_ids):
+    """Подписывает читателя на авторов ``author_ids``.
+
+    Уже существующие подписки не меняются. Возвращает число новых.
+    """
+    author_ids = list(author_ids)
+    if not author_ids:
+        return 0
+    with transaction.atomic():
+        added = _insert_follows(user.id, author_ids)
+        if added:
+            counters.shift_follows(
+                user.id, [author_id for author_id, _ in added], 1)
+            backfill(user.id, [author_id for author_id, materialized
+                               in added if materialized])
+    if added:
+        caching.invalidate_follows(user.id)
+    return len(added)
+
+
+def follow_counts(user, author):
+    """(подписчиков у автора, подписок у читателя) по счётчикам."""
+    rows = dict(
+        (user_id, counts) for user_id, *counts in
+        UserCounters.objects.filter(user_id__in=[user.id, author.id])
+        .values_list('user_id', 'followers_count', 'following_count'))
+    return rows.get(author.id, (0, 0))[0], rows.get(user.id, (0, 0))[1]
+
+
+def follow(user, author):
+    """Подписывает читателя на автора; повторная подписка ничего не меняет.
+
+    Возвращает счётчики после подписки, как ``follow_counts``.
+    """
+    follow_many(user, [author.id])
+    return follow_counts(user, author)
+
+
+def unfollow(user, author):
+    """Отписывает читателя; возвращает счётчики, как ``follow_counts``."""
+    follows = Follow._meta.db_table
+    with transaction.atomic():
+        # Один DELETE: его rowcount и говорит, была ли подписка.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {follows} WHERE user_id = %s '
+                f'AND author_id = %s', [user.id, author.id])
+            deleted = cursor.rowcount
+        if deleted:
+            counters.shift_follows(user.id, [author.id], -1)
+            TimelineEntry.objects.filter(user=user, author=author).delete()
+    if deleted:
+        caching.invalidate_follows(user.id)
+    return follow_counts(user, author)
+
+
+def get_page(user, cursor, per_page):
+    """Страница ленты подписок.
+
+    Материализованная часть читается одним диапазоном индекса
+    ``(user, -pub_date, -post)``; посты «звёздных» авторов, для которых
+    fan-out-on-write отключён, дочитываются тем же курсором и сливаются.
+    """
+    paginator = CursorPaginator(
+        Post.objects.filter(author__following__user=user), per_page)
+    entries = CursorPaginator(
+        TimelineEntry.objects.filter(user=user), per_page,
+        ordering=('-pub_date', '-post_id'),
+    ).get_page(cursor)
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [entry.post_id for entry in entries])
+    sources = [[posts[entry.post_id] for entry in entries
+                if entry.post_id in posts]]
+    has_next = entries.has_next()
+    read_authors = Follow.objects.filter(
+        user=user, materialized=False).values_list('author_id', flat=True)
+    if read_authors:
+        pulled = CursorPaginator(
+            Post.objects.filter(author__in=list(read_authors))
+            .select_related('author', 'group'), per_page,
+        ).get_page(cursor)
+        sources.append(pulled.object_list)
+        has_next = has_next or pulled.has_next()
+    object_list = list(merge(
+        *sources, key=lambda post: (post.pub_date, post.id), reverse=True))
+    has_next = has_next or len(object_list) > per_page
+    return CursorPage(object_list[:per_page], paginator,
+                      entries.cursor, has_next)
+
+
+def rebuild():
+    """Пересобирает все ленты подписок с нуля."""
+    TimelineEntry.objects.all().delete()
+    Follow.objects.update(materialized=False)
+    limit = settings.FOLLOW_FANOUT_LIMIT
+    author_ids = Follow.objects.values_list(
+        'author_id', flat=True).distinct().order_by('author_id')
+    for author_id in author_ids.iterator():
+        follows = Follow.objects.filter(
+            author_id=author_id).order_by('id')[:limit]
+        Follow.objects.filter(
+            id__in=list(follows.values_list('id', flat=True)),
+        ).update(materialized=True)
+    # Строки лент — одним INSERT ... SELECT, не проходя через Python.
+    entries, follows, posts = (model._meta.db_table for model in
+                               (TimelineEntry, Follow, Post))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {entries} (user_id, post_id, author_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+            f'FROM {follows} f JOIN {posts} p ON p.author_id = f.author_id '
+            f'WHERE f.materialized = %s', [True])
@@ -0,0 +1,310 @@
+"""Потоковые выгрузка и загрузка групп, постов, комментариев и подписок.
+
+Выгрузка читает строки ``values_list().iterator()``, загрузка пишет их
+``bulk_create`` пачками, поэтому память не растёт с объёмом данных и
+объекты моделей на всю выгрузку не создаются. Авторы и группы в файлах
+указаны по username и slug, посты и комментарии сохраняют свои id.
+
+Форматы: JSONL — один поток, в строке объект с ключом ``model``;
+CSV — каталог с файлами ``<model>.csv``.
+"""
+import csv
+import json
+import os
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, search, timeline
+from .models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+BATCH_SIZE = 2000
+
+# Порядок моделей — порядок зависимостей: загрузка идёт в нём же.
+FIELDS = {
+    'group': ('slug', 'title', 'description'),
+    'post': ('id', 'author', 'group', 'text', 'pub_date', 'image'),
+    'comment': ('id', 'post', 'author', 'text', 'created'),
+    'follow': ('user', 'author'),
+}
+MODELS = tuple(FIELDS)
+CLASSES = {'group': Group, 'post': Post, 'comment': Comment,
+           'follow': Follow}
+# Поля со ссылкой на пользователя по username.
+USER_FIELDS = {'post': ('author',), 'comment': ('author',),
+               'follow': ('user', 'author')}
+
+
+@transaction.atomic
+def create_users(users, batch_size=BATCH_SIZE):
+    """Создаёт пользователей ``bulk_create`` вместе с их счётчиками.
+
+    ``bulk_create`` не шлёт ``post_save``, который заводит
+    ``UserCounters``: без них профиль падает, пока счётчики не
+    пересчитаны. Уже существующие имена пропускаются. Возвращает
+    ``{username: pk}`` для всех переданных имён.
+    """
+    User.objects.bulk_create(users, batch_size=batch_size,
+                             ignore_conflicts=True)
+    names = [user.username for user in users]
+    ids = {}
+    for start in range(0, len(names), batch_size):
+        ids.update(User.objects.filter(
+            username__in=names[start:start + batch_size],
+        ).values_list('username', 'pk'))
+    UserCounters.objects.bulk_create(
+        [UserCounters(user_id=pk) for pk in ids.values()],
+        batch_size=batch_size, ignore_conflicts=True)
+    return ids
+
+
+def _exported(model):
+    return {
+        'group': Group.objects.values_list('slug', 'title', 'description'),
+        'post': Post.objects.values_list(
+            'id', 'author__username', 'group__slug', 'text', 'pub_date',
+            'image'),
+        'comment': Comment.objects.values_list(
+            'id', 'post_id', 'author__username', 'text', 'created'),
+        'follow': Follow.objects.values_list(
+            'user__username', 'author__username'),
+    }[model].order_by('pk')
+
+
+def export_rows(model):
+    """Строки модели словарями полей ``FIELDS[model]``."""
+    fields = FIELDS[model]
+    for row in _exported(model).iterator(chunk_size=BATCH_SIZE):
+        yield dict(zip(fields, row))
+
+
+def _encode(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+class JsonlWriter:
+    def __init__(self, stream, close=False):
+        self.stream = stream
+        self._close = close
+
+    def write(self, model, row):
+        self.stream.write(json.dumps({'model': model, **row},
+                                     ensure_ascii=False, default=_encode))
+        self.stream.write('\n')
+
+    def close(self):
+        if self._close:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+
+class CsvWriter:
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.files = {}
+        self.writers = {}
+
+    def write(self, model, row):
+        if model not in self.writers:
+            stream = open(os.path.join(self.directory, f'{model}.csv'), 'w',
+                          newline='', encoding='utf-8')
+            self.files[model] = stream
+            self.writers[model] = csv.DictWriter(stream, FIELDS[model])
+            self.writers[model].writeheader()
+        self.writers[model].writerow({
+            name: _encode(value) if hasattr(value, 'isoformat') else value
+            for name, value in row.items()
+        })
+
+    def close(self):
+        for stream in self.files.values():
+            stream.close()
+
+
+def read_jsonl(stream):
+    for line in stream:
+        if line.strip():
+            row = json.loads(line)
+            yield row.pop('model'), row
+
+
+def read_csv(directory):
+    for model in MODELS:
+        path = os.path.join(directory, f'{model}.csv')
+        if os.path.exists(path):
+            with open(path, newline='', encoding='utf-8') as stream:
+                for row in csv.DictReader(stream):
+                    # В CSV нет NULL: пустая ячейка — отсутствие значения.
+                    yield model, {name: value if value != '' else None
+                                  for name, value in row.items()}
+
+
+@contextmanager
+def keep_dates():
+    """Отключает ``auto_now_add``: даты постов и комментариев — из файла."""
+    fields = [Post._meta.get_field('pub_date'),
+              Comment._meta.get_field('created')]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _date(value):
+    return parse_datetime(value) if value else timezone.now()
+
+
+def _key(model, obj):
+    """Что делает строку модели ``model`` уникальной."""
+    if model == 'group':
+        return obj.slug
+    if model == 'follow':
+        return obj.user_id, obj.author_id
+    return obj.pk
+
+
+class Importer:
+    """Копит строки пачками и пишет их ``bulk_create`` по порядку моделей.
+
+    Пользователи и группы ищутся по словарям username -> id и slug -> id,
+    загруженным один раз. Строки с неизвестными пользователями или постами
+    пропускаются и попадают в ``skipped``; с ``create_users`` недостающие
+    пользователи создаются без пароля. Уже существующие строки (тот же
+    id, slug или пара подписки) не дублируются и тоже считаются в
+    ``skipped``.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, create_users=False):
+        self.batch_size = batch_size
+        self.create_users = create_users
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.buffers = {model: [] for model in MODELS}
+        self.imported = dict.fromkeys(MODELS, 0)
+        self.skipped = dict.fromkeys(MODELS, 0)
+
+    def add(self, model, row):
+        self.buffers[model].append(row)
+        if len(self.buffers[model]) >= self.batch_size:
+            self.flush()
+
+    def load(self, rows):
+        for model, row in rows:
+            self.add(model, row)
+        self.flush()
+
+    def _create_missing_users(self):
+        names = {row[field] for model, fields in USER_FIELDS.items()
+                 for row in self.buffers[model] for field in fields}
+        names -= self.users.keys()
+        names.discard(None)
+        if not names:
+            return
+        self.users.update(create_users(
+            [User(username=name, password=make_password(None))
+             for name in names], self.batch_size))
+
+    def _build(self, model, row):
+        users = self.users
+        if model == 'group':
+            return Group(slug=row['slug'], title=row['title'],
+                         description=row['description'])
+        if model == 'post':
+            if row['author'] not in users:
+                return None
+            return Post(id=int(row['id']), author_id=users[row['author']],
+                        group_id=self.groups.get(row['group']),
+                        text=row['text'] or '',
+                        pub_date=_date(row['pub_date']),
+                        image=row['image'] or '')
+        if model == 'comment':
+            if row['author'] not in users:
+                return None
+            return Comment(id=int(row['id']), post_id=int(row['post']),
+                           author_id=users[row['author']],
+                           text=row['text'] or '',
+                           created=_date(row['created']))
+        if row['user'] not in users or row['author'] not in users:
+            return None
+        return Follow(user_id=users[row['user']],
+                      author_id=users[row['author']])
+
+    def _new(self, model, objs):
+        """Объекты, которых ещё нет ни в базе, ни раньше в пачке.
+
+        ``bulk_create(ignore_conflicts=True)`` молча пропускает такие
+        строки: без этой проверки повторная загрузка считала бы их
+        загруженными.
+        """
+        if model == 'group':
+            existing = set(self.groups)
+        elif model == 'follow':
+            existing = set(Follow.objects.filter(
+                user_id__in={obj.user_id for obj in objs},
+            ).values_list('user_id', 'author_id'))
+        else:
+            existing = set(CLASSES[model].objects.filter(
+                pk__in=[obj.pk for obj in objs]).values_list('pk', flat=True))
+        new = {}
+        for obj in objs:
+            key = _key(model, obj)
+            if key not in existing:
+                new.setdefault(key, obj)
+        return list(new.values())
+
+    @transaction.atomic
+    def flush(self):
+        if self.create_users:
+            self._create_missing_users()
+        for model in MODELS:
+            rows, self.buffers[model] = self.buffers[model], []
+            objs = [obj for obj in (self._build(model, row) for row in rows)
+                    if obj is not None]
+            if model == 'comment':
+                posts = set(Post.objects.filter(
+                    pk__in={obj.post_id for obj in objs}).values_list(
+                        'pk', flat=True))
+                objs = [obj for obj in objs if obj.post_id in posts]
+            objs = self._new(model, objs)
+            self.skipped[model] += len(rows) - len(objs)
+            if not objs:
+                continue
+            # ignore_conflicts — на случай строк, вставленных параллельно.
+            with keep_dates():
+                CLASSES[model].objects.bulk_create(objs, ignore_conflicts=True)
+            self.imported[model] += len(objs)
+            if model == 'group':
+                self.groups.update(Group.objects.filter(
+                    slug__in=[obj.slug for obj in objs]).values_list(
+                        'slug', 'pk'))
+
+    def reset_sequences(self):
+        """Сдвигает счётчики id за загруженные явно id (не для SQLite)."""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [Group, Post, Comment, Follow])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def rebuild_derived():
+    """Пересчитывает всё, что ведут сигналы: ``bulk_create`` их не шлёт."""
+    counters.rebuild()
+    timeline.rebuild()
+    search.rebuild()
+    cache.clear()
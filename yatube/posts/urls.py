@@ -1,19 +1,23 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('search/', views.search_posts, name='search'),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('posts/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/many/', views.follow_many, name='follow_many'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -24,4 +28,14 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path('api/v1/posts/', api.index, name='api_index'),
+    path('api/v1/posts/<int:post_id>/', api.post_detail, name='api_post'),
+    path('api/v1/posts/<int:post_id>/comments/', api.post_comments,
+         name='api_post_comments'),
+    path('api/v1/groups/<slug:slug>/posts/', api.group_posts,
+         name='api_group_posts'),
+    path('api/v1/profiles/<str:username>/', api.profile,
+         name='api_profile'),
+    path('api/v1/profiles/<str:username>/posts/', api.profile_posts,
+         name='api_profile_posts'),
 ]
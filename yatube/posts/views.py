@@ -1,21 +1,44 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, render, redirect
-from django.views.decorators.http import require_http_methods
+from django.utils.cache import get_conditional_response
+from django.utils.http import urlencode
+from django.views.decorators.http import (condition, require_http_methods,
+                                          require_POST)
+from core import concurrency
+from core.decorators import query_budget, replica_reads
+from core.ratelimit import rate_limit
 from .forms import PostForm
-from .models import Post, Group, User, Follow
+from .models import Comment, Post, Group, User, Follow
 from .forms import PostForm, CommentForm
+from .paginators import CursorPage, CursorPaginator
+from . import caching, comment_queue, search, thumbnails, timeline
 
 NUM_POST = 10
+NUM_COMMENTS = 20
 
 User = get_user_model()
 
 
-def get_page_context(queryset, request):
-    paginator = Paginator(queryset, NUM_POST)
+def get_page_context(queryset, request, count=None):
+    """Страница ленты: по курсору ``?after=`` или по номеру ``?page=N``.
+
+    ``count`` — заранее известное число объектов (счётчик), чтобы
+    нумерованный пагинатор не выполнял ``COUNT(*)``.
+    """
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if page_number is None:
+        paginator = CursorPaginator(queryset, NUM_POST)
+        page_obj = paginator.get_page(request.GET.get('after'))
+    else:
+        paginator = Paginator(queryset, NUM_POST)
+        if count is not None:
+            paginator.count = count
+        page_obj = paginator.get_page(page_number)
+    caching.mark_page(request, page_obj)
     return {
         'paginator': paginator,
         'page_number': page_number,
@@ -23,62 +46,184 @@ def get_page_context(queryset, request):
     }
 
 
+def get_comments_paginator(post_id):
+    """Комментарии поста по курсору на (created, id), старые — первыми."""
+    return CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        NUM_COMMENTS, ordering=('created', 'id'))
+
+
+def get_comments_page(post_id, cursor):
+    return get_comments_paginator(post_id).get_page(cursor)
+
+
+def load_post(post_id):
+    """Данные страницы поста для кэша: пост и первая страница комментариев.
+
+    Хранятся список комментариев и признак следующей страницы, а не
+    CursorPage: страница ссылается на queryset пагинатора.
+    """
+    post, comments_page = concurrency.gather(
+        lambda: get_object_or_404(
+            Post.objects.select_related('author__counters', 'group'),
+            id=post_id),
+        lambda: get_comments_page(post_id, None),
+    )
+    return {
+        'post': post,
+        'comments': comments_page.object_list,
+        'more_comments': comments_page.has_next(),
+    }
+
+
+@replica_reads
+@query_budget(3)
+@condition(etag_func=caching.feed_etag(caching.index_feed))
+@caching.cache_page_for_guests(caching.index_feed)
 def index(request):
-    context = get_page_context(Post.objects.all(), request)
+    posts = Post.objects.select_related('author', 'group')
+    context = get_page_context(posts, request)
+    context.update(caching.feed_cache_context(request, caching.index_feed()))
     return render(request, 'posts/index.html', context)
 
 
+@replica_reads
+@query_budget(4)
+@condition(etag_func=caching.feed_etag(caching.group_feed))
+@caching.cache_page_for_guests(caching.group_feed)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
+    # Странице по курсору не нужно число постов группы: она читается
+    # одновременно с группой. Нумерованной — только после группы.
+    group, page_context = concurrency.gather(
+        lambda: get_object_or_404(Group, slug=slug),
+        None if 'page' in request.GET else lambda: get_page_context(
+            Post.objects.filter(group__slug=slug).select_related(
+                'author', 'group'), request),
+    )
     posts = (group.posts.all(), NUM_POST)
     context = {
         'group': group,
         'posts': posts,
     }
-    context.update(get_page_context(group.posts.all(), request))
+    if page_context is None:
+        # post.group уже известна менеджеру group.posts, грузим автора.
+        page_context = get_page_context(group.posts.select_related('author'),
+                                        request, group.posts_count)
+    context.update(page_context)
+    context.update(caching.feed_cache_context(
+        request, caching.group_feed(slug)))
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(5)
+def search_posts(request):
+    """Поиск постов по словам, самые релевантные — первыми."""
+    query = request.GET.get('q', '').strip()
+    results = search.SearchResults(
+        query, Post.objects.select_related('author', 'group'))
+    paginator = Paginator(results, NUM_POST)
+    context = {
+        'query': query,
+        'page_params': urlencode({'q': query}) + '&',
+        'paginator': paginator,
+        'page_obj': paginator.get_page(request.GET.get('page')),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@replica_reads
+@query_budget(5)
+@condition(etag_func=caching.feed_etag(caching.profile_feed))
+@caching.cache_page_for_guests(caching.profile_feed)
 def profile(request, username):
     """Список постов автора."""
-    author = get_object_or_404(User, username=username)
-    author_posts = author.posts.all()
-    count = author_posts.count()
-    paginator = Paginator(author_posts, NUM_POST)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = False
-    if request.user.is_authenticated and author != request.user:
-        following = Follow.objects.filter(
-            user=request.user, author=author).exists()
+    user = request.user
+    # Автор, подписка и страница по курсору читаются одновременно: все
+    # запросы строятся по username.
+    author, following, page_context = concurrency.gather(
+        lambda: get_object_or_404(User.objects.select_related('counters'),
+                                  username=username),
+        lambda: Follow.objects.filter(
+            user=user, author__username=username).exists()
+        if user.is_authenticated and user.username != username else None,
+        None if 'page' in request.GET else lambda: get_page_context(
+            Post.objects.filter(author__username=username).select_related(
+                'author', 'group'), request),
+    )
+    count = author.counters.posts_count
     context = {
         'count': count,
         'author': author,
-        'page_obj': page_obj,
-        'following': following}
+        'following': bool(following)}
+    if page_context is None:
+        page_context = get_page_context(author.posts.select_related('group'),
+                                        request, count)
+    context.update(page_context)
+    context.update(caching.feed_cache_context(
+        request, caching.profile_feed(username)))
     return render(request, 'posts/profile.html', context)
 
 
+@replica_reads
+@query_budget(4)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    # Популярный пост читается из кэша; промахи одновременных запросов
+    # строят данные один раз (caching.cached_post).
+    version, payload = caching.cached_post(post_id,
+                                           lambda: load_post(post_id))
+    post = payload['post']
+    # Свои комментарии из очереди записи автор видит сразу.
+    pending_comments = (comment_queue.pending(post_id, request.user.pk)
+                        if request.user.is_authenticated else [])
+    # ETag считается по уже загруженному посту: отдельного запроса ради
+    # него нет, а при 304 не рисуется шаблон.
+    etag = caching.post_etag(request, post, version, pending_comments)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+    cursor = request.GET.get('after')
+    if cursor:
+        comments_page = get_comments_page(post_id, cursor)
+    else:
+        comments_page = CursorPage(payload['comments'],
+                                   get_comments_paginator(post_id), None,
+                                   payload['more_comments'])
     form = CommentForm()
     context = {
         'post': post,
-        'comments': comments,
+        'comments_page': comments_page,
+        'pending_comments': pending_comments,
         'form': form,
     }
-    return render(request, 'posts/post_detail.html', context)
+    response = render(request, 'posts/post_detail.html', context)
+    response['ETag'] = etag
+    return response
+
+
+@replica_reads
+@query_budget(3)
+def post_comments(request, post_id):
+    """Следующая страница комментариев поста — только HTML списка.
+
+    Пост не читается: для несуществующего поста фрагмент просто пуст.
+    """
+    context = {
+        'post_id': post_id,
+        'comments_page': get_comments_page(post_id, request.GET.get('after')),
+    }
+    return render(request, 'includes/comments.html', context)
 
 
 @login_required
 @require_http_methods(["GET", "POST"])
+@rate_limit('post', methods=('POST',))
 def post_create(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
         return redirect('posts:profile', username=post.author)
 
     context = {
@@ -103,7 +248,12 @@ def post_edit(request, post_id):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        # Счётчики в строке поста ведут сигналы: не затираем их
+        # значениями, прочитанными до сохранения.
+        post.save(update_fields=PostForm.update_fields)
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
+        caching.store_post(post_id, load_post(post_id))
         return redirect('posts:post_detail', post_id=post_id)
 
     return render(request, 'posts/create_post.html',
@@ -111,48 +261,79 @@ def post_edit(request, post_id):
 
 
 @login_required
+@rate_limit('comment', methods=('POST',))
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    write_behind = settings.COMMENT_WRITE_BEHIND
+    # При отложенной записи пост не читается: комментарий к удалённому
+    # посту отбросит запись очереди (posts.comment_queue).
+    post = None if write_behind else get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
-        comment.post = post
-        comment.save()
+        if write_behind:
+            comment.post_id = post_id
+            comment_queue.enqueue(comment)
+        else:
+            comment.post = post
+            comment.save()
+            caching.store_post(post_id, load_post(post_id))
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@replica_reads
+@query_budget(6)
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, NUM_POST)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context = {
-        'page_obj': page_obj}
+    if request.GET.get('page') is not None:
+        posts = Post.objects.filter(
+            author__following__user=request.user,
+        ).select_related('author', 'group')
+        context = get_page_context(posts, request)
+    else:
+        context = {'page_obj': timeline.get_page(
+            request.user, request.GET.get('after'), NUM_POST)}
     return render(request, 'posts/follow.html', context)
 
 
+def follow_response(request, username, counts, following):
+    """Редирект на профиль; на AJAX-запрос — счётчики подписок в JSON."""
+    if request.is_ajax():
+        followers_count, following_count = counts
+        return JsonResponse({'following': following,
+                             'followers_count': followers_count,
+                             'following_count': following_count})
+    return redirect('posts:profile', username=username)
+
+
 @login_required
+@rate_limit('follow')
 def profile_follow(request, username):
     """Делает подписку на автора."""
     author = get_object_or_404(User, username=username)
-    follow = Follow.objects.filter(
-        user=request.user,
-        author=author)
-    if request.user != author and not follow.exists():
-        Follow.objects.create(user=request.user,
-                              author=author)
-
-    return redirect('posts:profile', username=username)
+    counts = timeline.follow(request.user, author)
+    return follow_response(request, username, counts,
+                           following=request.user != author)
 
 
 @login_required
+@rate_limit('follow')
 def profile_unfollow(request, username):
     """Делает отписку от автора."""
-    author = User.objects.get(username=username)
-    Follow.objects.filter(
-        user=request.user,
-        author=author,
-    ).delete()
-    return redirect('posts:profile', username=username)
+    author = get_object_or_404(User, username=username)
+    counts = timeline.unfollow(request.user, author)
+    return follow_response(request, username, counts, following=False)
+
+
+@login_required
+@require_POST
+@rate_limit('follow_many')
+def follow_many(request):
+    """Подписывает на несколько авторов сразу (``username`` в POST)."""
+    usernames = request.POST.getlist('username')
+    if len(usernames) > settings.FOLLOW_MANY_LIMIT:
+        return HttpResponseBadRequest(
+            f'Не больше {settings.FOLLOW_MANY_LIMIT} авторов за раз')
+    timeline.follow_many(request.user, User.objects.filter(
+        username__in=usernames).values_list('pk', flat=True))
+    return redirect('posts:follow_index')
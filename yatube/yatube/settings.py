@@ -17,6 +17,13 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Загрузки хранятся по хэшу содержимого, одинаковые — одним файлом
+# (core.storage). Имена миниатюр sorl и так выводит из имени картинки.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+# Сколько секунд collect_media не трогает файл без ссылок: загрузка
+# могла сохранить файл, но ещё не сохранить пост.
+MEDIA_GC_GRACE = 60 * 60
 
 # Application definition
 
@@ -35,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -47,12 +56,20 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.MeasuredTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Без DEBUG шаблоны компилируются один раз на процесс; при
+            # разработке правки шаблонов видны без перезапуска.
+            'loaders': TEMPLATE_LOADERS if DEBUG else [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -74,9 +91,45 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# Выполняются на каждом новом соединении SQLite (core.db): WAL — читатели
+# не ждут писателей, писатели ждут друг друга до busy_timeout (мс) вместо
+# ошибки; mmap_size в байтах, cache_size < 0 — в КиБ на соединение.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -16 * 1024,
+}
+
+# Реплики только для чтения: файлы SQLite через запятую в
+# YATUBE_DB_REPLICAS (локально их наполняет simulate_replication). Ленты
+# и страницы постов читают с них, см. core/routers.py.
+DATABASE_REPLICAS = []
+for number, path in enumerate(filter(None, os.environ.get(
+        'YATUBE_DB_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Потоки, в которых ленты и страница поста одновременно читают
+# независимые данные (core.concurrency). 0 — читать по очереди.
+VIEW_LOADER_THREADS = 4
+
+# Наибольшее отставание реплик, секунды: столько после записи её автор
+# и только что сброшенные ленты читают с основной базы.
+REPLICA_MAX_LAG = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -125,8 +178,105 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 
+# 'locmem' — свой кэш у каждого процесса; 'sqlite' — общий файл для всех
+# воркеров на машине: сброс кэша сразу виден каждому из них.
+CACHE_BACKEND = os.environ.get('YATUBE_CACHE_BACKEND', 'locmem')
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sqlite': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
+# default считает попадания и промахи для метрик запросов и передаёт
+# вызовы кэшу backend.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.metrics.MeasuredCache',
+        'LOCATION': 'backend',
+    },
+    'backend': CACHE_BACKENDS[CACHE_BACKEND],
+}
+
+# Авторы, у которых подписчиков больше, не раскладывают посты по лентам
+# читателей при публикации: их посты подмешиваются при чтении /follow/.
+FOLLOW_FANOUT_LIMIT = 1000
+
+# Сколько авторов можно передать в одном запросе follow_many.
+FOLLOW_MANY_LIMIT = 50
+
+# Сколько живут в кэше страницы и фрагменты лент. Устаревание по правкам
+# постов, комментариев и групп обрабатывает posts.caching, а не таймаут.
+FEED_CACHE_TIMEOUT = 60 * 5
+
+# Данные страницы поста в кэше (posts.caching.cached_post): правки,
+# комментарии и посты автора меняют их сразу, имя автора может отставать
+# на POST_CACHE_TIMEOUT. Одновременные промахи ждут того, кто строит
+# данные, не дольше POST_CACHE_FILL_TIMEOUT.
+POST_CACHE_TIMEOUT = 60
+POST_CACHE_FILL_TIMEOUT = 2
+
+# В запросе sorl-thumbnail только ищет готовые миниатюры; готовит их пул
+# процессов при загрузке картинки (posts.thumbnails). 0 — готовить сразу,
+# в процессе запроса.
+THUMBNAIL_BACKEND = 'posts.thumbnails.PregeneratedThumbnailBackend'
+THUMBNAIL_WORKERS = 2
+
+# Картинки постов (posts.images): форма не примет файл больше
+# IMAGE_MAX_UPLOAD_SIZE байт или больше IMAGE_MAX_PIXELS точек; пул
+# уменьшает оригиналы до IMAGE_MAX_DIMENSION точек по длинной стороне.
+IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+IMAGE_MAX_DIMENSION = 2560
+# Загрузки больше мегабайта пишутся во временный файл кусками и
+# переносятся в хранилище, а не копятся в памяти.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024
+
+# JSON API (posts.api): размер страницы по умолчанию и наибольший ?limit=.
+API_PAGE_SIZE = 10
+API_MAX_LIMIT = 100
+
+# Ответы API меньше COMPRESS_MIN_SIZE байт не сжимаются: выигрыш меньше
+# заголовков. Качество brotli 4 сжимает плотнее gzip и не медленнее его.
+COMPRESS_MIN_SIZE = 512
+BROTLI_QUALITY = 4
+
+# Отложенная запись комментариев (posts.comment_queue): очередь процесса
+# пишется пачками до COMMENT_BATCH_SIZE не реже раза в
+# COMMENT_FLUSH_INTERVAL секунд. Для всплесков комментариев; при аварии
+# процесса незаписанные комментарии теряются.
+COMMENT_WRITE_BEHIND = False
+COMMENT_BATCH_SIZE = 200
+COMMENT_FLUSH_INTERVAL = 0.2
+
+# Частота пишущих запросов (core.ratelimit): (запросов, за секунд) на
+# пользователя и на IP. Сверх бюджета — 429 с Retry-After.
+RATE_LIMITS = {
+    'post': {'user': (10, 60 * 60), 'ip': (30, 60 * 60)},
+    'comment': {'user': (20, 60), 'ip': (60, 60)},
+    'follow': {'user': (30, 60), 'ip': (100, 60)},
+    'follow_many': {'user': (5, 60 * 60), 'ip': (20, 60 * 60)},
+}
+
+# Метрики запросов по view (core.metrics): гистограммы отдаёт
+# /admin/metrics/, сводка пишется в лог core.metrics раз в интервал.
+METRICS_ENABLED = True
+METRICS_LOG_INTERVAL = 60
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.metrics': {'handlers': ['console'], 'level': 'INFO'},
+    },
 }